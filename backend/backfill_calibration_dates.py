@@ -0,0 +1,24 @@
+"""Recompute every gage's last calibration date and next due date from its calibration history.
+
+Usage: python backfill_calibration_dates.py
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from calibration_dates import sync_gage_calibration_dates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        updated = await sync_gage_calibration_dates(db)
+        await db.commit()
+    logger.info(f"Calibration dates backfilled: {updated} gages updated")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""Show query plans for the hot lookup queries with and without their indexes.
+
+Usage: python benchmark_indexes.py [--gage-id 1] [--user-id 1] [--no-analyze] [--search TERM ...]
+
+For the "before" plans the lookup indexes added by the migrations are dropped inside a transaction that is always rolled back. DROP INDEX takes
+an exclusive lock on each table until then, so run this against a copy of the
+database, not a busy production instance.
+
+Gage search latency is timed separately through the search endpoint's code
+path and compared with the 20 ms target; load a copy with a realistic
+inventory (the target is set for 100k gages) before reading the numbers.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from sqlalchemy import create_engine, func, select, text
+
+from config import get_settings
+from gage_search import search_gages
+from models import AsyncSessionLocal, Gage
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    "ix_gages_next_calibration_due",
+    "ix_calibration_records_gage_id_date",
+    "ix_calibration_records_calibrated_by",
+    "ix_calibration_measurements_calibration_id",
+    "ix_calibration_measurements_gage_function_point",
+    "ix_issue_log_returned_by",
+    "ix_issue_log_open_handled_by",
+    "ix_issue_log_open_gage_id",
+    "ix_issue_log_open_expected_return",
+    "ix_issue_log_gage_id_issue_id",
+    "ix_labels_generated_at_id",
+    "ix_labels_gage_id_generated_at_id",
+    "ix_calibration_records_inbox",
+    "ix_calibration_records_unread",
+]
+
+QUERIES = {
+    "latest calibration for a gage":
+        "SELECT * FROM calibration_records WHERE gage_id = :gage_id "
+        "ORDER BY calibration_date DESC LIMIT 1",
+    "calibration report records":
+        "SELECT * FROM calibration_records WHERE gage_id = :gage_id",
+    "measurements for a gage's calibrations":
+        "SELECT m.* FROM calibration_measurements m "
+        "JOIN calibration_records r ON r.calibration_id = m.calibration_id "
+        "WHERE r.gage_id = :gage_id",
+    "notification inbox page":
+        "SELECT calibration_id, gage_id, notification_sent_date, notification_read FROM calibration_records "
+        "WHERE calibrated_by = :user_id AND notification_sent "
+        "ORDER BY notification_sent_date DESC, calibration_id DESC LIMIT 50",
+    "unread notification count":
+        "SELECT count(*) FROM calibration_records "
+        "WHERE calibrated_by = :user_id AND notification_sent AND NOT notification_read",
+    "gages due in 30 days":
+        "SELECT gage_id FROM gages WHERE next_calibration_due <= current_date + 30",
+    "open checkouts for a user":
+        "SELECT * FROM issue_log WHERE handled_by = :user_id AND return_date IS NULL",
+    "returns by a user":
+        "SELECT * FROM issue_log WHERE returned_by = :user_id",
+    "issue log report":
+        "SELECT * FROM issue_log WHERE gage_id = :gage_id",
+    "issue history page for a gage":
+        "SELECT * FROM issue_log WHERE gage_id = :gage_id ORDER BY issue_id DESC LIMIT 50",
+    "current holder of a gage":
+        "SELECT * FROM issue_log WHERE gage_id = :gage_id AND return_date IS NULL",
+    "overdue checkouts":
+        "SELECT * FROM issue_log WHERE return_date IS NULL AND expected_return_date < now()",
+    "label history page":
+        "SELECT * FROM labels ORDER BY generated_at DESC, id DESC LIMIT 100",
+    "label history for a gage":
+        "SELECT * FROM labels WHERE gage_id = :gage_id ORDER BY generated_at DESC, id DESC LIMIT 100",
+}
+
+# Typeahead latency target for /api/gages/search
+SEARCH_TARGET_MS = 20
+SEARCH_TERMS = ["mitu", "SN-10", "micrometer plug", "calipr"]
+
+async def time_searches(terms, repeats: int):
+    async with AsyncSessionLocal() as db:
+        gages = (await db.execute(select(func.count(Gage.gage_id)))).scalar_one()
+        logger.info(f"=== gage search over {gages} gages (target {SEARCH_TARGET_MS} ms) ===")
+        for term in terms:
+            await search_gages(db, term)
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                await search_gages(db, term)
+                timings.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else median
+            verdict = "ok" if p95 <= SEARCH_TARGET_MS else "SLOW"
+            logger.info(f"{term!r}: median {median:.1f} ms, p95 {p95:.1f} ms [{verdict}]")
+
+def explain(conn, sql: str, params: dict, analyze: bool) -> str:
+    options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+    rows = conn.execute(text(f"EXPLAIN ({options}) {sql}"), params).scalars().all()
+    return "\n".join(rows)
+
+def main(gage_id: int, user_id: int, analyze: bool):
+    engine = create_engine(get_settings().DATABASE_URL)
+    params = {"gage_id": gage_id, "user_id": user_id}
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            for name in INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            before = {label: explain(conn, sql, params, analyze) for label, sql in QUERIES.items()}
+            transaction.rollback()
+        after = {label: explain(conn, sql, params, analyze) for label, sql in QUERIES.items()}
+        conn.rollback()
+
+    for label in QUERIES:
+        logger.info(f"=== {label} ===")
+        logger.info(f"--- before ---\n{before[label]}")
+        logger.info(f"--- after ---\n{after[label]}\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gage-id", type=int, default=1)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--no-analyze", action="store_true", help="Plan only; do not execute the queries")
+    parser.add_argument("--search", action="append", default=None, help="Search term to time; repeatable")
+    parser.add_argument("--search-repeats", type=int, default=50)
+    args = parser.parse_args()
+    main(args.gage_id, args.user_id, not args.no_analyze)
+    asyncio.run(time_searches(args.search or SEARCH_TERMS, args.search_repeats))
@@ -0,0 +1,106 @@
+"""Keep Gage.last_calibration_date / next_calibration_due in step with calibration history.
+
+The gage row holds the dates of its latest calibration (by calibration_date,
+then calibration_id), so reading a gage's current calibration state never
+touches calibration_records. Every calibration write calls
+``sync_gage_calibration_dates`` before committing, so the gage is updated in
+the same transaction; backfill_calibration_dates.py passes no ids to resync the
+whole fleet in one statement.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.future import select
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy import Date, update, func
+from typing import Iterable, Optional
+
+from models import CalibrationRecord, Gage
+
+class _add_days(FunctionElement):
+    """``date + days`` as a date; calibration_frequency is stored in days"""
+    type = Date()
+    inherit_cache = True
+
+@compiles(_add_days)
+def _compile_add_days(element, compiler, **kw):
+    date, days = list(element.clauses)
+    return f"CAST({compiler.process(date, **kw)} + make_interval(days => {compiler.process(days, **kw)}) AS DATE)"
+
+@compiles(_add_days, "sqlite")
+def _compile_add_days_sqlite(element, compiler, **kw):
+    date, days = list(element.clauses)
+    return f"date({compiler.process(date, **kw)}, '+' || {compiler.process(days, **kw)} || ' days')"
+
+def _latest_calibrations(gage_ids: Optional[list] = None):
+    """Latest dated calibration per gage, picked by ROW_NUMBER() so every backend agrees on it"""
+    rank = func.row_number().over(
+        partition_by=CalibrationRecord.gage_id,
+        order_by=(CalibrationRecord.calibration_date.desc(), CalibrationRecord.calibration_id.desc())
+    )
+    query = select(
+        CalibrationRecord.gage_id,
+        CalibrationRecord.calibration_date,
+        CalibrationRecord.next_due_date,
+        rank.label("rank")
+    ).where(CalibrationRecord.calibration_date.isnot(None))
+    if gage_ids is not None:
+        query = query.where(CalibrationRecord.gage_id.in_(gage_ids))
+    ranked = query.subquery()
+    return (
+        select(ranked.c.gage_id, ranked.c.calibration_date, ranked.c.next_due_date)
+        .where(ranked.c.rank == 1)
+        .subquery()
+    )
+
+async def sync_gage_calibration_dates(db: AsyncSession, gage_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Copy each gage's latest calibration dates onto the gage row with one
+    set-based UPDATE; all gages when ``gage_ids`` is None. A record without a
+    next due date falls back to calibration_date + calibration_frequency.
+    Listed gages with no dated calibrations left (their last one was deleted
+    or undated) get both dates cleared; a fleet-wide sync leaves gages without
+    calibration history alone. Flushes but does not commit; returns the
+    number of gages changed.
+    """
+    if gage_ids is not None:
+        gage_ids = sorted(set(gage_ids))
+        if not gage_ids:
+            return 0
+        # Serializes concurrent calibration writes for a gage, so the update
+        # below always sees the other transaction's record once it commits
+        await db.execute(
+            select(Gage.gage_id).where(Gage.gage_id.in_(gage_ids)).order_by(Gage.gage_id).with_for_update()
+        )
+    await db.flush()
+
+    latest = _latest_calibrations(gage_ids)
+    next_due = func.coalesce(latest.c.next_due_date, _add_days(latest.c.calibration_date, Gage.calibration_frequency))
+    result = await db.execute(
+        update(Gage)
+        .where(
+            Gage.gage_id == latest.c.gage_id,
+            (Gage.last_calibration_date.is_distinct_from(latest.c.calibration_date))
+            | (Gage.next_calibration_due.is_distinct_from(next_due))
+        )
+        .values(last_calibration_date=latest.c.calibration_date, next_calibration_due=next_due)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.rowcount
+    if gage_ids is None:
+        return changed
+
+    dated = select(CalibrationRecord.gage_id).where(
+        CalibrationRecord.gage_id.in_(gage_ids),
+        CalibrationRecord.calibration_date.isnot(None)
+    )
+    result = await db.execute(
+        update(Gage)
+        .where(
+            Gage.gage_id.in_(gage_ids),
+            Gage.gage_id.notin_(dated),
+            Gage.last_calibration_date.isnot(None) | Gage.next_calibration_due.isnot(None)
+        )
+        .values(last_calibration_date=None, next_calibration_due=None)
+        .execution_options(synchronize_session=False)
+    )
+    return changed + result.rowcount
@@ -0,0 +1,179 @@
+"""Calibration certificate layout.
+
+Kept free of database and application imports so the render function can run
+in worker processes: it takes a plain payload dict (see
+``certificates.build_payload``) and returns PDF bytes.
+"""
+from typing import List, Optional, Tuple
+import os
+import tempfile
+import textwrap
+
+from pdf_writer import PdfPage, write_pdf
+
+PAGE_WIDTH = 595  # A4, points
+PAGE_HEIGHT = 842
+MARGIN = 50
+LINE_HEIGHT = 14
+
+# (heading, payload key, x offset) for the measurement table
+MEASUREMENT_TABLE = [
+    ("Function point", "function_point", 0),
+    ("Nominal", "nominal_value", 110),
+    ("Tol +", "tolerance_plus", 175),
+    ("Tol -", "tolerance_minus", 230),
+    ("As found", "before_measurement", 285),
+    ("As left", "after_measurement", 350),
+    ("Temp", "temperature", 415),
+    ("RH %", "humidity", 455),
+    ("Result", "result", 495),
+]
+
+def _value(value) -> str:
+    if value is None or value == "":
+        return "-"
+    return str(value)
+
+class _Layout:
+    """Top-down cursor over pages; starts a new page when the current one is full"""
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.pages: List[PdfPage] = []
+        self.new_page()
+
+    def new_page(self):
+        self.page = PdfPage(PAGE_WIDTH, PAGE_HEIGHT)
+        self.pages.append(self.page)
+        self.y = PAGE_HEIGHT - MARGIN
+        self.page.text(MARGIN, self.y, "Calibration Certificate", size=16, bold=True)
+        self.page.text(
+            PAGE_WIDTH - MARGIN - 170, self.y,
+            f"Certificate No. {_value(self.payload['calibration']['certificate_number'])}", bold=True
+        )
+        self.y -= 10
+        self.page.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y, width=1)
+        self.y -= 22
+
+    def need(self, height: float, on_break=None):
+        if self.y - height < MARGIN + 30:
+            self.new_page()
+            if on_break:
+                on_break()
+
+    def heading(self, text: str):
+        self.need(LINE_HEIGHT * 3)
+        self.y -= 6
+        self.page.text(MARGIN, self.y, text, size=12, bold=True)
+        self.y -= LINE_HEIGHT + 2
+
+    def fields(self, pairs: List[Tuple[str, Optional[object]]]):
+        # Two label/value columns per line
+        for index in range(0, len(pairs), 2):
+            self.need(LINE_HEIGHT)
+            for column, (label, value) in enumerate(pairs[index:index + 2]):
+                x = MARGIN + column * 250
+                self.page.text(x, self.y, f"{label}:", bold=True)
+                self.page.text(x + 105, self.y, _value(value)[:28])
+            self.y -= LINE_HEIGHT
+
+    def paragraph(self, label: str, text: Optional[str]):
+        lines = textwrap.wrap(_value(text), width=95) or ["-"]
+        self.need(LINE_HEIGHT * 2)
+        self.page.text(MARGIN, self.y, f"{label}:", bold=True)
+        self.y -= LINE_HEIGHT
+        for line in lines:
+            self.need(LINE_HEIGHT)
+            self.page.text(MARGIN, self.y, line)
+            self.y -= LINE_HEIGHT
+
+    def table_header(self):
+        for heading, _, offset in MEASUREMENT_TABLE:
+            self.page.text(MARGIN + offset, self.y, heading, size=9, bold=True)
+        self.y -= 4
+        self.page.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        self.y -= LINE_HEIGHT - 2
+
+    def table(self, rows: List[dict]):
+        self.need(LINE_HEIGHT * 3)
+        self.table_header()
+        for row in rows:
+            self.need(LINE_HEIGHT, on_break=self.table_header)
+            for _, key, offset in MEASUREMENT_TABLE:
+                self.page.text(MARGIN + offset, self.y, _value(row.get(key))[:18 if offset == 0 else 10], size=9)
+            self.y -= LINE_HEIGHT - 2
+
+    def finish(self) -> bytes:
+        total = len(self.pages)
+        for number, page in enumerate(self.pages, start=1):
+            page.line(MARGIN, MARGIN + 12, PAGE_WIDTH - MARGIN, MARGIN + 12)
+            page.text(MARGIN, MARGIN, f"Generated by Gage Calibration System - template v{self.payload['template_version']}", size=8)
+            page.text(PAGE_WIDTH - MARGIN - 60, MARGIN, f"Page {number} of {total}", size=8)
+        return write_pdf(self.pages)
+
+def render_certificate(payload: dict) -> bytes:
+    """Render one certificate payload to PDF bytes"""
+    gage = payload["gage"]
+    calibration = payload["calibration"]
+    layout = _Layout(payload)
+
+    layout.heading("Instrument")
+    layout.fields([
+        ("Gage", gage["name"]),
+        ("Gage ID", gage["gage_id"]),
+        ("Serial number", gage["serial_number"]),
+        ("Model", gage["model_number"]),
+        ("Manufacturer", gage["manufacturer"]),
+        ("Type", gage["gage_type"]),
+        ("Location", gage["location"]),
+        ("Category", gage["cal_category"]),
+    ])
+
+    layout.heading("Calibration")
+    layout.fields([
+        ("Calibration date", calibration["calibration_date"]),
+        ("Next due date", calibration["next_due_date"]),
+        ("Calibrated by", calibration["calibrated_by_name"] or calibration["calibrated_by"]),
+        ("Result", calibration["calibration_result"]),
+        ("Adjustments made", "Yes" if calibration["adjustments_made"] else "No"),
+        ("Calibration ID", calibration["calibration_id"]),
+    ])
+    layout.paragraph("Method", calibration["calibration_method"])
+    layout.paragraph("Deviation recorded", calibration["deviation_recorded"])
+
+    layout.heading("Measurements")
+    if payload["measurements"]:
+        layout.table(payload["measurements"])
+    else:
+        layout.need(LINE_HEIGHT)
+        layout.page.text(MARGIN, layout.y, "No measurements recorded.")
+        layout.y -= LINE_HEIGHT
+
+    layout.paragraph("Comments", calibration["comments"])
+    layout.need(LINE_HEIGHT * 4)
+    layout.y -= LINE_HEIGHT * 2
+    layout.page.line(MARGIN, layout.y, MARGIN + 200, layout.y)
+    layout.page.line(PAGE_WIDTH - MARGIN - 200, layout.y, PAGE_WIDTH - MARGIN, layout.y)
+    layout.y -= LINE_HEIGHT - 2
+    layout.page.text(MARGIN, layout.y, "Calibrated by", size=9)
+    layout.page.text(PAGE_WIDTH - MARGIN - 200, layout.y, "Approved by", size=9)
+    return layout.finish()
+
+def render_certificate_file(payload: dict, path: str) -> int:
+    """Render and write one certificate; runs in a worker process. Returns the file size."""
+    data = render_certificate(payload)
+    # Write to a private temporary file then rename, so readers never see a
+    # partial file even when two renders of the same certificate overlap
+    directory, name = os.path.split(path)
+    handle = tempfile.NamedTemporaryFile(dir=directory, prefix=f"{name}.", suffix=".partial", delete=False)
+    try:
+        with handle:
+            handle.write(data)
+        os.replace(handle.name, path)
+    except BaseException:
+        try:
+            os.remove(handle.name)
+        except OSError:
+            pass
+        raise
+    return len(data)
@@ -0,0 +1,210 @@
+"""Calibration certificate rendering with a content-addressed file cache.
+
+A certificate's cache key is the SHA-256 of everything printed on it (gage,
+calibration record, calibrator, measurements and verdicts) plus
+CERTIFICATE_TEMPLATE_VERSION, so a PDF is only rebuilt when one of those
+changes. Files are stored as ``<calibration_id>_<key>.pdf`` in
+CERTIFICATE_DIR; writing a new version removes the calibration's older ones.
+
+Rendering is CPU-bound and runs in a process pool, so single requests never
+block the event loop and batches use every core.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+
+from config import get_settings
+from models import CalibrationRecord, Gage, User
+from tolerance import evaluate_rows
+from certificate_pdf import render_certificate_file
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Bump when the certificate layout changes so every cached PDF is rebuilt
+CERTIFICATE_TEMPLATE_VERSION = "1"
+# Calibrations loaded per query in batch mode
+CERTIFICATE_BATCH_CHUNK = 200
+
+GAGE_FIELDS = ("gage_id", "name", "serial_number", "model_number", "manufacturer", "gage_type", "location", "cal_category")
+CALIBRATION_FIELDS = (
+    "calibration_id", "gage_id", "calibration_date", "calibrated_by", "calibration_method",
+    "calibration_result", "deviation_recorded", "adjustments_made", "certificate_number",
+    "next_due_date", "comments",
+)
+MEASUREMENT_FIELDS = (
+    "measurement_id", "function_point", "nominal_value", "tolerance_plus", "tolerance_minus",
+    "before_measurement", "after_measurement", "master_gage_id", "temperature", "humidity",
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: workers import only certificate_pdf, not the running app's state
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.CERTIFICATE_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _plain(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    # Decimal keeps its stored scale as text
+    return str(value)
+
+def build_payload(record: CalibrationRecord, gage: Optional[Gage], calibrator: Optional[str]) -> dict:
+    """Everything printed on the certificate, as JSON-safe values"""
+    measurements = list(record.measurements)
+    results = []
+    if measurements:
+        rows = [
+            (m.measurement_id, record.calibration_id, m.gage_id, m.function_point, m.nominal_value,
+             m.tolerance_plus, m.tolerance_minus, m.before_measurement, m.after_measurement)
+            for m in measurements
+        ]
+        evaluation = evaluate_rows(rows)
+        for index in range(len(rows)):
+            if not evaluation["as_left_evaluated"][index]:
+                results.append(None)
+            else:
+                results.append("PASS" if evaluation["as_left_pass"][index] else "FAIL")
+
+    calibration = {name: _plain(getattr(record, name)) for name in CALIBRATION_FIELDS}
+    calibration["calibrated_by_name"] = calibrator
+    return {
+        "template_version": CERTIFICATE_TEMPLATE_VERSION,
+        "gage": {name: _plain(getattr(gage, name, None)) for name in GAGE_FIELDS},
+        "calibration": calibration,
+        "measurements": [
+            {**{name: _plain(getattr(m, name)) for name in MEASUREMENT_FIELDS}, "result": result}
+            for m, result in zip(measurements, results)
+        ],
+    }
+
+def content_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def certificate_path(calibration_id: int, key: str) -> str:
+    return os.path.join(settings.CERTIFICATE_DIR, f"{calibration_id}_{key}.pdf")
+
+def _remove_stale(calibration_id: int, current: str):
+    for path in glob.glob(os.path.join(settings.CERTIFICATE_DIR, f"{calibration_id}_*.pdf")):
+        if path != current:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+async def load_payloads(db: AsyncSession, calibration_ids: List[int]) -> Dict[int, dict]:
+    """Certificate payloads for the given calibrations in three queries"""
+    result = await db.execute(
+        select(CalibrationRecord)
+        .where(CalibrationRecord.calibration_id.in_(calibration_ids))
+        .options(selectinload(CalibrationRecord.measurements))
+    )
+    records = result.scalars().all()
+    gage_ids = {record.gage_id for record in records}
+    user_ids = {record.calibrated_by for record in records}
+
+    result = await db.execute(select(Gage).where(Gage.gage_id.in_(gage_ids)))
+    gages = {gage.gage_id: gage for gage in result.scalars().all()}
+    result = await db.execute(select(User.id, User.username).where(User.id.in_(user_ids)))
+    users = dict(result.all())
+
+    return {
+        record.calibration_id: build_payload(record, gages.get(record.gage_id), users.get(record.calibrated_by))
+        for record in records
+    }
+
+async def _render(payloads: Dict[int, dict], force: bool) -> Dict[int, dict]:
+    """Render uncached payloads in the process pool; returns per-calibration outcome"""
+    os.makedirs(settings.CERTIFICATE_DIR, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    outcomes = {}
+    pending = {}
+    for calibration_id, payload in payloads.items():
+        key = content_hash(payload)
+        path = certificate_path(calibration_id, key)
+        outcomes[calibration_id] = {"calibration_id": calibration_id, "hash": key, "path": path, "cached": True}
+        if force or not os.path.exists(path):
+            outcomes[calibration_id]["cached"] = False
+            pending[calibration_id] = loop.run_in_executor(_get_executor(), render_certificate_file, payload, path)
+
+    results = await asyncio.gather(*pending.values(), return_exceptions=True)
+    for calibration_id, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error rendering certificate for calibration {calibration_id}: {str(result)}")
+            outcomes[calibration_id]["error"] = str(result)
+        else:
+            _remove_stale(calibration_id, outcomes[calibration_id]["path"])
+    return outcomes
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+async def get_certificate(db: AsyncSession, calibration_id: int) -> Optional[dict]:
+    """
+    The current certificate for a calibration, rendering it if needed. The
+    PDF is read into ``content`` here, so a concurrent render that removes
+    this version as stale cannot pull the file out from under the response.
+    """
+    payloads = await load_payloads(db, [calibration_id])
+    if not payloads:
+        return None
+    for attempt in range(2):
+        outcome = (await _render(payloads, force=attempt > 0))[calibration_id]
+        if "error" in outcome:
+            raise RuntimeError(outcome["error"])
+        try:
+            outcome["content"] = await asyncio.to_thread(_read, outcome["path"])
+            break
+        except FileNotFoundError:
+            # Removed by a render from newer data between our check and the read
+            if attempt:
+                raise
+    outcome["certificate_number"] = payloads[calibration_id]["calibration"]["certificate_number"]
+    return outcome
+
+async def render_certificates(db: AsyncSession, calibration_ids: List[int], force: bool = False) -> dict:
+    """Batch mode: bring the certificates of many calibrations up to date"""
+    rendered = cached = 0
+    failed = []
+    found = set()
+    for start in range(0, len(calibration_ids), CERTIFICATE_BATCH_CHUNK):
+        payloads = await load_payloads(db, calibration_ids[start:start + CERTIFICATE_BATCH_CHUNK])
+        found.update(payloads)
+        for outcome in (await _render(payloads, force)).values():
+            if "error" in outcome:
+                failed.append(outcome["calibration_id"])
+            elif outcome["cached"]:
+                cached += 1
+            else:
+                rendered += 1
+    return {
+        "requested": len(calibration_ids),
+        "rendered": rendered,
+        "cached": cached,
+        "failed": failed,
+        "not_found": sorted(set(calibration_ids) - found),
+    }
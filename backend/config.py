@@ -14,18 +14,72 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "gage_calibration")
     
+    # Connection pool settings (async engine used by the API)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    
     # Email settings
     SMTP_SERVER: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     EMAIL_FROM: str = os.getenv("EMAIL_FROM", "")
+    SMTP_USE_TLS: bool = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    
+    # Notification outbox settings
+    NOTIFICATION_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_BATCH_SIZE", "50"))
+    NOTIFICATION_POLL_INTERVAL: float = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "30"))
+    NOTIFICATION_MAX_ATTEMPTS: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+    NOTIFICATION_RETRY_BASE_SECONDS: int = int(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "60"))
+    # Receives due digests for gages with no calibrator when there are no admin users
+    NOTIFICATION_FALLBACK_EMAIL: str = os.getenv("NOTIFICATION_FALLBACK_EMAIL", "")
+    # A claimed batch not recorded within this time is picked up again
+    NOTIFICATION_LEASE_SECONDS: int = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "300"))
     
     # JWT settings
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     
+    # Calibration interval optimization
+    DRIFT_RELIABILITY_TARGET: float = float(os.getenv("DRIFT_RELIABILITY_TARGET", "0.95"))
+    DRIFT_MIN_INTERVAL_DAYS: int = int(os.getenv("DRIFT_MIN_INTERVAL_DAYS", "30"))
+    DRIFT_MAX_INTERVAL_DAYS: int = int(os.getenv("DRIFT_MAX_INTERVAL_DAYS", "730"))
+    
+    # Gage checkouts without an expected return date are due back after this many days
+    CHECKOUT_LOAN_DAYS: int = int(os.getenv("CHECKOUT_LOAN_DAYS", "14"))
+    
+    # Live events (server-sent events)
+    EVENTS_KEEPALIVE_SECONDS: int = int(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+    EVENTS_QUEUE_SIZE: int = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    # Lifetime of the single-purpose token EventSource passes in the URL
+    EVENTS_TOKEN_TTL_SECONDS: int = int(os.getenv("EVENTS_TOKEN_TTL_SECONDS", "60"))
+    
+    # Calibration certificates
+    CERTIFICATE_DIR: str = os.getenv("CERTIFICATE_DIR", os.path.join(os.path.dirname(__file__), "certificates"))
+    CERTIFICATE_RENDER_WORKERS: int = int(os.getenv("CERTIFICATE_RENDER_WORKERS", str(os.cpu_count() or 2)))
+    
+    # Label rendering
+    LABEL_RENDER_WORKERS: int = int(os.getenv("LABEL_RENDER_WORKERS", str(os.cpu_count() or 2)))
+    LABEL_PNG_DPI: int = int(os.getenv("LABEL_PNG_DPI", "300"))
+    LABEL_ZPL_DPI: int = int(os.getenv("LABEL_ZPL_DPI", "203"))
+    # Base URL encoded in label QR codes
+    LABEL_QR_BASE_URL: str = os.getenv("LABEL_QR_BASE_URL", "http://127.0.0.1:5005")
+    # Label template lookups; bounds how long other workers serve an edited template
+    TEMPLATE_CACHE_TTL_SECONDS: int = int(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", "300"))
+    TEMPLATE_CACHE_MAX_SIZE: int = int(os.getenv("TEMPLATE_CACHE_MAX_SIZE", "512"))
+    
+    # Password hashing
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", "16"))
+    
+    # Authenticated user cache
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+    
     # CORS settings
     CORS_ORIGINS: List[str] = ["http://127.0.0.1:5005", "http://localhost:5005"]
     
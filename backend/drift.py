@@ -0,0 +1,254 @@
+"""Drift-rate fitting and calibration interval recommendations.
+
+For every (gage, function point) series, each pair of consecutive
+calibrations gives one drift observation: the as-found deviation at a
+calibration minus the as-left deviation at the previous one, over the days
+between them. The drift rate is the least-squares slope through the origin
+of those observations, and the scatter around it is treated as a random walk
+(variance growing linearly with time). The recommended interval is the
+longest time for which
+
+    |as-left offset| + |rate| * t + z * sigma * sqrt(t) <= tolerance
+
+holds, where z is the one-sided normal quantile of the reliability target.
+A gage's recommendation is its most constraining function point, clamped to
+the configured bounds.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, delete
+from sqlalchemy.dialects.postgresql import insert
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+import numpy as np
+
+from config import get_settings
+from models import CalibrationMeasurement, CalibrationRecord, Gage, GageDriftAnalysis
+
+settings = get_settings()
+
+# Gages per history query in the fleet job; keeps IN lists and memory bounded
+FLEET_CHUNK_SIZE = 2000
+# One observation fits a rate but says nothing about its scatter
+MIN_OBSERVATIONS = 2
+
+def _clean(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else value
+
+def fit_drift(rows: List[tuple], reliability: float) -> Dict[int, dict]:
+    """
+    Fit drift for history rows ordered by gage, function point and date:
+    (gage_id, function_point, calibration_date, nominal, tolerance_plus,
+    tolerance_minus, before, after). Returns per-gage function point results.
+    """
+    if not rows:
+        return {}
+
+    codes = {}
+    series = np.array([codes.setdefault((row[0], row[1]), len(codes)) for row in rows], dtype=np.int64)
+    count = len(codes)
+    days = np.array([row[2].toordinal() for row in rows], dtype=float)
+    nominal = np.array([row[3] for row in rows], dtype=float)
+    tol_plus = np.abs(np.array([row[4] for row in rows], dtype=float))
+    tol_minus = np.abs(np.array([row[5] for row in rows], dtype=float))
+    before = np.array([row[6] for row in rows], dtype=float)
+    after = np.array([row[7] for row in rows], dtype=float)
+    after = np.where(np.isnan(after), before, after)
+
+    # One observation per consecutive pair of calibrations in the same series
+    dt = days[1:] - days[:-1]
+    delta = before[1:] - after[:-1]
+    valid = (series[1:] == series[:-1]) & (dt > 0) & ~np.isnan(delta)
+    group = series[1:][valid]
+    dt = dt[valid]
+    delta = delta[valid]
+
+    observations = np.bincount(group, minlength=count)
+    sxy = np.bincount(group, weights=delta * dt, minlength=count)
+    sxx = np.bincount(group, weights=dt * dt, minlength=count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(observations > 0, sxy / sxx, np.nan)
+        residual = delta - rate[group] * dt
+        variance = np.bincount(group, weights=residual ** 2 / dt, minlength=count) / np.maximum(observations - 1, 1)
+    sigma = np.sqrt(variance)
+
+    # Latest calibration of each series sets the starting offset and limit
+    last = np.flatnonzero(np.append(series[1:] != series[:-1], True))
+    offset = np.abs(after[last] - nominal[last])
+    limit = np.where(rate >= 0, tol_plus[last], tol_minus[last])
+    headroom = limit - offset
+
+    # Solve |rate| u^2 + z sigma u - headroom = 0 for u = sqrt(t)
+    z = NormalDist().inv_cdf(reliability)
+    a = np.abs(rate)
+    b = z * sigma
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = np.where(
+            a > 0,
+            (-b + np.sqrt(b * b + 4 * a * headroom)) / (2 * a),
+            headroom / b
+        )
+    days_to_limit = np.where(headroom <= 0, 0.0, root ** 2)
+    days_to_limit = np.where(observations >= MIN_OBSERVATIONS, days_to_limit, np.nan)
+
+    results: Dict[int, dict] = {}
+    for (gage_id, function_point), code in codes.items():
+        results.setdefault(gage_id, {"function_points": []})["function_points"].append({
+            "function_point": function_point,
+            "intervals_observed": int(observations[code]),
+            "drift_per_day": _clean(rate[code]),
+            "sigma_per_sqrt_day": _clean(sigma[code]) if observations[code] >= MIN_OBSERVATIONS else None,
+            "as_left_offset": _clean(offset[code]),
+            "tolerance_limit": _clean(limit[code]),
+            "predicted_days_to_limit": _clean(days_to_limit[code]),
+        })
+    return results
+
+def recommend_interval(function_points: List[dict], current_interval: Optional[int]) -> Optional[int]:
+    """Most constraining function point, clamped; unchanged if nothing could be fitted"""
+    fitted = [fp for fp in function_points if fp["intervals_observed"] >= MIN_OBSERVATIONS]
+    if not fitted:
+        return current_interval
+    limits = [fp["predicted_days_to_limit"] for fp in fitted if fp["predicted_days_to_limit"] is not None]
+    # No finite limit means no measurable drift
+    days = min(limits) if limits else settings.DRIFT_MAX_INTERVAL_DAYS
+    return int(min(max(days, settings.DRIFT_MIN_INTERVAL_DAYS), settings.DRIFT_MAX_INTERVAL_DAYS))
+
+async def invalidate_gage_drift(db: AsyncSession, gage_ids: Iterable[Optional[int]]) -> None:
+    """
+    Drop stored analyses of ``gage_ids``. The fingerprint only notices added
+    and removed measurements, so routes that edit measurements or calibration
+    dates call this before committing.
+    """
+    gage_ids = {gage_id for gage_id in gage_ids if gage_id is not None}
+    if gage_ids:
+        await db.execute(delete(GageDriftAnalysis).where(GageDriftAnalysis.gage_id.in_(gage_ids)))
+
+async def invalidate_calibration_drift(db: AsyncSession, calibration_id: int) -> None:
+    """Drop stored analyses of every gage measured in a calibration"""
+    measured = select(CalibrationMeasurement.gage_id).where(CalibrationMeasurement.calibration_id == calibration_id)
+    await db.execute(delete(GageDriftAnalysis).where(GageDriftAnalysis.gage_id.in_(measured)))
+
+async def _fingerprints(db: AsyncSession, gage_ids: Optional[List[int]] = None) -> Dict[int, tuple]:
+    """(measurement count, highest measurement id) per gage; changes whenever measurements are added or removed"""
+    query = select(
+        CalibrationMeasurement.gage_id,
+        func.count(CalibrationMeasurement.measurement_id),
+        func.max(CalibrationMeasurement.measurement_id)
+    ).where(CalibrationMeasurement.gage_id.isnot(None)).group_by(CalibrationMeasurement.gage_id)
+    if gage_ids is not None:
+        query = query.where(CalibrationMeasurement.gage_id.in_(gage_ids))
+    result = await db.execute(query)
+    return {row[0]: (row[1], row[2]) for row in result.all()}
+
+async def _compute(db: AsyncSession, gage_ids: List[int], fingerprints: Dict[int, tuple], reliability: float) -> Dict[int, dict]:
+    result = await db.execute(
+        select(
+            CalibrationMeasurement.gage_id,
+            CalibrationMeasurement.function_point,
+            CalibrationRecord.calibration_date,
+            CalibrationMeasurement.nominal_value,
+            CalibrationMeasurement.tolerance_plus,
+            CalibrationMeasurement.tolerance_minus,
+            CalibrationMeasurement.before_measurement,
+            CalibrationMeasurement.after_measurement
+        )
+        .join(CalibrationRecord, CalibrationMeasurement.calibration_id == CalibrationRecord.calibration_id)
+        .where(
+            CalibrationMeasurement.gage_id.in_(gage_ids),
+            CalibrationRecord.calibration_date.isnot(None)
+        )
+        .order_by(
+            CalibrationMeasurement.gage_id,
+            CalibrationMeasurement.function_point,
+            CalibrationRecord.calibration_date,
+            CalibrationMeasurement.measurement_id
+        )
+    )
+    fits = fit_drift(result.all(), reliability)
+
+    result = await db.execute(select(Gage.gage_id, Gage.calibration_frequency).where(Gage.gage_id.in_(gage_ids)))
+    current_intervals = dict(result.all())
+
+    now = datetime.utcnow()
+    analyses = {}
+    rows = []
+    for gage_id in gage_ids:
+        function_points = fits.get(gage_id, {"function_points": []})["function_points"]
+        analysis = {
+            "gage_id": gage_id,
+            "reliability_target": reliability,
+            "current_interval_days": current_intervals.get(gage_id),
+            "recommended_interval_days": recommend_interval(function_points, current_intervals.get(gage_id)),
+            "function_points": function_points,
+            "computed_at": now.isoformat(),
+        }
+        analyses[gage_id] = analysis
+        measurement_count, last_measurement_id = fingerprints.get(gage_id, (0, None))
+        rows.append({
+            "gage_id": gage_id,
+            "measurement_count": measurement_count,
+            "last_measurement_id": last_measurement_id,
+            "reliability_target": reliability,
+            "result": analysis,
+            "computed_at": now,
+        })
+
+    if rows:
+        statement = insert(GageDriftAnalysis).values(rows)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[GageDriftAnalysis.gage_id],
+            set_={
+                "measurement_count": statement.excluded.measurement_count,
+                "last_measurement_id": statement.excluded.last_measurement_id,
+                "reliability_target": statement.excluded.reliability_target,
+                "result": statement.excluded.result,
+                "computed_at": statement.excluded.computed_at,
+            }
+        ))
+        await db.commit()
+    return analyses
+
+async def _cached_fingerprints(db: AsyncSession, gage_ids: Optional[List[int]] = None) -> Dict[int, tuple]:
+    """What each stored analysis was computed from, without loading the results"""
+    query = select(
+        GageDriftAnalysis.gage_id,
+        GageDriftAnalysis.measurement_count,
+        GageDriftAnalysis.last_measurement_id,
+        GageDriftAnalysis.reliability_target
+    )
+    if gage_ids is not None:
+        query = query.where(GageDriftAnalysis.gage_id.in_(gage_ids))
+    result = await db.execute(query)
+    return {row[0]: tuple(row[1:]) for row in result.all()}
+
+async def get_gage_drift(db: AsyncSession, gage_id: int, reliability: Optional[float] = None) -> dict:
+    """Drift analysis for one gage, recomputed only if its measurements changed"""
+    reliability = reliability or settings.DRIFT_RELIABILITY_TARGET
+    fingerprint = (await _fingerprints(db, [gage_id])).get(gage_id, (0, None))
+    cached = (await _cached_fingerprints(db, [gage_id])).get(gage_id)
+    if cached == (*fingerprint, reliability):
+        result = await db.execute(select(GageDriftAnalysis.result).where(GageDriftAnalysis.gage_id == gage_id))
+        return result.scalar_one()
+    analyses = await _compute(db, [gage_id], {gage_id: fingerprint}, reliability)
+    return analyses[gage_id]
+
+async def refresh_fleet_drift(db: AsyncSession, reliability: Optional[float] = None) -> dict:
+    """Recompute drift for every gage whose measurements changed since the last run"""
+    reliability = reliability or settings.DRIFT_RELIABILITY_TARGET
+    fingerprints = await _fingerprints(db)
+    cached = await _cached_fingerprints(db)
+    stale = [
+        gage_id for gage_id, fingerprint in fingerprints.items()
+        if cached.get(gage_id) != (*fingerprint, reliability)
+    ]
+    for start in range(0, len(stale), FLEET_CHUNK_SIZE):
+        await _compute(db, stale[start:start + FLEET_CHUNK_SIZE], fingerprints, reliability)
+    return {
+        "gages_with_measurements": len(fingerprints),
+        "recomputed": len(stale),
+        "unchanged": len(fingerprints) - len(stale),
+        "reliability_target": reliability,
+    }
@@ -0,0 +1,134 @@
+"""Calibration-due dashboard summary.
+
+On PostgreSQL the summary is read from ``gage_due_counts``, which triggers on
+``gages`` keep current in the same transaction as every gage write, so any
+path that moves a due date (the gage routes, calibration writes, imports)
+refreshes it incrementally. Counts are stored per due date rather than per
+bucket, so the overdue / due-in-N-days windows are applied at query time and
+never go stale as days pass.
+
+Other databases (SQLite when testing) aggregate the ``gages`` table directly.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, case, delete, insert, text
+from typing import List, Optional
+from datetime import date, timedelta
+import logging
+
+from models import Gage, GageDueCount
+
+logger = logging.getLogger(__name__)
+
+# Upcoming windows reported by the dashboard, in days from today
+DUE_WINDOWS = (7, 30, 90)
+GROUP_COLUMNS = ("location", "gage_type", "cal_category")
+
+def _uses_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+async def _lock_gages(db: AsyncSession) -> None:
+    # Holds off gage writes (and their triggers) until the rebuild commits. SHARE ROW
+    # EXCLUSIVE conflicts with itself, so concurrent rebuilds (API workers starting
+    # together) run one after another instead of inserting the same groups twice
+    await db.execute(text("LOCK TABLE gages IN SHARE ROW EXCLUSIVE MODE"))
+
+async def _rebuild(db: AsyncSession) -> int:
+    await db.execute(delete(GageDueCount))
+    keys = [
+        func.coalesce(Gage.location, ""),
+        func.coalesce(Gage.gage_type, ""),
+        func.coalesce(Gage.cal_category, ""),
+        Gage.next_calibration_due
+    ]
+    grouped = select(*keys, func.count()).where(Gage.next_calibration_due.isnot(None)).group_by(*keys)
+    result = await db.execute(
+        insert(GageDueCount).from_select(
+            ["location", "gage_type", "cal_category", "due_date", "gage_count"], grouped
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+async def rebuild_due_counts(db: AsyncSession) -> int:
+    """Recompute gage_due_counts from scratch; returns the number of groups"""
+    await _lock_gages(db)
+    return await _rebuild(db)
+
+async def ensure_due_counts(db: AsyncSession) -> None:
+    """Populate gage_due_counts once for databases that had gages before the table existed"""
+    if not _uses_postgres(db):
+        return
+    result = await db.execute(select(GageDueCount.due_date).limit(1))
+    if result.first() is not None:
+        return
+    result = await db.execute(select(Gage.gage_id).where(Gage.next_calibration_due.isnot(None)).limit(1))
+    if result.first() is None:
+        return
+    await _lock_gages(db)
+    # Another worker may have built it while this one waited for the lock
+    result = await db.execute(select(GageDueCount.due_date).limit(1))
+    if result.first() is not None:
+        await db.rollback()
+        return
+    groups = await _rebuild(db)
+    logger.info(f"Built calibration due summary: {groups} groups")
+
+async def get_due_summary(
+    db: AsyncSession,
+    group_by: List[str],
+    today: Optional[date] = None,
+    location: Optional[str] = None,
+    gage_type: Optional[str] = None,
+    cal_category: Optional[str] = None
+) -> dict:
+    """
+    Overdue and due-within-N-days counts, grouped by any of GROUP_COLUMNS.
+    Windows are cumulative and exclude overdue gages: ``due_30`` counts gages
+    due from today through today + 30 days.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=max(DUE_WINDOWS))
+
+    if _uses_postgres(db):
+        # Stored '' back to NULL so both backends report the same groups
+        columns = {name: func.nullif(getattr(GageDueCount, name), "") for name in GROUP_COLUMNS}
+        due = GageDueCount.due_date
+        weight = GageDueCount.gage_count
+        filters = {name: getattr(GageDueCount, name) for name in GROUP_COLUMNS}
+        blank = ""
+    else:
+        columns = {name: getattr(Gage, name) for name in GROUP_COLUMNS}
+        due = Gage.next_calibration_due
+        weight = 1
+        filters = columns
+        blank = None
+
+    counts = [func.coalesce(func.sum(case((due < today, weight), else_=0)), 0).label("overdue")]
+    for days in DUE_WINDOWS:
+        window = (due >= today) & (due <= today + timedelta(days=days))
+        counts.append(func.coalesce(func.sum(case((window, weight), else_=0)), 0).label(f"due_{days}"))
+
+    keys = [columns[name].label(name) for name in group_by]
+    query = select(*keys, *counts).where(due <= horizon)
+    for name, value in (("location", location), ("gage_type", gage_type), ("cal_category", cal_category)):
+        if value is not None:
+            query = query.where(filters[name] == (value or blank))
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    result = await db.execute(query)
+    rows = [dict(row._mapping) for row in result.all()]
+    count_names = ["overdue"] + [f"due_{days}" for days in DUE_WINDOWS]
+    if keys:
+        rows = [row for row in rows if any(row[name] for name in count_names)]
+        totals = {name: sum(row[name] for row in rows) for name in count_names}
+    else:
+        totals = rows[0] if rows else {name: 0 for name in count_names}
+        rows = []
+    return {
+        "as_of": today.isoformat(),
+        "group_by": group_by,
+        "totals": {name: int(totals[name]) for name in count_names},
+        "groups": [{**row, **{name: int(row[name]) for name in count_names}} for row in rows],
+    }
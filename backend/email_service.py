@@ -2,10 +2,15 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import get_settings
-from sqlalchemy.orm import Session
-from models import User, CalibrationRecord, Gage
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, and_, or_, func
+from models import User, CalibrationRecord, Gage, NotificationOutbox, AsyncSessionLocal
+from live_events import publish
+from typing import List, Optional
+import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 settings = get_settings()
 
@@ -13,50 +18,98 @@ settings = get_settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_user_email(db: Session, user_id: int) -> str:
+async def get_user_email(db: AsyncSession, user_id: int) -> str:
     """Get user's email from the database"""
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        result = await db.execute(select(User.email).where(User.id == user_id))
+        email = result.scalar_one_or_none()
+        if not email:
             logger.error(f"User with ID {user_id} not found")
             return None
-        return user.email
+        return email
     except Exception as e:
         logger.error(f"Error getting user email: {str(e)}")
         return None
 
-def send_calibration_notification(db: Session, calibration_id: int) -> bool:
-    """Send email notification for a calibration record"""
+def email_configured() -> bool:
+    """Check the settings required to deliver mail; SMTP auth is optional"""
+    return all([settings.SMTP_SERVER, settings.SMTP_PORT, settings.EMAIL_FROM])
+
+def _build_message(recipient: str, subject: str, body: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = settings.EMAIL_FROM
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def _send_batch(messages: List[MIMEMultipart]) -> List[Optional[str]]:
+    """
+    Deliver messages over a single SMTP connection, authenticating once.
+    Returns one entry per attempted message: None on success, otherwise the
+    error text. The list is cut short if the server drops the connection.
+    Blocking; call through a worker thread from async code.
+    """
+    errors = []
+    with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
+        if settings.SMTP_USE_TLS:
+            server.starttls()
+        if settings.SMTP_USERNAME:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        for msg in messages:
+            try:
+                server.send_message(msg)
+                errors.append(None)
+            except smtplib.SMTPServerDisconnected:
+                break
+            except smtplib.SMTPException as e:
+                errors.append(str(e))
+    return errors
+
+async def enqueue_email(
+    db: AsyncSession,
+    recipient: str,
+    subject: str,
+    body: str,
+    calibration_id: Optional[int] = None
+) -> NotificationOutbox:
+    """Add a message to the outbox; the caller commits"""
+    item = NotificationOutbox(
+        calibration_id=calibration_id,
+        recipient=recipient,
+        subject=subject,
+        body=body
+    )
+    db.add(item)
+    return item
+
+async def enqueue_calibration_notification(db: AsyncSession, calibration_id: int) -> Optional[NotificationOutbox]:
+    """Queue an email notification for a calibration record"""
     try:
         # Get calibration record with gage details
-        calibration = db.query(CalibrationRecord).filter(CalibrationRecord.calibration_id == calibration_id).first()
+        result = await db.execute(select(CalibrationRecord).where(CalibrationRecord.calibration_id == calibration_id))
+        calibration = result.scalar_one_or_none()
         if not calibration:
             logger.error(f"Calibration record with ID {calibration_id} not found")
-            return False
+            return None
 
         # Get gage details
-        gage = db.query(Gage).filter(Gage.gage_id == calibration.gage_id).first()
+        result = await db.execute(select(Gage).where(Gage.gage_id == calibration.gage_id))
+        gage = result.scalar_one_or_none()
         if not gage:
             logger.error(f"Gage with ID {calibration.gage_id} not found")
-            return False
+            return None
 
         # Get calibrator's email
-        calibrator_email = get_user_email(db, calibration.calibrated_by)
+        calibrator_email = await get_user_email(db, calibration.calibrated_by)
         if not calibrator_email:
             logger.error(f"No email found for calibrator with ID {calibration.calibrated_by}")
-            return False
+            return None
 
         # Validate email settings
-        if not all([settings.SMTP_SERVER, settings.SMTP_PORT, settings.SMTP_USERNAME, 
-                   settings.SMTP_PASSWORD, settings.EMAIL_FROM]):
+        if not email_configured():
             logger.error("Missing email configuration settings")
-            return False
-
-        # Create email message
-        msg = MIMEMultipart()
-        msg['From'] = settings.EMAIL_FROM
-        msg['To'] = calibrator_email
-        msg['Subject'] = f"Calibration Notification - Gage {gage.name}"
+            return None
 
         # Email body
         body = f"""
@@ -77,31 +130,284 @@ def send_calibration_notification(db: Session, calibration_id: int) -> bool:
         Gage Calibration System
         """
 
-        msg.attach(MIMEText(body, 'plain'))
+        item = await enqueue_email(
+            db,
+            recipient=calibrator_email,
+            subject=f"Calibration Notification - Gage {gage.name}",
+            body=body,
+            calibration_id=calibration.calibration_id
+        )
+        await db.commit()
+        await db.refresh(item)
+        dispatcher.wake()
+        return item
 
-        # Send email
-        logger.info(f"Attempting to send email to {calibrator_email}")
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-            server.send_message(msg)
-            logger.info("Email sent successfully")
-
-        # Update notification status
-        calibration.notification_sent = True
-        calibration.notification_sent_date = datetime.utcnow()
-        calibration.notification_read = False
-        calibration.notification_read_date = None
-        db.commit()
-
-        return True
-
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"SMTP Authentication Error: {str(e)}")
-        return False
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP Error: {str(e)}")
-        return False
     except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
-        return False 
\ No newline at end of file
+        logger.error(f"Error queueing email: {str(e)}")
+        return None
+
+class NotificationDispatcher:
+    """
+    Background worker that drains the notification outbox.
+
+    Each pass leases a batch of due messages (SKIP LOCKED, so several API
+    workers can run a dispatcher side by side) and commits the claim, delivers
+    them over one SMTP connection outside any transaction, then records the
+    outcome. Failed messages are retried with exponential backoff until
+    NOTIFICATION_MAX_ATTEMPTS is reached. Delivery is at least once: a
+    dispatcher that dies before recording leaves its lease to expire, and the
+    batch is sent again.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self._session_factory = session_factory
+        self._wake_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Trigger a dispatch pass without waiting for the poll interval"""
+        self._wake_event.set()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.dispatch_pending()
+            except Exception as e:
+                logger.error(f"Error dispatching notifications: {str(e)}")
+                claimed = 0
+            # A full batch means more may be waiting; go again straight away
+            if claimed >= settings.NOTIFICATION_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=settings.NOTIFICATION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    async def _claim(self) -> List[dict]:
+        """
+        Lease a batch of due messages in a short transaction of its own, so no
+        rows stay locked and no connection is held while mail is transferred.
+        Messages whose lease ran out (a dispatcher died mid-send) are due again,
+        unless that was their last attempt; those are marked failed instead.
+        """
+        now = datetime.utcnow()
+        lease_expired = and_(NotificationOutbox.status == "sending", NotificationOutbox.lease_expires_at <= now)
+        async with self._session_factory() as db:
+            result = await db.execute(
+                update(NotificationOutbox)
+                .where(lease_expired, NotificationOutbox.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS)
+                .values(status="failed", last_error="Lease expired on the last attempt", lease_expires_at=None)
+                .returning(NotificationOutbox.id, NotificationOutbox.recipient)
+            )
+            for outbox_id, recipient in result.all():
+                logger.error(f"Giving up on notification {outbox_id} to {recipient}: lease expired on the last attempt")
+
+            result = await db.execute(
+                select(NotificationOutbox)
+                .where(or_(
+                    and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+                    and_(lease_expired, NotificationOutbox.attempts < settings.NOTIFICATION_MAX_ATTEMPTS)
+                ))
+                .order_by(NotificationOutbox.id)
+                .limit(settings.NOTIFICATION_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            items = result.scalars().all()
+            lease_expires_at = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+            claimed = []
+            for item in items:
+                # Counted at claim time, so a message that keeps killing its dispatcher still runs out of attempts
+                item.attempts += 1
+                item.status = "sending"
+                item.lease_expires_at = lease_expires_at
+                claimed.append({
+                    "id": item.id, "calibration_id": item.calibration_id, "recipient": item.recipient,
+                    "subject": item.subject, "body": item.body, "attempts": item.attempts,
+                    "lease_expires_at": lease_expires_at,
+                })
+            await db.commit()
+            return claimed
+
+    async def _record(self, claimed: List[dict], errors: List[Optional[str]]):
+        """Store delivery outcomes for messages this dispatcher still holds the lease on"""
+        now = datetime.utcnow()
+        async with self._session_factory() as db:
+            sent_calibration_ids = []
+            for item, error in zip(claimed, errors):
+                still_leased = and_(
+                    NotificationOutbox.id == item["id"],
+                    NotificationOutbox.status == "sending",
+                    NotificationOutbox.lease_expires_at == item["lease_expires_at"]
+                )
+                if error is None:
+                    values = {"status": "sent", "sent_at": now, "last_error": None, "lease_expires_at": None}
+                elif item["attempts"] >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                    values = {"status": "failed", "last_error": error, "lease_expires_at": None}
+                    logger.error(f"Giving up on notification {item['id']} to {item['recipient']}: {error}")
+                else:
+                    delay = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (item["attempts"] - 1)
+                    values = {
+                        "status": "pending", "last_error": error, "lease_expires_at": None,
+                        "next_attempt_at": now + timedelta(seconds=delay),
+                    }
+                result = await db.execute(update(NotificationOutbox).where(still_leased).values(**values))
+                if result.rowcount == 0:
+                    logger.warning(f"Lease on notification {item['id']} expired during delivery")
+                elif error is None and item["calibration_id"] is not None:
+                    sent_calibration_ids.append(item["calibration_id"])
+
+            # Update notification status
+            if sent_calibration_ids:
+                result = await db.execute(
+                    update(CalibrationRecord)
+                    .where(CalibrationRecord.calibration_id.in_(sent_calibration_ids))
+                    .values(
+                        notification_sent=True,
+                        notification_sent_date=now,
+                        notification_read=False,
+                        notification_read_date=None
+                    )
+                    .returning(CalibrationRecord.calibration_id, CalibrationRecord.gage_id, CalibrationRecord.calibrated_by)
+                )
+                for calibration_id, gage_id, user_id in result.all():
+                    if user_id is not None:
+                        await publish(db, "notification", user_id=user_id, calibration_id=calibration_id, gage_id=gage_id)
+            await db.commit()
+
+    async def dispatch_pending(self) -> int:
+        """Deliver one batch of due outbox messages; returns how many were attempted"""
+        claimed = await self._claim()
+        if not claimed:
+            return 0
+
+        # No transaction is open while the SMTP exchange runs
+        messages = [_build_message(item["recipient"], item["subject"], item["body"]) for item in claimed]
+        try:
+            errors = await asyncio.to_thread(_send_batch, messages)
+        except Exception as e:
+            logger.error(f"SMTP Error: {str(e)}")
+            errors = [str(e)] * len(claimed)
+        # Messages after a dropped connection were never attempted
+        errors += ["Connection closed before delivery"] * (len(claimed) - len(errors))
+
+        await self._record(claimed, errors)
+        logger.info(f"Dispatched {len(claimed)} notifications, {len(claimed) - errors.count(None)} failed")
+        return len(claimed)
+
+dispatcher = NotificationDispatcher()
+
+async def enqueue_due_digests(
+    db: AsyncSession,
+    days_ahead: int = 30,
+    include_overdue: bool = True,
+    gage_ids: Optional[List[int]] = None
+) -> dict:
+    """
+    Queue one digest per recipient listing gages whose calibration falls due
+    within ``days_ahead`` days. A gage's recipient is the user who performed
+    its most recent calibration; gages with no calibration history go to the
+    admin users, or to NOTIFICATION_FALLBACK_EMAIL when there are none.
+    """
+    today = datetime.utcnow().date()
+    window_end = today + timedelta(days=days_ahead)
+
+    # Latest calibrator per gage, ranked with ROW_NUMBER() so every backend agrees on it
+    rank = func.row_number().over(
+        partition_by=CalibrationRecord.gage_id,
+        order_by=(CalibrationRecord.calibration_date.desc().nulls_last(), CalibrationRecord.calibration_id.desc())
+    )
+    ranked = select(CalibrationRecord.gage_id, CalibrationRecord.calibrated_by, rank.label("rank")).subquery()
+    latest = select(ranked.c.gage_id, ranked.c.calibrated_by).where(ranked.c.rank == 1).subquery()
+    query = (
+        select(
+            Gage.gage_id,
+            Gage.name,
+            Gage.serial_number,
+            Gage.location,
+            Gage.next_calibration_due,
+            User.email
+        )
+        .outerjoin(latest, latest.c.gage_id == Gage.gage_id)
+        .outerjoin(User, User.id == latest.c.calibrated_by)
+        .where(Gage.next_calibration_due <= window_end)
+        .order_by(Gage.next_calibration_due, Gage.gage_id)
+    )
+    if not include_overdue:
+        query = query.where(Gage.next_calibration_due >= today)
+    if gage_ids:
+        query = query.where(Gage.gage_id.in_(gage_ids))
+
+    result = await db.execute(query)
+    rows = result.all()
+
+    digests = {}
+    unassigned = [row for row in rows if not row.email]
+    for row in rows:
+        if row.email:
+            digests.setdefault(row.email, []).append(row)
+    undelivered = 0
+    if unassigned:
+        result = await db.execute(select(User.email).where(User.role == "admin", User.email.isnot(None)))
+        fallback = [email for email in result.scalars().all() if email]
+        if not fallback and settings.NOTIFICATION_FALLBACK_EMAIL:
+            fallback = [settings.NOTIFICATION_FALLBACK_EMAIL]
+        if not fallback:
+            undelivered = len(unassigned)
+            logger.warning(
+                f"No calibrator, admin or NOTIFICATION_FALLBACK_EMAIL to notify for {undelivered} due gage(s): "
+                f"{', '.join(str(row.gage_id) for row in unassigned[:20])}{' ...' if undelivered > 20 else ''}"
+            )
+        for email in fallback:
+            digests.setdefault(email, []).extend(unassigned)
+
+    for recipient, gages in digests.items():
+        lines = []
+        for gage in gages:
+            state = "OVERDUE" if gage.next_calibration_due < today else "due"
+            lines.append(
+                f"        - {gage.name} (ID: {gage.gage_id}, S/N: {gage.serial_number}, "
+                f"Location: {gage.location}): {state} {gage.next_calibration_due}"
+            )
+        body = f"""
+        Hello,
+
+        The following {len(gages)} gage(s) are due for calibration by {window_end}:
+
+""" + "\n".join(lines) + """
+
+        Please schedule these calibrations.
+
+        Best regards,
+        Gage Calibration System
+        """
+        await enqueue_email(
+            db,
+            recipient=recipient,
+            subject=f"Calibration Due Summary - {len(gages)} gage(s)",
+            body=body
+        )
+    await db.commit()
+    if digests:
+        dispatcher.wake()
+
+    return {
+        "gages": len(rows),
+        "recipients": len(digests),
+        "unassigned_gages": len(unassigned),
+        "undelivered_gages": undelivered,
+        "window_end": window_end.isoformat()
+    }
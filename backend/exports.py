@@ -0,0 +1,227 @@
+"""Streaming CSV and XLSX writers for fleet-wide report exports.
+
+Rows are pulled from a server-side cursor in ``yield_per`` partitions and
+encoded straight into response chunks, so memory use depends on the
+partition size and not on how many rows the export holds.
+
+XLSX output is written as a zip stream (data descriptors, no seeking) with
+inline strings, so it needs no shared-string table and no temporary files.
+"""
+from sqlalchemy.future import select
+from typing import AsyncIterator, Iterable, List, Sequence
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+import csv
+import io
+import logging
+import re
+import zipfile
+
+from models import AsyncSessionLocal, Gage, CalibrationRecord, CalibrationMeasurement, IssueLog
+
+logger = logging.getLogger(__name__)
+
+EXPORT_PARTITION_SIZE = 1000
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# One row per measurement; calibrations without measurements appear once
+CALIBRATION_EXPORT_COLUMNS = [
+    CalibrationRecord.calibration_id,
+    CalibrationRecord.gage_id,
+    Gage.name.label("gage_name"),
+    Gage.serial_number,
+    Gage.location,
+    CalibrationRecord.calibration_date,
+    CalibrationRecord.calibrated_by,
+    CalibrationRecord.calibration_method,
+    CalibrationRecord.calibration_result,
+    CalibrationRecord.certificate_number,
+    CalibrationRecord.next_due_date,
+    CalibrationRecord.comments,
+    CalibrationMeasurement.measurement_id,
+    CalibrationMeasurement.function_point,
+    CalibrationMeasurement.nominal_value,
+    CalibrationMeasurement.tolerance_plus,
+    CalibrationMeasurement.tolerance_minus,
+    CalibrationMeasurement.before_measurement,
+    CalibrationMeasurement.after_measurement,
+    CalibrationMeasurement.master_gage_id,
+    CalibrationMeasurement.temperature,
+    CalibrationMeasurement.humidity,
+]
+
+ISSUE_LOG_EXPORT_COLUMNS = [
+    IssueLog.issue_id,
+    IssueLog.gage_id,
+    Gage.name.label("gage_name"),
+    Gage.serial_number,
+    IssueLog.issue_date,
+    IssueLog.issued_from,
+    IssueLog.issued_to,
+    IssueLog.handled_by,
+    IssueLog.return_date,
+    IssueLog.returned_by,
+    IssueLog.condition_on_return,
+]
+
+def calibration_export_query(date_from=None, date_to=None, gage_id=None):
+    query = (
+        select(*CALIBRATION_EXPORT_COLUMNS)
+        .select_from(CalibrationRecord)
+        .outerjoin(Gage, Gage.gage_id == CalibrationRecord.gage_id)
+        .outerjoin(CalibrationMeasurement, CalibrationMeasurement.calibration_id == CalibrationRecord.calibration_id)
+    )
+    if date_from is not None:
+        query = query.where(CalibrationRecord.calibration_date >= date_from)
+    if date_to is not None:
+        query = query.where(CalibrationRecord.calibration_date <= date_to)
+    if gage_id is not None:
+        query = query.where(CalibrationRecord.gage_id == gage_id)
+    return query.order_by(
+        CalibrationRecord.calibration_date,
+        CalibrationRecord.calibration_id,
+        CalibrationMeasurement.measurement_id
+    )
+
+def issue_log_export_query(date_from=None, date_to=None, gage_id=None):
+    query = select(*ISSUE_LOG_EXPORT_COLUMNS).outerjoin(Gage, Gage.gage_id == IssueLog.gage_id)
+    # Date bounds are inclusive calendar days on issue_date
+    if date_from is not None:
+        query = query.where(IssueLog.issue_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        query = query.where(IssueLog.issue_date < date_to + timedelta(days=1))
+    if gage_id is not None:
+        query = query.where(IssueLog.gage_id == gage_id)
+    return query.order_by(IssueLog.issue_date, IssueLog.issue_id)
+
+def column_names(columns: Sequence) -> List[str]:
+    return [column.key for column in columns]
+
+async def _partitions(query) -> AsyncIterator[Sequence]:
+    """Result rows in partitions from a server-side cursor on a dedicated session"""
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_PARTITION_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+async def stream_csv(query, header: List[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    try:
+        async for partition in _partitions(query):
+            writer.writerows([_text(value) for value in row] for row in partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except Exception as e:
+        # Headers are already sent; abort the response so the download visibly fails
+        logger.error(f"Error streaming CSV export: {str(e)}")
+        raise
+    yield buffer.getvalue()
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def _workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+def _cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    text = _ILLEGAL_XML.sub("", _text(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def _row(values: Iterable) -> str:
+    return "<row>" + "".join(_cell(value) for value in values) + "</row>"
+
+async def stream_xlsx(query, header: List[str], sheet_name: str = "Export") -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _workbook(sheet_name))
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_row(header).encode())
+            try:
+                async for partition in _partitions(query):
+                    sheet.write("".join(_row(row) for row in partition).encode())
+                    yield sink.drain()
+            except Exception as e:
+                # The workbook is never finished, so the client cannot mistake it for a complete export
+                logger.error(f"Error streaming XLSX export: {str(e)}")
+                raise
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
@@ -0,0 +1,203 @@
+"""Ranked typeahead search over the gage inventory.
+
+On PostgreSQL the search runs against the ``ix_gages_search_document`` GIN
+index (full-text, prefix matching per token) and the pg_trgm indexes on
+serial, model and manufacturer (substring and fuzzy matching). Those are
+expression indexes on ``gages``, so PostgreSQL keeps them current on every
+insert and update.
+
+Other databases (SQLite when testing) use ``InMemoryGageIndex``, a
+trigram/prefix index kept in this process and updated by the gage routes.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, or_, desc
+from typing import Dict, List, Optional, Set
+import bisect
+import re
+import threading
+
+from models import Gage, GAGE_SEARCH_DOCUMENT
+
+SEARCH_FIELDS = ("name", "description", "serial_number", "model_number", "manufacturer")
+TRIGRAM_FIELDS = ("serial_number", "model_number", "manufacturer")
+# pg_trgm's default similarity threshold for the % operator
+SIMILARITY_THRESHOLD = 0.3
+RESULT_FIELDS = ("gage_id", "name", "serial_number", "model_number", "manufacturer", "location", "status")
+
+_TOKEN_RE = re.compile(r"[0-9A-Za-z]+")
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return [token.lower() for token in _TOKEN_RE.findall(text or "")]
+
+def _trigrams(text: str) -> Set[str]:
+    # pg_trgm-style padding, so both backends score alike
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+async def _search_postgres(db: AsyncSession, q: str, limit: int) -> List[dict]:
+    tokens = _tokens(q)
+    similarity = func.greatest(
+        func.similarity(Gage.serial_number, q),
+        func.similarity(Gage.model_number, q),
+        func.similarity(Gage.manufacturer, q)
+    )
+    contains = f"%{_escape_like(q)}%"
+    conditions = [
+        Gage.serial_number.ilike(contains),
+        Gage.model_number.ilike(contains),
+        Gage.manufacturer.ilike(contains),
+        Gage.serial_number.op("%")(q),
+        Gage.model_number.op("%")(q),
+        Gage.manufacturer.op("%")(q),
+    ]
+    rank = similarity
+    if tokens:
+        tsquery = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+        conditions.append(GAGE_SEARCH_DOCUMENT.op("@@")(tsquery))
+        rank = rank + func.ts_rank(GAGE_SEARCH_DOCUMENT, tsquery)
+
+    score = rank.label("score")
+    result = await db.execute(
+        select(*[getattr(Gage, name) for name in RESULT_FIELDS], score)
+        .where(or_(*conditions))
+        .order_by(desc("score"), Gage.gage_id)
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+class InMemoryGageIndex:
+    """Trigram and token-prefix index over gage text fields"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._documents: Dict[int, dict] = {}
+        self._document_trigrams: Dict[int, List[Set[str]]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._vocabulary: List[str] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, gages) -> None:
+        with self._lock:
+            self._documents.clear()
+            self._document_trigrams.clear()
+            self._trigrams.clear()
+            self._postings.clear()
+            self._vocabulary.clear()
+            for gage in gages:
+                self._add(gage)
+            self._loaded = True
+
+    def upsert(self, gage) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(gage.gage_id)
+            self._add(gage)
+
+    def remove(self, gage_id: int) -> None:
+        with self._lock:
+            self._remove(gage_id)
+
+    def _add(self, gage) -> None:
+        document = {name: getattr(gage, name) for name in RESULT_FIELDS + SEARCH_FIELDS}
+        self._documents[gage.gage_id] = document
+        for name in SEARCH_FIELDS:
+            for token in _tokens(document[name]):
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    bisect.insort(self._vocabulary, token)
+                self._postings[token].add(gage.gage_id)
+        field_trigrams = [_trigrams(document[name] or "") for name in TRIGRAM_FIELDS]
+        self._document_trigrams[gage.gage_id] = field_trigrams
+        for trigrams in field_trigrams:
+            for trigram in trigrams:
+                self._trigrams.setdefault(trigram, set()).add(gage.gage_id)
+
+    def _remove(self, gage_id: int) -> None:
+        document = self._documents.pop(gage_id, None)
+        if document is None:
+            return
+        for name in SEARCH_FIELDS:
+            for token in _tokens(document[name]):
+                self._postings.get(token, set()).discard(gage_id)
+        for trigrams in self._document_trigrams.pop(gage_id):
+            for trigram in trigrams:
+                self._trigrams.get(trigram, set()).discard(gage_id)
+
+    def _prefix_matches(self, prefix: str) -> Set[int]:
+        ids: Set[int] = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            ids |= self._postings[token]
+        return ids
+
+    def search(self, q: str, limit: int) -> List[dict]:
+        query_trigrams = _trigrams(q)
+        query_tokens = _tokens(q)
+        needle = q.lower()
+        with self._lock:
+            # Only gages sharing a trigram or a token prefix can match
+            candidates: Set[int] = set()
+            for trigram in query_trigrams:
+                candidates |= self._trigrams.get(trigram, set())
+            prefix_hits: Dict[int, int] = {}
+            for token in query_tokens:
+                for gage_id in self._prefix_matches(token):
+                    prefix_hits[gage_id] = prefix_hits.get(gage_id, 0) + 1
+            candidates |= prefix_hits.keys()
+
+            scored = []
+            for gage_id in candidates:
+                document = self._documents[gage_id]
+                similarity = 0.0
+                contains = False
+                for name, value_trigrams in zip(TRIGRAM_FIELDS, self._document_trigrams[gage_id]):
+                    contains = contains or needle in (document[name] or "").lower()
+                    similarity = max(
+                        similarity,
+                        len(query_trigrams & value_trigrams) / len(query_trigrams | value_trigrams)
+                    )
+                hits = prefix_hits.get(gage_id, 0)
+                all_tokens_match = bool(query_tokens) and hits == len(query_tokens)
+                if not (contains or all_tokens_match or similarity >= SIMILARITY_THRESHOLD):
+                    continue
+                score = similarity + (hits / len(query_tokens) if query_tokens else 0.0)
+                scored.append((score, gage_id))
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            return [
+                {**{name: self._documents[gage_id][name] for name in RESULT_FIELDS}, "score": score}
+                for score, gage_id in scored[:limit]
+            ]
+
+memory_index = InMemoryGageIndex()
+
+def _uses_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+async def search_gages(db: AsyncSession, q: str, limit: int = 20) -> List[dict]:
+    if _uses_postgres(db):
+        return await _search_postgres(db, q, limit)
+    if not memory_index.loaded:
+        result = await db.execute(select(Gage))
+        memory_index.load(result.scalars().all())
+    return memory_index.search(q, limit)
+
+def index_gage(db: AsyncSession, gage: Gage) -> None:
+    """Keep the fallback index current after a gage is created or updated"""
+    if not _uses_postgres(db):
+        memory_index.upsert(gage)
+
+def unindex_gage(db: AsyncSession, gage_id: int) -> None:
+    if not _uses_postgres(db):
+        memory_index.remove(gage_id)
@@ -0,0 +1,63 @@
+"""Bulk import gages, calibration records or measurements from a CSV or XLSX file.
+
+Usage: python import_spreadsheet.py {gages,calibrations,measurements} FILE [--dry-run] [--errors errors.csv]
+
+Import gages first, then calibrations, then measurements; later files may
+identify gages by serial_number. Rejected rows are logged (or written to
+--errors) and skipped; everything else is loaded.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import sys
+
+from models import AsyncSessionLocal
+from importer import IMPORT_SCHEMAS, ImportFileError, detect_format, import_rows, iter_rows
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Row errors logged when no --errors file is given
+LOGGED_ERROR_LIMIT = 50
+
+async def main(kind, path, dry_run, errors_path):
+    format = detect_format(path)
+    errors_file = open(errors_path, "w", newline="") if errors_path else None
+    writer = csv.writer(errors_file) if errors_file else None
+    if writer:
+        writer.writerow(["row", "field", "error"])
+    logged = 0
+    try:
+        with open(path, "rb") as handle:
+            async with AsyncSessionLocal() as db:
+                async for event in import_rows(db, kind, iter_rows(handle, format), dry_run):
+                    if event["done"]:
+                        summary = {name: event[name] for name in ("processed", "imported", "failed", "dry_run")}
+                        logger.info(f"Import finished: {summary}")
+                        break
+                    logger.info(f"Processed {event['processed']} rows: {event['imported']} imported, {event['failed']} rejected")
+                    for error in event["errors"]:
+                        for detail in error["errors"]:
+                            field = ".".join(str(part) for part in detail["loc"])
+                            if writer:
+                                writer.writerow([error["row"], field, detail["msg"]])
+                            elif logged < LOGGED_ERROR_LIMIT:
+                                logger.warning(f"Row {error['row']}: {field or 'row'}: {detail['msg']}")
+                                logged += 1
+    finally:
+        if errors_file:
+            errors_file.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=sorted(IMPORT_SCHEMAS))
+    parser.add_argument("file")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and check every row without writing")
+    parser.add_argument("--errors", default=None, help="Write rejected rows to this CSV file")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.kind, args.file, args.dry_run, args.errors))
+    except ImportFileError as e:
+        logger.error(str(e))
+        sys.exit(1)
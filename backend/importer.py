@@ -0,0 +1,239 @@
+"""Streaming bulk import of gages, calibration records and measurements.
+
+Rows are read one at a time from CSV or XLSX (see ``xlsx_reader``), so the
+file is never held in memory. Each chunk of IMPORT_CHUNK_SIZE rows is
+validated against the same create schemas the API uses, checked against the
+database with one set-based query per lookup, and written with multi-row
+INSERTs. Chunks commit independently: a bad row is reported and skipped, and
+rows already loaded stay loaded.
+
+Legacy sheets rarely know gage ids, so calibration and measurement rows may
+give the gage's ``serial_number`` instead of ``gage_id``.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import insert
+from pydantic import ValidationError
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from itertools import islice
+import asyncio
+import csv
+import io
+import logging
+
+from models import Gage, CalibrationRecord, CalibrationMeasurement, User
+from schemas import GageCreate, CalibrationRecordCreate, CalibrationMeasurementCreate
+from calibration_dates import sync_gage_calibration_dates
+from gage_search import index_gage
+from xlsx_reader import XlsxError, iter_xlsx_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows per validation chunk and INSERT statement; keeps bind parameters well under the driver limit
+IMPORT_CHUNK_SIZE = 1000
+# Row errors kept in the final summary; progress events carry every error of their chunk
+IMPORT_ERROR_LIMIT = 1000
+IMPORT_FORMATS = ("csv", "xlsx")
+
+IMPORT_SCHEMAS = {
+    "gages": GageCreate,
+    "calibrations": CalibrationRecordCreate,
+    "measurements": CalibrationMeasurementCreate,
+}
+IMPORT_TABLES = {
+    "gages": Gage,
+    "calibrations": CalibrationRecord,
+    "measurements": CalibrationMeasurement,
+}
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be read (bad encoding, not a workbook, no header)"""
+
+def detect_format(filename: Optional[str]) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ImportFileError(f"Unsupported file type; expected one of {', '.join(IMPORT_FORMATS)}")
+    return extension
+
+def _iter_csv_rows(file: BinaryIO) -> Iterator[Tuple[int, List[Optional[str]]]]:
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    try:
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, values
+    except UnicodeDecodeError:
+        raise ImportFileError(f"CSV file must be UTF-8 encoded (line {reader.line_num + 1})")
+
+def iter_rows(file: BinaryIO, format: str) -> Iterator[Tuple[int, dict]]:
+    """(row number, field dict) for each data row; the first non-empty row is the header"""
+    try:
+        rows = iter_xlsx_rows(file) if format == "xlsx" else _iter_csv_rows(file)
+        header = None
+        for number, values in rows:
+            if header is None:
+                header = [(value or "").strip() for value in values]
+                continue
+            yield number, {
+                key: (value.strip() or None) if value is not None else None
+                for key, value in zip(header, values) if key
+            }
+    except XlsxError as e:
+        raise ImportFileError(str(e))
+    if header is None:
+        raise ImportFileError("File has no header row")
+
+def _error(number: int, message: str, field: Optional[str] = None) -> dict:
+    return {"row": number, "errors": [{"loc": [field] if field else [], "msg": message}]}
+
+async def _existing(db: AsyncSession, column, values: Set) -> Set:
+    if not values:
+        return set()
+    result = await db.execute(select(column).where(column.in_(values)))
+    return set(result.scalars().all())
+
+async def _resolve_serial_numbers(db: AsyncSession, raw: List[Tuple[int, dict]], errors: List[dict]) -> List[Tuple[int, dict]]:
+    """Fill gage_id from serial_number where a row only has the latter"""
+    serials = {row["serial_number"] for _, row in raw if not row.get("gage_id") and row.get("serial_number")}
+    gage_ids: Dict[str, int] = {}
+    if serials:
+        result = await db.execute(select(Gage.serial_number, Gage.gage_id).where(Gage.serial_number.in_(serials)))
+        gage_ids = dict(result.all())
+    resolved = []
+    for number, row in raw:
+        serial = row.pop("serial_number", None)
+        if not row.get("gage_id") and serial:
+            if serial not in gage_ids:
+                errors.append(_error(number, f"No gage with serial number {serial}", "serial_number"))
+                continue
+            row["gage_id"] = gage_ids[serial]
+        resolved.append((number, row))
+    return resolved
+
+async def _check_gages(db, items, errors, seen_serials: Set[str]):
+    existing = await _existing(db, Gage.serial_number, {item.serial_number for _, item in items})
+    accepted = []
+    for number, item in items:
+        if item.serial_number in existing:
+            errors.append(_error(number, "A gage with this serial number already exists.", "serial_number"))
+        elif item.serial_number in seen_serials:
+            errors.append(_error(number, "Serial number appears more than once in the file", "serial_number"))
+        else:
+            seen_serials.add(item.serial_number)
+            accepted.append((number, item))
+    return accepted
+
+async def _check_calibrations(db, items, errors, seen_serials):
+    gages = await _existing(db, Gage.gage_id, {item.gage_id for _, item in items})
+    users = await _existing(db, User.id, {item.calibrated_by for _, item in items})
+    accepted = []
+    for number, item in items:
+        if item.gage_id not in gages:
+            errors.append(_error(number, f"Gage {item.gage_id} not found", "gage_id"))
+        elif item.calibrated_by not in users:
+            errors.append(_error(number, f"User {item.calibrated_by} not found", "calibrated_by"))
+        else:
+            accepted.append((number, item))
+    return accepted
+
+async def _check_measurements(db, items, errors, seen_serials):
+    calibration_ids = {item.calibration_id for _, item in items}
+    result = await db.execute(
+        select(CalibrationRecord.calibration_id, CalibrationRecord.gage_id)
+        .where(CalibrationRecord.calibration_id.in_(calibration_ids))
+    )
+    calibration_gages = dict(result.all())
+    masters = await _existing(db, Gage.gage_id, {item.master_gage_id for _, item in items if item.master_gage_id is not None})
+    accepted = []
+    for number, item in items:
+        if item.calibration_id not in calibration_gages:
+            errors.append(_error(number, f"Calibration record {item.calibration_id} not found", "calibration_id"))
+        elif calibration_gages[item.calibration_id] != item.gage_id:
+            errors.append(_error(number, f"Calibration record {item.calibration_id} belongs to another gage", "gage_id"))
+        elif item.master_gage_id is not None and item.master_gage_id not in masters:
+            errors.append(_error(number, f"Master gage {item.master_gage_id} not found", "master_gage_id"))
+        else:
+            accepted.append((number, item))
+    return accepted
+
+_CHECKS = {
+    "gages": _check_gages,
+    "calibrations": _check_calibrations,
+    "measurements": _check_measurements,
+}
+
+async def _import_chunk(
+    db: AsyncSession,
+    kind: str,
+    raw: List[Tuple[int, dict]],
+    seen_serials: Set[str],
+    dry_run: bool
+) -> Tuple[int, List[dict]]:
+    """Validate, check and insert one chunk; returns (rows imported, row errors)"""
+    errors: List[dict] = []
+    if kind != "gages":
+        raw = await _resolve_serial_numbers(db, raw, errors)
+
+    schema = IMPORT_SCHEMAS[kind]
+    items = []
+    for number, row in raw:
+        try:
+            items.append((number, schema(**row)))
+        except ValidationError as e:
+            errors.append({"row": number, "errors": e.errors()})
+    items = await _CHECKS[kind](db, items, errors, seen_serials)
+
+    if items and not dry_run:
+        table = IMPORT_TABLES[kind]
+        result = await db.execute(
+            insert(table).values([item.dict() for _, item in items]).returning(*table.__table__.columns)
+        )
+        inserted = result.all()
+        if kind == "calibrations":
+            await sync_gage_calibration_dates(db, {row.gage_id for row in inserted})
+        await db.commit()
+        if kind == "gages":
+            for row in inserted:
+                index_gage(db, row)
+    else:
+        await db.rollback()
+    errors.sort(key=lambda error: error["row"])
+    return len(items), errors
+
+async def import_rows(
+    db: AsyncSession,
+    kind: str,
+    rows: Iterator[Tuple[int, dict]],
+    dry_run: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Import ``rows`` (see ``iter_rows``) as ``kind``, yielding a progress event
+    after each chunk with running totals and that chunk's row errors. The last
+    event has ``done`` set and holds up to IMPORT_ERROR_LIMIT errors overall.
+    With ``dry_run`` every check runs but nothing is written.
+    """
+    seen_serials: Set[str] = set()
+    processed = imported = failed = 0
+    kept_errors: List[dict] = []
+    while True:
+        # Parsing is blocking file work; keep it off the event loop
+        raw = await asyncio.to_thread(lambda: list(islice(rows, IMPORT_CHUNK_SIZE)))
+        if not raw:
+            break
+        count, errors = await _import_chunk(db, kind, raw, seen_serials, dry_run)
+        processed += len(raw)
+        imported += count
+        failed += len(errors)
+        kept_errors.extend(errors[:IMPORT_ERROR_LIMIT - len(kept_errors)])
+        yield {"done": False, "processed": processed, "imported": imported, "failed": failed, "errors": errors}
+
+    logger.info(f"Imported {imported} of {processed} {kind} rows ({failed} rejected{', dry run' if dry_run else ''})")
+    yield {
+        "done": True,
+        "kind": kind,
+        "dry_run": dry_run,
+        "processed": processed,
+        "imported": imported,
+        "failed": failed,
+        "errors": kept_errors,
+        "errors_truncated": failed > len(kept_errors),
+    }
@@ -0,0 +1,239 @@
+"""Label layout compilation and PNG / ZPL / PDF rendering.
+
+A label template's ``template_data`` (as saved by the label manager) is
+compiled once into a layout plan: label size in points, and a list of text
+and QR elements with fixed positions and font sizes. Rendering a label is
+then only a matter of filling the plan's text fields with one gage's values.
+
+Kept free of database and application imports so batches can be rendered in
+worker processes.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import io
+import re
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+from pdf_writer import PdfPage, write_pdf, text_width, HELVETICA_CHAR_WIDTH
+
+POINTS_PER_INCH = 72
+# The label manager previews labels at 100 px per inch
+PREVIEW_PX_PER_INCH = 100
+
+LABEL_SIZES = {
+    "2x2": (2, 2), "3x2": (3, 2), "1x1": (1, 1), "4x2": (4, 2), "4x6": (4, 6),
+    "2x0.5": (2, 0.5), "3x1": (3, 1), "2x4": (2, 4), "custom": (2.5, 1.5),
+}
+# Largest font, in points, per font size choice; text shrinks to fit
+FONT_SIZES = {"small": 8, "medium": 10, "large": 12}
+
+# Text lines per layout, as format strings over the label fields
+LAYOUTS = {
+    "standard": ["Equipment ID: {gage_id}{name_suffix}", "{status_line}", "{qr}", "Cal: {calibration_date}", "Due: {next_due_date}"],
+    "external": ["Vendor ID: {gage_id}", "Description: {description}", "Last Calibrated: {calibration_date}"],
+    "compact": ["{gage_id}", "Cal: {calibration_date}", "Due: {next_due_date}"],
+}
+STATUS_COLORS = {"pass": (0.0, 0.5, 0.0), "fail": (0.85, 0.0, 0.0)}
+
+MARGIN_RATIO = 0.04
+LINE_SPACING = 1.25
+
+def _label_size(template_data: dict) -> Tuple[float, float]:
+    size = template_data.get("labelSize") or template_data.get("size") or "2x2"
+    if size in LABEL_SIZES:
+        return LABEL_SIZES[size]
+    match = re.fullmatch(r"\s*([\d.]+)\s*x\s*([\d.]+)\s*", str(size))
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    return LABEL_SIZES["custom"]
+
+def compile_plan(template_data: dict) -> dict:
+    """
+    Compile template_data into a layout plan. Elements are laid out top to
+    bottom and centred; ``y`` is the distance in points from the top edge to
+    the element's top. Plans are plain dicts so they pickle cheaply.
+    """
+    width_in, height_in = _label_size(template_data)
+    width = width_in * POINTS_PER_INCH
+    height = height_in * POINTS_PER_INCH
+    margin = min(width, height) * MARGIN_RATIO
+
+    lines = list(LAYOUTS.get(template_data.get("layout") or "standard", LAYOUTS["standard"]))
+    if not template_data.get("includeBarcode") and "{qr}" in lines:
+        lines.remove("{qr}")
+    if not template_data.get("showStatusColor") and "{status_line}" in lines:
+        lines.remove("{status_line}")
+
+    qr_points = 0.0
+    text_lines = [line for line in lines if line != "{qr}"]
+    font_size = float(FONT_SIZES.get(template_data.get("fontSize"), FONT_SIZES["small"]))
+    available = height - 2 * margin
+    if "{qr}" in lines:
+        qr_px = template_data.get("qr_code_size") or template_data.get("qrCodeSize") or 100
+        qr_points = float(qr_px) * POINTS_PER_INCH / PREVIEW_PX_PER_INCH
+        # Leave at least a small line of text for each text element
+        qr_points = max(0.0, min(qr_points, width - 2 * margin, available - len(text_lines) * 4 * LINE_SPACING))
+    if text_lines:
+        font_size = max(3.0, min(font_size, (available - qr_points) / (len(text_lines) * LINE_SPACING)))
+
+    used = qr_points + len(text_lines) * font_size * LINE_SPACING
+    gap = (available - used) / (len(lines) + 1) if lines else 0.0
+    y = margin + gap
+    elements = []
+    for line in lines:
+        if line == "{qr}":
+            elements.append({"kind": "qr", "y": y, "size": qr_points})
+            y += qr_points + gap
+        else:
+            elements.append({
+                "kind": "text",
+                "template": line,
+                "y": y,
+                "size": font_size,
+                "bold": line == "{status_line}",
+            })
+            y += font_size * LINE_SPACING + gap
+    return {"width": width, "height": height, "margin": margin, "elements": elements}
+
+@lru_cache(maxsize=4096)
+def qr_matrix(data: str) -> Tuple[Tuple[bool, ...], ...]:
+    """QR modules for ``data`` (error correction M, no quiet zone), cached per gage URL"""
+    code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    code.add_data(data)
+    code.make(fit=True)
+    return tuple(tuple(row) for row in code.get_matrix())
+
+def _fields(gage: dict) -> Dict[str, str]:
+    result = gage.get("calibration_result") or ""
+    return {
+        "gage_id": str(gage["gage_id"]),
+        "name_suffix": f" ({gage['name']})" if gage.get("name") else "",
+        "description": gage.get("description") or "N/A",
+        "status_line": f"Status: {result.upper()}" if result else "",
+        "calibration_date": gage.get("calibration_date") or "N/A",
+        "next_due_date": gage.get("next_due_date") or "N/A",
+    }
+
+def _texts(plan: dict, gage: dict) -> List[Tuple[dict, str, float]]:
+    """(element, text, font size) for each text element, shrunk to fit the label width"""
+    fields = _fields(gage)
+    usable = plan["width"] - 2 * plan["margin"]
+    texts = []
+    for element in plan["elements"]:
+        if element["kind"] != "text":
+            continue
+        text = element["template"].format(**fields)
+        size = element["size"]
+        if text and text_width(text, size) > usable:
+            size = max(3.0, usable / (len(text) * HELVETICA_CHAR_WIDTH))
+        texts.append((element, text, size))
+    return texts
+
+def _status_color(gage: dict) -> Optional[Tuple[float, float, float]]:
+    return STATUS_COLORS.get((gage.get("calibration_result") or "").lower())
+
+def _qr_element(plan: dict) -> Optional[dict]:
+    return next((element for element in plan["elements"] if element["kind"] == "qr" and element["size"] > 0), None)
+
+def render_pdf_page(plan: dict, gage: dict) -> PdfPage:
+    page = PdfPage(plan["width"], plan["height"])
+    for element, text, size in _texts(plan, gage):
+        if not text:
+            continue
+        x = (plan["width"] - text_width(text, size)) / 2
+        baseline = plan["height"] - element["y"] - size
+        color = _status_color(gage) if element["bold"] else None
+        page.text(x, baseline, text, size=size, bold=element["bold"], color=color)
+    qr = _qr_element(plan)
+    if qr:
+        matrix = qr_matrix(gage["qr_data"])
+        module = qr["size"] / len(matrix)
+        left = (plan["width"] - qr["size"]) / 2
+        top = plan["height"] - qr["y"]
+        page.rects([
+            (left + col * module, top - (row + 1) * module, module, module)
+            for row, cells in enumerate(matrix) for col, dark in enumerate(cells) if dark
+        ])
+    return page
+
+def render_pdf(plan: dict, gages: List[dict]) -> bytes:
+    """One page per gage"""
+    return write_pdf([render_pdf_page(plan, gage) for gage in gages])
+
+def _zpl_text(text: str) -> str:
+    # ^ and ~ start ZPL commands
+    return text.replace("^", " ").replace("~", " ")
+
+def render_zpl(plan: dict, gage: dict, dpi: int = 203) -> str:
+    scale = dpi / POINTS_PER_INCH
+    width = round(plan["width"] * scale)
+    commands = ["^XA", "^CI28", f"^PW{width}", f"^LL{round(plan['height'] * scale)}"]
+    for element, text, size in _texts(plan, gage):
+        if not text:
+            continue
+        height = max(10, round(size * scale))
+        commands.append(
+            f"^FO0,{round(element['y'] * scale)}^A0N,{height},{height}"
+            f"^FB{width},1,0,C^FD{_zpl_text(text)}^FS"
+        )
+    qr = _qr_element(plan)
+    if qr:
+        # The printer encodes the QR itself; pick the magnification that fits
+        modules = len(qr_matrix(gage["qr_data"]))
+        magnification = max(1, min(10, int(qr["size"] * scale // modules)))
+        left = round((width - modules * magnification) / 2)
+        commands.append(f"^FO{left},{round(qr['y'] * scale)}^BQN,2,{magnification}^FDMA,{_zpl_text(gage['qr_data'])}^FS")
+    commands.append("^XZ")
+    return "\n".join(commands) + "\n"
+
+# PNG labels use a palette image: a quarter of the pixels to encode of RGB
+_PALETTE = [255, 255, 255, 0, 0, 0] + [round(c * 255) for color in STATUS_COLORS.values() for c in color]
+_PALETTE_INDEX = {None: 1, **{name: index + 2 for index, name in enumerate(STATUS_COLORS)}}
+
+@lru_cache(maxsize=64)
+def _font(pixels: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(size=pixels)
+
+@lru_cache(maxsize=1024)
+def _qr_image(data: str, pixels: int) -> Image.Image:
+    """QR code as a paste mask (255 where a module is dark), cached per gage URL and size"""
+    matrix = qr_matrix(data)
+    modules = Image.new("L", (len(matrix), len(matrix)), 0)
+    modules.putdata([255 if dark else 0 for row in matrix for dark in row])
+    return modules.resize((pixels, pixels), Image.NEAREST)
+
+def render_png(plan: dict, gage: dict, dpi: int = 300) -> bytes:
+    scale = dpi / POINTS_PER_INCH
+    image = Image.new("P", (round(plan["width"] * scale), round(plan["height"] * scale)), 0)
+    image.putpalette(_PALETTE)
+    draw = ImageDraw.Draw(image)
+    status = (gage.get("calibration_result") or "").lower()
+    for element, text, size in _texts(plan, gage):
+        if not text:
+            continue
+        ink = _PALETTE_INDEX.get(status, 1) if element["bold"] else 1
+        draw.text(
+            (image.width / 2, element["y"] * scale), text,
+            font=_font(max(1, round(size * scale))), fill=ink, anchor="mt"
+        )
+    qr = _qr_element(plan)
+    if qr:
+        pixels = max(1, round(qr["size"] * scale))
+        mask = _qr_image(gage["qr_data"], pixels)
+        image.paste(1, (round((image.width - pixels) / 2), round(qr["y"] * scale)), mask)
+    output = io.BytesIO()
+    image.save(output, format="PNG", dpi=(dpi, dpi))
+    return output.getvalue()
+
+def render_batch(plan: dict, gages: List[dict], format: str, dpi: int) -> list:
+    """
+    Render a chunk of labels; runs in a worker process. PDF labels come back
+    as pages so the caller can assemble a single document.
+    """
+    if format == "pdf":
+        return [render_pdf_page(plan, gage) for gage in gages]
+    if format == "zpl":
+        return [render_zpl(plan, gage, dpi) for gage in gages]
+    return [render_png(plan, gage, dpi) for gage in gages]
@@ -0,0 +1,152 @@
+"""Server-side label printing.
+
+Templates are compiled into layout plans once per template version (id plus
+updated_at) and kept in an in-process cache. Batches are split into chunks
+and rendered in a process pool; QR matrices are cached per gage URL in each
+process (see ``label_render.qr_matrix``).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import io
+import multiprocessing
+import zipfile
+
+from cache import TTLCache
+from config import get_settings
+from models import Gage, CalibrationRecord, LabelTemplate
+from label_render import compile_plan, render_batch, render_pdf, render_png, render_zpl
+from pdf_writer import write_pdf
+
+settings = get_settings()
+
+LABEL_FORMATS = {
+    "png": "image/png",
+    "zpl": "text/plain",
+    "pdf": "application/pdf",
+}
+# Labels per worker task; large enough to amortize the inter-process hop
+LABEL_BATCH_CHUNK = 50
+LABEL_BATCH_MAX = 5000
+
+# Keyed by (template id, updated_at), so an edited template compiles afresh
+plan_cache = TTLCache(ttl=24 * 3600, maxsize=256)
+# Serialized template responses, keyed by ("id", template id) or ("gage", gage id or None)
+template_cache = TTLCache(ttl=settings.TEMPLATE_CACHE_TTL_SECONDS, maxsize=settings.TEMPLATE_CACHE_MAX_SIZE)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.LABEL_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def get_plan(template: LabelTemplate) -> dict:
+    key = (template.id, template.updated_at)
+    plan = plan_cache.get(key)
+    if plan is None:
+        plan = compile_plan(template.template_data or {})
+        plan_cache.set(key, plan)
+    return plan
+
+def invalidate_template(template_id: Optional[int], gage_id: int) -> None:
+    """Drop cached lookups a template write can change; call after any change to a label_templates row"""
+    if template_id is not None:
+        template_cache.invalidate(("id", template_id))
+    template_cache.invalidate(("gage", gage_id))
+    template_cache.invalidate(("gage", None))
+
+def qr_data(gage_id: int) -> str:
+    # Same target the label manager encodes
+    return f"{settings.LABEL_QR_BASE_URL}/api/calibrations?gage_id={gage_id}"
+
+async def load_label_data(
+    db: AsyncSession,
+    gage_ids: Optional[List[int]] = None,
+    location: Optional[str] = None
+) -> List[dict]:
+    """Label fields for the selected gages, with each gage's latest calibration result"""
+    # Ranked with ROW_NUMBER() so every backend agrees on the latest calibration
+    rank = func.row_number().over(
+        partition_by=CalibrationRecord.gage_id,
+        order_by=(CalibrationRecord.calibration_date.desc().nulls_last(), CalibrationRecord.calibration_id.desc())
+    )
+    latest = select(CalibrationRecord.gage_id, CalibrationRecord.calibration_result, rank.label("rank"))
+    query = select(
+        Gage.gage_id,
+        Gage.name,
+        Gage.description,
+        Gage.last_calibration_date,
+        Gage.next_calibration_due,
+    )
+    if gage_ids is not None:
+        latest = latest.where(CalibrationRecord.gage_id.in_(gage_ids))
+        query = query.where(Gage.gage_id.in_(gage_ids))
+    if location is not None:
+        query = query.where(Gage.location == location)
+    ranked = latest.subquery()
+    latest = select(ranked.c.gage_id, ranked.c.calibration_result).where(ranked.c.rank == 1).subquery()
+    query = query.add_columns(latest.c.calibration_result).outerjoin(latest, latest.c.gage_id == Gage.gage_id)
+
+    result = await db.execute(query.order_by(Gage.gage_id).limit(LABEL_BATCH_MAX + 1))
+    return [
+        {
+            "gage_id": row.gage_id,
+            "name": row.name,
+            "description": row.description,
+            "calibration_date": row.last_calibration_date.isoformat() if row.last_calibration_date else None,
+            "next_due_date": row.next_calibration_due.isoformat() if row.next_calibration_due else None,
+            "calibration_result": row.calibration_result,
+            "qr_data": qr_data(row.gage_id),
+        }
+        for row in result.all()
+    ]
+
+def _render_one(plan: dict, gage: dict, format: str) -> bytes:
+    if format == "pdf":
+        return render_pdf(plan, [gage])
+    if format == "zpl":
+        return render_zpl(plan, gage, settings.LABEL_ZPL_DPI).encode()
+    return render_png(plan, gage, settings.LABEL_PNG_DPI)
+
+async def render_label(plan: dict, gage: dict, format: str) -> bytes:
+    """One label, rendered on a worker thread"""
+    return await asyncio.to_thread(_render_one, plan, gage, format)
+
+async def render_labels(plan: dict, gages: List[dict], format: str) -> Tuple[bytes, str]:
+    """
+    Many labels in one document: a multi-page PDF, a ZPL job with one label
+    per gage, or a zip of PNGs. Returns (content, file extension).
+    """
+    dpi = settings.LABEL_ZPL_DPI if format == "zpl" else settings.LABEL_PNG_DPI
+    loop = asyncio.get_running_loop()
+    chunks = [gages[start:start + LABEL_BATCH_CHUNK] for start in range(0, len(gages), LABEL_BATCH_CHUNK)]
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_get_executor(), render_batch, plan, chunk, format, dpi)
+        for chunk in chunks
+    ])
+    rendered = [item for chunk in results for item in chunk]
+
+    if format == "pdf":
+        return write_pdf(rendered), "pdf"
+    if format == "zpl":
+        return "".join(rendered).encode(), "zpl"
+    output = io.BytesIO()
+    # PNGs are already compressed
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+        for gage, image in zip(gages, rendered):
+            archive.writestr(f"label_{gage['gage_id']}.png", image)
+    return output.getvalue(), "zip"
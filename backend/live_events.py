@@ -0,0 +1,145 @@
+"""Live events pushed to connected clients over server-sent events.
+
+Writers call ``publish`` inside their transaction; on PostgreSQL that is a
+``pg_notify`` on the ``gage_events`` channel, so an event goes out only if
+the transaction commits, and every API worker receives it. Each worker keeps
+one LISTEN connection (``EventHub``) and fans events out to its own
+subscribers from memory, so connected stations cost no database queries
+while they wait.
+
+Events addressed to a user (``user_id`` set) reach only that user's
+streams; the rest go to everyone. Other databases (SQLite when testing)
+deliver within the publishing process, straight away.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from typing import Optional, Set
+import asyncio
+import itertools
+import json
+import logging
+
+import asyncpg
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EVENT_CHANNEL = "gage_events"
+# pg_notify payloads must stay under 8000 bytes; events carry ids, not records
+MAX_PAYLOAD_BYTES = 7900
+
+def _uses_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+class Subscription:
+    """One connected client: its user and a bounded queue of pending events"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def wants(self, event: dict) -> bool:
+        return event.get("user_id") is None or event["user_id"] == self.user_id
+
+class EventHub:
+    """LISTENs on the event channel and hands each event to matching subscriptions"""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self._subscriptions):
+            self.unsubscribe(subscription)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.discard(subscription)
+            # Wakes the stream so it can finish
+            try:
+                subscription.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def deliver(self, event: dict):
+        event = {**event, "id": next(self._ids)}
+        for subscription in list(self._subscriptions):
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind reconnects and reloads instead
+                logger.warning(f"Dropping event stream for user {subscription.user_id}: client is not keeping up")
+                self._subscriptions.discard(subscription)
+                subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.deliver(json.loads(payload))
+        except ValueError:
+            logger.error(f"Ignoring malformed event payload: {payload[:200]}")
+
+    async def _run(self):
+        delay = 1
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(settings.DATABASE_URL)
+                await connection.add_listener(EVENT_CHANNEL, self._on_notify)
+                logger.info(f"Listening for live events on {EVENT_CHANNEL}")
+                delay = 1
+                # A cheap round trip notices a dropped connection
+                while True:
+                    await asyncio.sleep(settings.EVENTS_KEEPALIVE_SECONDS)
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live event listener failed, retrying in {delay}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+hub = EventHub()
+
+async def publish(db: AsyncSession, event_type: str, user_id: Optional[int] = None, **data) -> None:
+    """
+    Queue an event for every worker; sent when ``db`` commits. Call before
+    the commit. ``user_id`` limits delivery to that user's streams.
+    """
+    event = {"type": event_type, "user_id": user_id, **data}
+    if not _uses_postgres(db):
+        hub.deliver(event)
+        return
+    payload = json.dumps(event, default=str, separators=(",", ":"))
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        logger.error(f"Not publishing {event_type} event: payload too large")
+        return
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": EVENT_CHANNEL, "payload": payload})
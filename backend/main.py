@@ -6,7 +6,19 @@ from routers import issue_log
 from routers import label
 from routers import calibration_measurements
 from routers import reports
-from database import init_db, init_async_db
+from routers import notifications
+from routers import analytics
+from routers import dashboard
+from routers import certificate
+from routers import imports
+from routers import events
+from database import init_async_db, AsyncSessionLocal
+from due_summary import ensure_due_counts
+from utilization import ensure_gage_usage
+from email_service import dispatcher
+from live_events import hub as event_hub
+from certificates import shutdown_executor as shutdown_certificate_workers
+from labels import shutdown_executor as shutdown_label_workers
 from config import get_settings
 import logging
 import sys
@@ -38,7 +50,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"]
+    expose_headers=["Content-Disposition", "ETag", "Last-Modified", "X-Next-Cursor"]
 )
 
 # Include routers
@@ -49,18 +61,34 @@ app.include_router(issue_log.router, tags=["Issue Logs"])
 app.include_router(label.router, prefix="/api", tags=["Labels"])
 app.include_router(calibration_measurements.router, prefix="/api", tags=["Calibration Measurements"])
 app.include_router(reports.router, prefix="/api", tags=["Reports"])
+app.include_router(notifications.router, prefix="/api", tags=["Notifications"])
+app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
+app.include_router(dashboard.router, prefix="/api", tags=["Dashboard"])
+app.include_router(certificate.router, prefix="/api", tags=["Certificates"])
+app.include_router(imports.router, prefix="/api", tags=["Imports"])
+app.include_router(events.router, prefix="/api", tags=["Events"])
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     try:
-        # Initialize both sync and async databases
-        init_db()
         await init_async_db()
+        async with AsyncSessionLocal() as db:
+            await ensure_due_counts(db)
+            await ensure_gage_usage(db)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
+    dispatcher.start()
+    event_hub.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await dispatcher.stop()
+    await event_hub.stop()
+    shutdown_certificate_workers()
+    shutdown_label_workers()
 
 @app.get("/")
 async def root():
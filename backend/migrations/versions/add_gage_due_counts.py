@@ -0,0 +1,73 @@
+"""add trigger-maintained gage due counts for the dashboard
+
+Revision ID: add_gage_due_counts
+Revises: add_hot_lookup_indexes
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gage_due_counts'
+down_revision = 'add_hot_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION gage_due_counts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.next_calibration_due IS NOT NULL THEN
+        UPDATE gage_due_counts SET gage_count = gage_count - 1
+        WHERE location = coalesce(OLD.location, '')
+          AND gage_type = coalesce(OLD.gage_type, '')
+          AND cal_category = coalesce(OLD.cal_category, '')
+          AND due_date = OLD.next_calibration_due;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.next_calibration_due IS NOT NULL THEN
+        INSERT INTO gage_due_counts (location, gage_type, cal_category, due_date, gage_count)
+        VALUES (coalesce(NEW.location, ''), coalesce(NEW.gage_type, ''), coalesce(NEW.cal_category, ''),
+                NEW.next_calibration_due, 1)
+        ON CONFLICT (location, gage_type, cal_category, due_date)
+        DO UPDATE SET gage_count = gage_due_counts.gage_count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+def upgrade():
+    op.create_table(
+        'gage_due_counts',
+        sa.Column('location', sa.String(100), primary_key=True),
+        sa.Column('gage_type', sa.String(50), primary_key=True),
+        sa.Column('cal_category', sa.String(50), primary_key=True),
+        sa.Column('due_date', sa.Date(), primary_key=True),
+        sa.Column('gage_count', sa.Integer(), nullable=False),
+    )
+    op.execute(APPLY_FUNCTION)
+    # The initial fill and the triggers go in together so no gage write is missed
+    op.execute("LOCK TABLE gages IN SHARE MODE")
+    op.execute(
+        "INSERT INTO gage_due_counts (location, gage_type, cal_category, due_date, gage_count) "
+        "SELECT coalesce(location, ''), coalesce(gage_type, ''), coalesce(cal_category, ''), "
+        "next_calibration_due, count(*) FROM gages WHERE next_calibration_due IS NOT NULL "
+        "GROUP BY 1, 2, 3, 4"
+    )
+    op.execute(
+        "CREATE TRIGGER gages_due_counts_insert_delete AFTER INSERT OR DELETE ON gages "
+        "FOR EACH ROW EXECUTE FUNCTION gage_due_counts_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER gages_due_counts_update "
+        "AFTER UPDATE OF location, gage_type, cal_category, next_calibration_due ON gages "
+        "FOR EACH ROW WHEN ((OLD.location, OLD.gage_type, OLD.cal_category, OLD.next_calibration_due) "
+        "IS DISTINCT FROM (NEW.location, NEW.gage_type, NEW.cal_category, NEW.next_calibration_due)) "
+        "EXECUTE FUNCTION gage_due_counts_apply()"
+    )
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS gages_due_counts_update ON gages")
+    op.execute("DROP TRIGGER IF EXISTS gages_due_counts_insert_delete ON gages")
+    op.execute("DROP FUNCTION IF EXISTS gage_due_counts_apply()")
+    op.drop_table('gage_due_counts')
@@ -0,0 +1,30 @@
+"""add gage search indexes
+
+Revision ID: add_gage_search_indexes
+Revises: create_gage_drift_analysis
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_gage_search_indexes'
+down_revision = 'create_gage_drift_analysis'
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || "
+    "coalesce(serial_number, '') || ' ' || coalesce(model_number, '') || ' ' || coalesce(manufacturer, ''))"
+)
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_gages_search_document ON gages USING gin ({SEARCH_DOCUMENT})")
+    for column in ('serial_number', 'model_number', 'manufacturer'):
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_gages_{column}_trgm ON gages USING gin ({column} gin_trgm_ops)")
+
+def downgrade():
+    for column in ('serial_number', 'model_number', 'manufacturer'):
+        op.execute(f"DROP INDEX IF EXISTS ix_gages_{column}_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_gages_search_document")
@@ -0,0 +1,35 @@
+"""add monthly gage usage history for utilization analytics
+
+Revision ID: add_gage_usage_periods
+Revises: add_issue_log_checkout_indexes
+Create Date: 2026-10-17 19:00:00.000000
+
+The table is filled on first startup (or by refresh_gage_usage.py) and kept
+current by the issue log routes afterwards.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gage_usage_periods'
+down_revision = 'add_issue_log_checkout_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'gage_usage_periods',
+        sa.Column('gage_id', sa.Integer(), sa.ForeignKey('gages.gage_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('month', sa.Date(), primary_key=True),
+        sa.Column('checkouts', sa.Integer(), nullable=False),
+        sa.Column('busy_seconds', sa.Float(), nullable=False),
+        sa.Column('returns', sa.Integer(), nullable=False),
+        sa.Column('checkout_seconds', sa.Float(), nullable=False),
+        sa.Column('idle_gaps', sa.Integer(), nullable=False),
+        sa.Column('idle_seconds', sa.Float(), nullable=False),
+    )
+    op.create_index('ix_gage_usage_periods_month', 'gage_usage_periods', ['month'])
+
+def downgrade():
+    op.drop_index('ix_gage_usage_periods_month', table_name='gage_usage_periods')
+    op.drop_table('gage_usage_periods')
@@ -0,0 +1,63 @@
+"""add indexes on hot lookup columns and unique gage serial numbers
+
+Revision ID: add_hot_lookup_indexes
+Revises: add_gage_search_indexes
+Create Date: 2026-10-17 10:00:00.000000
+
+Indexes are built CONCURRENTLY so the tables stay writable during the
+upgrade. The unique serial number constraint fails if duplicates exist;
+the upgrade checks first and lists them so they can be resolved.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_hot_lookup_indexes'
+down_revision = 'add_gage_search_indexes'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial condition)
+INDEXES = [
+    ('ix_gages_next_calibration_due', 'gages', ['next_calibration_due'], None),
+    ('ix_calibration_records_gage_id_date', 'calibration_records', ['gage_id', sa.text('calibration_date DESC')], None),
+    ('ix_calibration_records_calibrated_by', 'calibration_records', ['calibrated_by'], None),
+    ('ix_calibration_measurements_calibration_id', 'calibration_measurements', ['calibration_id'], None),
+    ('ix_calibration_measurements_gage_function_point', 'calibration_measurements', ['gage_id', 'function_point'], None),
+    ('ix_issue_log_gage_id', 'issue_log', ['gage_id'], None),
+    ('ix_issue_log_returned_by', 'issue_log', ['returned_by'], None),
+    ('ix_issue_log_open_handled_by', 'issue_log', ['handled_by'], 'return_date IS NULL'),
+]
+
+def upgrade():
+    # Checks are skipped when only generating SQL (alembic upgrade --sql)
+    online = not op.get_context().as_sql
+    if online:
+        duplicates = op.get_bind().execute(sa.text(
+            "SELECT serial_number, count(*) FROM gages "
+            "WHERE serial_number IS NOT NULL GROUP BY serial_number HAVING count(*) > 1"
+        )).all()
+        if duplicates:
+            listed = ", ".join(f"{serial} ({count})" for serial, count in duplicates)
+            raise RuntimeError(f"Resolve duplicate gage serial numbers before upgrading: {listed}")
+    # Databases created by create_all already have the constraint
+    exists = online and op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_gages_serial_number'"
+    )).first()
+    if not exists:
+        op.create_unique_constraint('uq_gages_serial_number', 'gages', ['serial_number'])
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint('uq_gages_serial_number', 'gages', type_='unique')
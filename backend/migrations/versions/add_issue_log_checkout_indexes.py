@@ -0,0 +1,53 @@
+"""add expected return date and open-checkout indexes to the issue log
+
+Revision ID: add_issue_log_checkout_indexes
+Revises: add_label_history_indexes
+Create Date: 2026-10-17 18:00:00.000000
+
+Open checkouts (return_date IS NULL) are served from partial indexes, so
+current-holder, per-user and overdue lookups stay small however long the
+history grows. Open checkouts get an expected return date of issue date plus
+the default loan period (CHECKOUT_LOAN_DAYS, read from the environment at
+upgrade time).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from config import get_settings
+
+# revision identifiers, used by Alembic.
+revision = 'add_issue_log_checkout_indexes'
+down_revision = 'add_label_history_indexes'
+branch_labels = None
+depends_on = None
+
+# (name, columns, partial condition)
+INDEXES = [
+    ('ix_issue_log_open_gage_id', ['gage_id'], 'return_date IS NULL'),
+    ('ix_issue_log_open_expected_return', ['expected_return_date'], 'return_date IS NULL'),
+    ('ix_issue_log_gage_id_issue_id', ['gage_id', sa.text('issue_id DESC')], None),
+]
+
+def upgrade():
+    op.add_column('issue_log', sa.Column('expected_return_date', sa.DateTime(), nullable=True))
+    op.execute(
+        sa.text(
+            "UPDATE issue_log SET expected_return_date = issue_date + interval '1 day' * :loan_days "
+            "WHERE return_date IS NULL AND expected_return_date IS NULL"
+        ).bindparams(loan_days=get_settings().CHECKOUT_LOAN_DAYS)
+    )
+
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name, 'issue_log', columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='issue_log', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('issue_log', 'expected_return_date')
@@ -0,0 +1,32 @@
+"""add label history indexes
+
+Revision ID: add_label_history_indexes
+Revises: add_gage_due_counts
+Create Date: 2026-10-17 16:00:00.000000
+
+Serves keyset pages of label history (newest first) and the latest label per
+gage. Built CONCURRENTLY so label printing is not blocked during the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_label_history_indexes'
+down_revision = 'add_gage_due_counts'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_labels_generated_at_id', [sa.text('generated_at DESC'), sa.text('id DESC')]),
+    ('ix_labels_gage_id_generated_at_id', ['gage_id', sa.text('generated_at DESC'), sa.text('id DESC')]),
+]
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'labels', columns, postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='labels', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,48 @@
+"""add notification inbox and unread-count indexes to calibration records
+
+Revision ID: add_notification_inbox_indexes
+Revises: add_gage_usage_periods
+Create Date: 2026-10-17 20:00:00.000000
+
+Both indexes are partial over notified records only, so the inbox page and
+the unread badge count read a handful of index entries per user.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_notification_inbox_indexes'
+down_revision = 'add_gage_usage_periods'
+branch_labels = None
+depends_on = None
+
+# (name, columns, partial condition)
+INDEXES = [
+    (
+        'ix_calibration_records_inbox',
+        ['calibrated_by', sa.text('notification_sent_date DESC'), sa.text('calibration_id DESC')],
+        'notification_sent'
+    ),
+    ('ix_calibration_records_unread', ['calibrated_by'], 'notification_sent AND NOT notification_read'),
+]
+
+def upgrade():
+    # The unread predicate does not match NULL read flags
+    op.execute(
+        "UPDATE calibration_records SET notification_read = false "
+        "WHERE notification_sent AND notification_read IS NULL"
+    )
+
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name, 'calibration_records', columns,
+                postgresql_where=sa.text(where),
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='calibration_records', postgresql_concurrently=True, if_exists=True)
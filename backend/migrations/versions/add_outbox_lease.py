@@ -0,0 +1,26 @@
+"""add a delivery lease to the notification outbox
+
+Revision ID: add_outbox_lease
+Revises: add_notification_inbox_indexes
+Create Date: 2026-10-18 09:00:00.000000
+
+The dispatcher now claims messages by setting status 'sending' and a lease
+expiry in a short transaction, instead of holding row locks while it talks
+to the SMTP server.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_outbox_lease'
+down_revision = 'add_notification_inbox_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('notification_outbox', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+def downgrade():
+    # Messages caught mid-delivery go back to the queue
+    op.execute("UPDATE notification_outbox SET status = 'pending' WHERE status = 'sending'")
+    op.drop_column('notification_outbox', 'lease_expires_at')
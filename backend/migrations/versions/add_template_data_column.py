@@ -1,7 +1,7 @@
 """add template_data column
 
 Revision ID: add_template_data_column
-Revises: 
+Revises: add_notification_fields
 Create Date: 2025-06-16 04:10:05.000000
 
 """
@@ -11,7 +11,7 @@ from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = 'add_template_data_column'
-down_revision = None
+down_revision = 'add_notification_fields'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,31 @@
+"""create stored gage drift analyses
+
+Revision ID: create_gage_drift_analysis
+Revises: create_notification_outbox
+Create Date: 2026-10-16 15:00:00.000000
+
+One row per gage, written by drift.py and cleared whenever the
+measurements or calibration dates it was computed from change.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_gage_drift_analysis'
+down_revision = 'create_notification_outbox'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'gage_drift_analysis',
+        sa.Column('gage_id', sa.Integer(), sa.ForeignKey('gages.gage_id'), primary_key=True),
+        sa.Column('measurement_count', sa.Integer(), nullable=False),
+        sa.Column('last_measurement_id', sa.Integer(), nullable=True),
+        sa.Column('reliability_target', sa.Float(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table('gage_drift_analysis')
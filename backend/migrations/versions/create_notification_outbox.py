@@ -0,0 +1,40 @@
+"""create the notification outbox
+
+Revision ID: create_notification_outbox
+Revises: add_template_data_column
+Create Date: 2026-10-16 12:00:00.000000
+
+Calibration emails are queued here and delivered by the background
+dispatcher in email_service.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_notification_outbox'
+down_revision = 'add_template_data_column'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('calibration_id', sa.Integer(), sa.ForeignKey('calibration_records.calibration_id'), nullable=True),
+        sa.Column('recipient', sa.String(120), nullable=False),
+        sa.Column('subject', sa.String(255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_notification_outbox_id', 'notification_outbox', ['id'])
+    op.create_index('ix_notification_outbox_status', 'notification_outbox', ['status'])
+
+def downgrade():
+    op.drop_index('ix_notification_outbox_status', table_name='notification_outbox')
+    op.drop_index('ix_notification_outbox_id', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
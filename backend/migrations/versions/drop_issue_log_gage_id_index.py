@@ -0,0 +1,28 @@
+"""drop the single-column issue log gage index
+
+Revision ID: drop_issue_log_gage_id_index
+Revises: add_outbox_lease
+Create Date: 2026-10-18 10:00:00.000000
+
+ix_issue_log_gage_id_issue_id (gage_id, issue_id DESC) serves every lookup
+the single-column index did, so the extra index only cost writes.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'drop_issue_log_gage_id_index'
+down_revision = 'add_outbox_lease'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_issue_log_gage_id', table_name='issue_log', postgresql_concurrently=True, if_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_issue_log_gage_id', 'issue_log', ['gage_id'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, create_engine, Text, JSON, Date, ForeignKey, Numeric, Boolean
+from sqlalchemy import text, Column, Integer, String, DateTime, create_engine, Text, JSON, Date, ForeignKey, Numeric, Boolean, Float, Index, UniqueConstraint, DDL, event, func, literal, desc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 from passlib.context import CryptContext
@@ -16,13 +17,25 @@ settings = get_settings()
 Base = declarative_base()
 pwd_context = CryptContext(
     schemes=["bcrypt"],
-    bcrypt__rounds=12,  # Use a fixed number of rounds
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    # Pin min/max to the configured rounds so hashes made with any other
+    # setting are reported as needing an update and get rehashed on login
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
     deprecated="auto"
 )
 
 # Database engines
-engine = create_engine(settings.DATABASE_URL)
-async_engine = create_async_engine(settings.ASYNC_DATABASE_URL)
+# The sync engine is for scripts and migrations only, so it keeps no pool;
+# all request paths go through the pooled async engine.
+engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE
+)
 
 # Session makers
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -54,6 +67,9 @@ class User(Base):
 
 class Gage(Base):
     __tablename__ = "gages"
+    __table_args__ = (
+        UniqueConstraint("serial_number", name="uq_gages_serial_number"),
+    )
     gage_id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100))
     description = Column(Text)
@@ -65,17 +81,49 @@ class Gage(Base):
     status = Column(String(50))
     calibration_frequency = Column(Integer)
     last_calibration_date = Column(Date)
-    next_calibration_due = Column(Date)
+    next_calibration_due = Column(Date, index=True)
     gage_type = Column(String(50))
     cal_category = Column(String(50))
 
+def _inline(value: str):
+    # Rendered into the SQL text rather than bound, so queries match the index expression
+    return literal(value, literal_execute=True)
+
+def _search_text(*columns):
+    document = func.coalesce(columns[0], _inline(""))
+    for column in columns[1:]:
+        document = document + _inline(" ") + func.coalesce(column, _inline(""))
+    return document
+
+# Full-text document used by gage search; queries must use this exact expression
+GAGE_SEARCH_DOCUMENT = func.to_tsvector(
+    _inline("simple"),
+    _search_text(Gage.name, Gage.description, Gage.serial_number, Gage.model_number, Gage.manufacturer)
+)
+
+# Search indexes (PostgreSQL only; other databases use the in-process index in gage_search)
+Index("ix_gages_search_document", GAGE_SEARCH_DOCUMENT, postgresql_using="gin").ddl_if(dialect="postgresql")
+for _column in ("serial_number", "model_number", "manufacturer"):
+    Index(
+        f"ix_gages_{_column}_trgm",
+        getattr(Gage, _column),
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"}
+    ).ddl_if(dialect="postgresql")
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 class CalibrationRecord(Base):
     __tablename__ = "calibration_records"
 
     calibration_id = Column(Integer, primary_key=True, index=True)
     gage_id = Column(Integer)
     calibration_date = Column(Date)
-    calibrated_by = Column(Integer)
+    calibrated_by = Column(Integer, index=True)
     calibration_method = Column(Text)
     calibration_result = Column(String(100))
     deviation_recorded = Column(Text)
@@ -89,6 +137,24 @@ class CalibrationRecord(Base):
     notification_read = Column(Boolean, default=False)
     notification_read_date = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # Per-gage history newest first: reports, latest calibration, due digests
+        Index("ix_calibration_records_gage_id_date", "gage_id", desc("calibration_date")),
+        # Notification inbox newest first, and the unread badge count; only notified rows are indexed
+        Index(
+            "ix_calibration_records_inbox",
+            "calibrated_by", desc("notification_sent_date"), desc("calibration_id"),
+            postgresql_where=text("notification_sent"),
+            sqlite_where=text("notification_sent")
+        ),
+        Index(
+            "ix_calibration_records_unread",
+            "calibrated_by",
+            postgresql_where=text("notification_sent AND NOT notification_read"),
+            sqlite_where=text("notification_sent AND NOT notification_read")
+        ),
+    )
+
 # Add association table for Gage <-> Calibration Record if needed
 # Example: calibration_gage_link = Table('calibration_gage_link', Base.metadata, ...)
 
@@ -109,24 +175,58 @@ class Label(Base):
     gage = relationship("Gage")
     calibration_record = relationship("CalibrationRecord")
 
+    __table_args__ = (
+        # Label history pages (keyset on generated_at, id)
+        Index("ix_labels_generated_at_id", desc("generated_at"), desc("id")),
+        # Per-gage history and latest label per gage
+        Index("ix_labels_gage_id_generated_at_id", "gage_id", desc("generated_at"), desc("id")),
+    )
+
 class IssueLog(Base):
     __tablename__ = "issue_log"
 
     issue_id = Column(Integer, primary_key=True, index=True)
+    # Looked up through ix_issue_log_gage_id_issue_id
     gage_id = Column(Integer)
     issue_date = Column(DateTime)
     issued_from = Column(String(100))
     issued_to = Column(String(100))
     handled_by = Column(Integer)
     return_date = Column(DateTime)
-    returned_by = Column(Integer)
+    returned_by = Column(Integer, index=True)
     condition_on_return = Column(Text)
+    expected_return_date = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Open checkouts (return_date IS NULL) are the "currently issued"
+        # projection; these partial indexes hold only those rows
+        Index(
+            "ix_issue_log_open_handled_by",
+            "handled_by",
+            postgresql_where=text("return_date IS NULL"),
+            sqlite_where=text("return_date IS NULL")
+        ),
+        Index(
+            "ix_issue_log_open_gage_id",
+            "gage_id",
+            postgresql_where=text("return_date IS NULL"),
+            sqlite_where=text("return_date IS NULL")
+        ),
+        Index(
+            "ix_issue_log_open_expected_return",
+            "expected_return_date",
+            postgresql_where=text("return_date IS NULL"),
+            sqlite_where=text("return_date IS NULL")
+        ),
+        # Per-gage history pages
+        Index("ix_issue_log_gage_id_issue_id", "gage_id", desc("issue_id")),
+    )
 
 class CalibrationMeasurement(Base):
     __tablename__ = "calibration_measurements"
     
     measurement_id = Column(Integer, primary_key=True, index=True)
-    calibration_id = Column(Integer, ForeignKey("calibration_records.calibration_id"))
+    calibration_id = Column(Integer, ForeignKey("calibration_records.calibration_id"), index=True)
     gage_id = Column(Integer, ForeignKey("gages.gage_id"))
     function_point = Column(String(50))
     nominal_value = Column(Numeric(precision=10, scale=6))
@@ -139,10 +239,116 @@ class CalibrationMeasurement(Base):
     humidity = Column(Numeric(precision=5, scale=2))
     
     # Relationships
-    calibration_record = relationship("CalibrationRecord")
+    calibration_record = relationship("CalibrationRecord", back_populates="measurements")
     gage = relationship("Gage", foreign_keys=[gage_id])
     master_gage = relationship("Gage", foreign_keys=[master_gage_id])
 
+    __table_args__ = (
+        # Per-gage, per-function-point history for evaluation and drift analysis
+        Index("ix_calibration_measurements_gage_function_point", "gage_id", "function_point"),
+    )
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    calibration_id = Column(Integer, ForeignKey("calibration_records.calibration_id"), nullable=True)
+    recipient = Column(String(120), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Set while a dispatcher is delivering the message
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class GageDriftAnalysis(Base):
+    __tablename__ = "gage_drift_analysis"
+
+    gage_id = Column(Integer, ForeignKey("gages.gage_id"), primary_key=True)
+    # Measurements the analysis was computed from; a mismatch means it is stale
+    measurement_count = Column(Integer, nullable=False)
+    last_measurement_id = Column(Integer, nullable=True)
+    reliability_target = Column(Float, nullable=False)
+    result = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class GageDueCount(Base):
+    """
+    Gage counts per (location, gage_type, cal_category, due date), kept
+    current by triggers on ``gages`` so the due dashboard never scans the
+    inventory. NULL groups are stored as ''; zero rows are left in place.
+    """
+    __tablename__ = "gage_due_counts"
+
+    location = Column(String(100), primary_key=True, default="")
+    gage_type = Column(String(50), primary_key=True, default="")
+    cal_category = Column(String(50), primary_key=True, default="")
+    due_date = Column(Date, primary_key=True)
+    gage_count = Column(Integer, nullable=False, default=0)
+
+class GageUsagePeriod(Base):
+    """
+    Issue-log activity per gage and calendar month, rebuilt for a gage on
+    every write to its issue log so utilization reports never scan history.
+    Busy time covers returned checkouts only; open ones are added at query time.
+    """
+    __tablename__ = "gage_usage_periods"
+
+    gage_id = Column(Integer, ForeignKey("gages.gage_id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    checkouts = Column(Integer, nullable=False, default=0)  # issued this month
+    busy_seconds = Column(Float, nullable=False, default=0)  # returned checkout time falling in this month
+    returns = Column(Integer, nullable=False, default=0)  # returned this month
+    checkout_seconds = Column(Float, nullable=False, default=0)  # full duration of those returns
+    idle_gaps = Column(Integer, nullable=False, default=0)  # checkouts this month that followed a return
+    idle_seconds = Column(Float, nullable=False, default=0)  # return-to-next-issue time of those checkouts
+
+    __table_args__ = (
+        Index("ix_gage_usage_periods_month", "month"),
+    )
+
+GAGE_DUE_COUNTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION gage_due_counts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.next_calibration_due IS NOT NULL THEN
+        UPDATE gage_due_counts SET gage_count = gage_count - 1
+        WHERE location = coalesce(OLD.location, '')
+          AND gage_type = coalesce(OLD.gage_type, '')
+          AND cal_category = coalesce(OLD.cal_category, '')
+          AND due_date = OLD.next_calibration_due;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.next_calibration_due IS NOT NULL THEN
+        INSERT INTO gage_due_counts (location, gage_type, cal_category, due_date, gage_count)
+        VALUES (coalesce(NEW.location, ''), coalesce(NEW.gage_type, ''), coalesce(NEW.cal_category, ''),
+                NEW.next_calibration_due, 1)
+        ON CONFLICT (location, gage_type, cal_category, due_date)
+        DO UPDATE SET gage_count = gage_due_counts.gage_count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+GAGE_DUE_COUNTS_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS gages_due_counts_insert_delete ON gages",
+    "CREATE TRIGGER gages_due_counts_insert_delete AFTER INSERT OR DELETE ON gages "
+    "FOR EACH ROW EXECUTE FUNCTION gage_due_counts_apply()",
+    "DROP TRIGGER IF EXISTS gages_due_counts_update ON gages",
+    "CREATE TRIGGER gages_due_counts_update "
+    "AFTER UPDATE OF location, gage_type, cal_category, next_calibration_due ON gages "
+    "FOR EACH ROW WHEN ((OLD.location, OLD.gage_type, OLD.cal_category, OLD.next_calibration_due) "
+    "IS DISTINCT FROM (NEW.location, NEW.gage_type, NEW.cal_category, NEW.next_calibration_due)) "
+    "EXECUTE FUNCTION gage_due_counts_apply()",
+]
+
+# Runs after every create_all, once both tables exist; the statements are idempotent
+for _statement in [GAGE_DUE_COUNTS_FUNCTION] + GAGE_DUE_COUNTS_TRIGGERS:
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
 # Pydantic Models
 class UserBase(BaseModel):
     username: str
@@ -175,6 +381,11 @@ class Token(BaseModel):
     token_type: str = "bearer"
     user: UserResponse
 
+class TokenData(BaseModel):
+    """Identity carried in the access token; enough for authorization checks"""
+    id: int
+    role: str
+
 # Database dependencies
 def get_db():
     db = SessionLocal()
@@ -210,3 +421,10 @@ User.created_templates = relationship("LabelTemplate", back_populates="creator")
 
 # Add relationship to Gage model
 Gage.label_templates = relationship("LabelTemplate", back_populates="gage")
+
+# Add measurements relationship to CalibrationRecord model
+CalibrationRecord.measurements = relationship(
+    "CalibrationMeasurement",
+    back_populates="calibration_record",
+    order_by=CalibrationMeasurement.measurement_id
+)
\ No newline at end of file
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import logging
+import time
+
+from config import get_settings
+from models import pwd_context
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# bcrypt releases the GIL, so a small thread pool runs hashes in parallel
+# while keeping them off the event loop.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+# Bounds how many requests may queue for the pool at once; the rest wait here
+# instead of piling up inside the executor.
+_limit: Optional[asyncio.Semaphore] = None
+
+_metrics = {
+    "hash_count": 0,
+    "verify_count": 0,
+    "rehash_count": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+    "in_flight": 0,
+    "waiting": 0,
+}
+
+def _get_limit() -> asyncio.Semaphore:
+    global _limit
+    if _limit is None:
+        _limit = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _limit
+
+async def _run(func, *args):
+    loop = asyncio.get_running_loop()
+    _metrics["waiting"] += 1
+    async with _get_limit():
+        _metrics["waiting"] -= 1
+        _metrics["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(_executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            _metrics["in_flight"] -= 1
+            _metrics["total_seconds"] += elapsed
+            _metrics["max_seconds"] = max(_metrics["max_seconds"], elapsed)
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(password, password_hash)
+    except Exception:
+        return False, None
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the worker pool"""
+    _metrics["hash_count"] += 1
+    return await _run(pwd_context.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the worker pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash was made
+    with different bcrypt rounds than configured and should be replaced.
+    """
+    _metrics["verify_count"] += 1
+    valid, new_hash = await _run(_verify_and_update, password, password_hash)
+    if new_hash:
+        _metrics["rehash_count"] += 1
+    return valid, new_hash
+
+def get_password_metrics() -> dict:
+    calls = _metrics["hash_count"] + _metrics["verify_count"]
+    return {
+        **_metrics,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_concurrency": settings.PASSWORD_HASH_MAX_CONCURRENCY,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "mean_seconds": _metrics["total_seconds"] / calls if calls else 0.0,
+    }
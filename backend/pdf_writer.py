@@ -0,0 +1,79 @@
+"""Minimal PDF writer for generated documents (certificates, labels).
+
+Pages are built from text, line and filled-rectangle operations and use the
+standard Helvetica fonts, so nothing is embedded and documents stay small.
+Coordinates are PDF points from the bottom-left corner. Standard library only,
+so it can be used from worker processes.
+"""
+from typing import List, Optional, Tuple
+import zlib
+
+# Average Helvetica glyph width as a fraction of the font size; close enough
+# to centre and fit short label and certificate text
+HELVETICA_CHAR_WIDTH = 0.55
+
+def _escape(text: str) -> bytes:
+    encoded = text.encode("cp1252", errors="replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def text_width(text: str, size: float) -> float:
+    return len(text) * size * HELVETICA_CHAR_WIDTH
+
+class PdfPage:
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+        self.ops: List[bytes] = []
+
+    def text(
+        self, x: float, y: float, text: str, size: float = 10, bold: bool = False,
+        color: Optional[Tuple[float, float, float]] = None
+    ):
+        font = b"/F2" if bold else b"/F1"
+        fill = b"%.3f %.3f %.3f rg " % color if color else b""
+        self.ops.append(
+            b"BT " + fill + font + b" %.2f Tf %.2f %.2f Td (" % (size, x, y) + _escape(text) + b") Tj ET"
+            + (b" 0 g" if color else b"")
+        )
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5):
+        self.ops.append(b"%.2f w %.2f %.2f m %.2f %.2f l S" % (width, x1, y1, x2, y2))
+
+    def rects(self, rectangles: List[Tuple[float, float, float, float]]):
+        """Fill (x, y, width, height) rectangles in black in a single path"""
+        if rectangles:
+            self.ops.append(b" ".join(b"%.3f %.3f %.3f %.3f re" % rect for rect in rectangles) + b" f")
+
+def write_pdf(pages: List[PdfPage]) -> bytes:
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    add(b"")  # page tree, filled in once the page ids are known
+    regular = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    bold = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    page_ids = []
+    for page in pages:
+        stream = zlib.compress(b"\n".join(page.ops))
+        content = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] " % (page.width, page.height)
+            + b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>" % (regular, bold, content)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
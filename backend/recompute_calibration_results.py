@@ -0,0 +1,24 @@
+"""Re-evaluate every calibration's measurements and store the pass/fail verdict.
+
+Usage: python recompute_calibration_results.py [--chunk-size 5000]
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from tolerance import recompute_calibration_results
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(chunk_size: int):
+    async with AsyncSessionLocal() as db:
+        summary = await recompute_calibration_results(db, chunk_size=chunk_size)
+    logger.info(f"Recomputed calibration results: {summary}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Calibrations evaluated per pass")
+    args = parser.parse_args()
+    asyncio.run(main(args.chunk_size))
@@ -0,0 +1,24 @@
+"""Recompute calibration drift analyses for every gage with changed measurements.
+
+Usage: python refresh_drift_analysis.py [--reliability 0.95]
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from drift import refresh_fleet_drift
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(reliability):
+    async with AsyncSessionLocal() as db:
+        summary = await refresh_fleet_drift(db, reliability)
+    logger.info(f"Drift analysis refreshed: {summary}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reliability", type=float, default=None, help="Reliability target, defaults to DRIFT_RELIABILITY_TARGET")
+    args = parser.parse_args()
+    asyncio.run(main(args.reliability))
@@ -0,0 +1,26 @@
+"""Rebuild the calibration-due dashboard counts from the gage inventory.
+
+The counts are maintained by triggers on every gage write; a rebuild is only
+needed after restoring data with triggers disabled or to compact empty groups.
+
+Usage: python refresh_due_summary.py
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from due_summary import rebuild_due_counts
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        groups = await rebuild_due_counts(db)
+    logger.info(f"Calibration due summary rebuilt: {groups} groups")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    asyncio.run(main())
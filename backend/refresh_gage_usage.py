@@ -0,0 +1,27 @@
+"""Rebuild the monthly gage usage history behind the utilization report.
+
+Usage rows are refreshed for a gage on every issue-log write through the API;
+a rebuild is only needed after loading or editing issue logs directly in the
+database.
+
+Usage: python refresh_gage_usage.py
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from utilization import rebuild_gage_usage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_gage_usage(db)
+    logger.info(f"Gage usage history rebuilt: {rows} gage-months")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+    asyncio.run(main())
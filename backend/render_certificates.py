@@ -0,0 +1,36 @@
+"""Render calibration certificates in bulk, skipping those already up to date.
+
+Usage: python render_certificates.py [--from 2026-01-01] [--to 2026-12-31] [--force]
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date
+
+from sqlalchemy.future import select
+
+from models import AsyncSessionLocal, CalibrationRecord
+from certificates import render_certificates, shutdown_executor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(date_from, date_to, force):
+    async with AsyncSessionLocal() as db:
+        query = select(CalibrationRecord.calibration_id).order_by(CalibrationRecord.calibration_id)
+        if date_from:
+            query = query.where(CalibrationRecord.calibration_date >= date_from)
+        if date_to:
+            query = query.where(CalibrationRecord.calibration_date <= date_to)
+        result = await db.execute(query)
+        summary = await render_certificates(db, result.scalars().all(), force=force)
+    shutdown_executor()
+    logger.info(f"Certificates rendered: {summary}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    parser.add_argument("--force", action="store_true", help="Re-render even when a cached PDF is current")
+    args = parser.parse_args()
+    asyncio.run(main(args.date_from, args.date_to, args.force))
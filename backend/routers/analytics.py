@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Optional
+from models import Gage
+from database import get_async_db
+from drift import get_gage_drift, refresh_fleet_drift
+from utilization import get_utilization
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+)
+
+@router.get("/drift/{gage_id}")
+async def gage_drift(
+    gage_id: int,
+    reliability: Optional[float] = Query(None, gt=0.5, lt=1.0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Drift rates per function point and the recommended calibration interval for a gage"""
+    result = await db.execute(select(Gage.gage_id).where(Gage.gage_id == gage_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Gage not found")
+    return await get_gage_drift(db, gage_id, reliability)
+
+@router.post("/drift/refresh")
+async def refresh_drift(
+    reliability: Optional[float] = Query(None, gt=0.5, lt=1.0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Recompute drift analyses for every gage with new or removed measurements"""
+    return await refresh_fleet_drift(db, reliability)
+
+@router.get("/utilization")
+async def gage_utilization(
+    group_by: str = Query("gage", regex="^(gage|location|gage_type)$"),
+    period: str = Query("month", regex="^(month|quarter|year)$"),
+    periods: int = Query(12, ge=1, le=60),
+    location: Optional[str] = None,
+    gage_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Utilization %, mean checkout duration, checkouts per period and idle time
+    from the issue log, per gage, location or gage type over the last
+    ``periods`` periods. Groups are ordered from most to least utilized.
+    """
+    return await get_utilization(db, group_by, period, periods, location=location, gage_type=gage_type)
@@ -8,13 +8,13 @@ from typing import Optional
 from sqlalchemy import select
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-from models import User, UserCreate, UserResponse, Token, get_db, get_async_db
+from models import User, UserCreate, UserResponse, Token, TokenData, get_async_db
 from database import get_admin_user, get_admin_user_async
 from config import get_settings
+from cache import TTLCache
+from passwords import hash_password, verify_password, get_password_metrics
 
 router = APIRouter()
 settings = get_settings()
@@ -22,6 +22,16 @@ settings = get_settings()
 # JWT Configuration
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Authenticated users by id, detached from their session
+user_cache = TTLCache(ttl=settings.USER_CACHE_TTL_SECONDS, maxsize=settings.USER_CACHE_MAX_SIZE)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,103 +40,124 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     try:
-        logger.debug(f"Creating token with data: {to_encode}")
-        encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-        logger.debug(f"Created token: {encoded_jwt}")
-        return encoded_jwt
+        return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     except Exception as e:
-        logger.error(f"Error creating token: {str(e)}")
+        logger.error("Error creating token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create access token"
         )
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
-    logger.debug(f"Received token: {token}")
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def _decode_token(token: str, scope: Optional[str] = None):
+    """
+    Return (user_id, payload) for a valid token or raise 401. Access tokens
+    carry no scope claim; single-purpose tokens are only accepted where their
+    scope is asked for, and never as access tokens.
+    """
     try:
-        # Decode the token
-        logger.debug(f"Attempting to decode token with key: {settings.JWT_SECRET_KEY[:10]}...")
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        logger.debug(f"Decoded payload: {payload}")
-        user_id = payload.get("sub")
-        if user_id is None:
-            logger.error("No user_id in token payload")
-            raise credentials_exception
-        
-        # Convert user_id from string to integer
-        try:
-            user_id = int(user_id)  # Convert from string to integer
-            logger.debug(f"Converted user_id to integer: {user_id}")
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error converting user_id to integer: {str(e)}")
-            raise credentials_exception
-        
-        # Get user from database
+    except JWTError as e:
+        logger.warning("JWT Error: %s", e)
+        raise _credentials_exception()
+    if payload.get("scope") != scope:
+        logger.warning("Token scope %s used where %s is required", payload.get("scope"), scope)
+        raise _credentials_exception()
+    try:
+        return int(payload.get("sub")), payload
+    except (ValueError, TypeError):
+        logger.warning("Invalid user id in token payload")
+        raise _credentials_exception()
+
+async def _load_user(user_id: int, db: AsyncSession) -> Optional[User]:
+    user = user_cache.get(user_id)
+    if user is None:
         result = await db.execute(select(User).filter(User.id == user_id))
         user = result.scalar_one_or_none()
         if user is None:
-            logger.error(f"No user found with id {user_id}")
-            raise credentials_exception
-            
-        logger.debug(f"Successfully authenticated user: {user.username}")
-        return user
-    except JWTError as e:
-        logger.error(f"JWT Error: {str(e)}")
-        raise credentials_exception
+            return None
+        db.expunge(user)
+        user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a user from the cache; call after any change to a users row"""
+    user_cache.invalidate(user_id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    user_id, _ = _decode_token(token)
+    try:
+        user = await _load_user(user_id, db)
     except Exception as e:
-        logger.error(f"Error in get_current_user: {str(e)}")
-        raise credentials_exception
+        logger.error("Error in get_current_user: %s", e)
+        raise _credentials_exception()
+    if user is None:
+        logger.warning("No user found with id %s", user_id)
+        raise _credentials_exception()
+    return user
+
+async def get_token_data(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> TokenData:
+    """
+    Identity and role straight from the token, for authorization checks that
+    do not need the full user row.
+    """
+    user_id, payload = _decode_token(token)
+    role = payload.get("role")
+    if role is None:
+        # Tokens issued before the role claim was added
+        user = await get_current_user(token, db)
+        role = user.role
+    return TokenData(id=user_id, role=role)
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     try:
-        logger.debug(f"Login attempt for username: {form_data.username}")
         # Get user from database
         result = await db.execute(select(User).filter(User.username == form_data.username))
         user = result.scalar_one_or_none()
         
         if not user:
-            logger.error(f"No user found with username: {form_data.username}")
+            logger.warning("No user found with username: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        if not user.verify_password(form_data.password):
-            logger.error(f"Invalid password for user: {form_data.username}")
+        password_valid, new_hash = await verify_password(form_data.password, user.password_hash)
+        if not password_valid:
+            logger.warning("Invalid password for user: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        logger.debug(f"Password verified for user: {user.username}")
+        # Rehash if the configured bcrypt rounds have changed
+        if new_hash:
+            user.password_hash = new_hash
         
         # Update last login
         user.last_login = datetime.utcnow()
         await db.commit()
+        invalidate_user(user.id)
         
         # Create access token - convert user.id to string
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": str(user.id)},  # Convert to string here
+            data={"sub": str(user.id), "role": user.role},  # Convert to string here
             expires_delta=access_token_expires
         )
         
-        logger.debug(f"Login successful for user: {user.username}")
+        logger.info("Login successful for user: %s", user.username)
         return {
             "access_token": access_token,
             "token_type": "bearer",
             "user": user
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in login: {str(e)}")
+        logger.error("Error in login: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during login"
@@ -136,6 +167,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
+@router.get("/metrics/password-hashing")
+async def password_hashing_metrics(current_user: TokenData = Depends(get_token_data)):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view metrics"
+        )
+    return get_password_metrics()
+
 @router.post("/register", response_model=UserResponse)
 async def register_user(
     user_data: UserCreate,
@@ -161,7 +201,7 @@ async def register_user(
         username=user_data.username,
         email=user_data.email,
         role=user_data.role,
-        password_hash=User.get_password_hash(user_data.password)
+        password_hash=await hash_password(user_data.password)
     )
     db.add(new_user)
     await db.commit()
@@ -1,69 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, and_, or_, func, update
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from models import CalibrationRecord
-from schemas import CalibrationRecordCreate, CalibrationRecordUpdate, CalibrationRecordResponse
-from database import get_async_db, get_db
-from email_service import send_calibration_notification
-from datetime import datetime
+from schemas import CalibrationRecordCreate, CalibrationRecordUpdate, CalibrationRecordResponse, NotificationResponse, NotificationMarkRead
+from database import get_async_db, AsyncSessionLocal
+from email_service import enqueue_calibration_notification
+from calibration_dates import sync_gage_calibration_dates
+from drift import invalidate_calibration_drift
+from live_events import publish
+from datetime import datetime, date
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Columns the calibration list may be ordered by
+CALIBRATION_ORDER_COLUMNS = {
+    "calibration_date": CalibrationRecord.calibration_date,
+    "next_due_date": CalibrationRecord.next_due_date,
+    "calibration_id": CalibrationRecord.calibration_id,
+}
+
+# Columns the notification inbox returns
+NOTIFICATION_COLUMNS = (
+    CalibrationRecord.calibration_id,
+    CalibrationRecord.gage_id,
+    CalibrationRecord.calibration_date,
+    CalibrationRecord.next_due_date,
+    CalibrationRecord.certificate_number,
+    CalibrationRecord.notification_sent_date,
+    CalibrationRecord.notification_read,
+    CalibrationRecord.notification_read_date,
+)
+
+def _parse_order_by(order_by: str):
+    """Parse an ``"<column> [asc|desc]"`` string against the whitelist."""
+    parts = order_by.split()
+    if not parts or len(parts) > 2 or parts[0] not in CALIBRATION_ORDER_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"order_by must be one of {sorted(CALIBRATION_ORDER_COLUMNS)} optionally followed by asc/desc"
+        )
+    direction = parts[1].lower() if len(parts) == 2 else "asc"
+    if direction not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order_by direction must be 'asc' or 'desc'")
+    return CALIBRATION_ORDER_COLUMNS[parts[0]], direction
+
+def _keyset_condition(column, direction: str, value, last_id: int):
+    """Rows strictly after (value, last_id) in ``column <direction> NULLS LAST, calibration_id <direction>`` order."""
+    record_id = CalibrationRecord.calibration_id
+    if direction == "desc":
+        after_value, after_id = column < value, record_id < last_id
+    else:
+        after_value, after_id = column > value, record_id > last_id
+    if value is None:
+        return and_(column.is_(None), after_id)
+    return or_(after_value, and_(column == value, after_id), column.is_(None))
+
+def _calibration_to_dict(cal: CalibrationRecord) -> dict:
+    return {
+        "calibration_id": cal.calibration_id,
+        "gage_id": cal.gage_id,
+        "calibration_date": cal.calibration_date.isoformat() if cal.calibration_date else None,
+        "calibrated_by": cal.calibrated_by,
+        "calibration_method": cal.calibration_method or "",
+        "calibration_result": cal.calibration_result or "",
+        "deviation_recorded": cal.deviation_recorded or "",
+        "adjustments_made": cal.adjustments_made or 0,
+        "certificate_number": cal.certificate_number or "",
+        "next_due_date": cal.next_due_date.isoformat() if cal.next_due_date else None,
+        "comments": cal.comments or "",
+        "calibration_document_path": cal.calibration_document_path or "",
+        "notification_sent": cal.notification_sent or False,
+        "notification_sent_date": cal.notification_sent_date.isoformat() if cal.notification_sent_date else None,
+        "notification_read": cal.notification_read or False,
+        "notification_read_date": cal.notification_read_date.isoformat() if cal.notification_read_date else None,
+    }
+
+async def _stream_calibrations(query):
+    """Yield the query result as a JSON array, one record at a time.
+
+    The stream runs on its own session because the request-scoped session may
+    already be closed by the time the response body is consumed.
+    """
+    yield "["
+    first = True
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.stream_scalars(query.execution_options(yield_per=500))
+            async for cal in result:
+                yield ("" if first else ",") + json.dumps(_calibration_to_dict(cal))
+                first = False
+        except Exception as e:
+            # Headers are already sent; abort the response so the client sees a broken body, not a short list
+            logger.error(f"Error streaming calibrations: {str(e)}")
+            raise
+    yield "]"
+
 @router.get("/calibrations")
-async def get_calibrations(db: AsyncSession = Depends(get_async_db)):
-    try:
-        # Query without notification fields first
-        query = select(CalibrationRecord).order_by(desc(CalibrationRecord.calibration_date))
-        result = await db.execute(query)
-        calibrations = result.scalars().all()
-        
-        # Convert to dict and add notification fields with defaults
-        calibration_list = []
-        for cal in calibrations:
-            try:
-                # Convert dates to strings safely
-                calibration_date = cal.calibration_date.isoformat() if cal.calibration_date else None
-                next_due_date = cal.next_due_date.isoformat() if cal.next_due_date else None
-                notification_sent_date = cal.notification_sent_date.isoformat() if cal.notification_sent_date else None
-                notification_read_date = cal.notification_read_date.isoformat() if cal.notification_read_date else None
-
-                cal_dict = {
-                    "calibration_id": cal.calibration_id,
-                    "gage_id": cal.gage_id,
-                    "calibration_date": calibration_date,
-                    "calibrated_by": cal.calibrated_by,
-                    "calibration_method": cal.calibration_method or "",
-                    "calibration_result": cal.calibration_result or "",
-                    "deviation_recorded": cal.deviation_recorded or "",
-                    "adjustments_made": cal.adjustments_made or 0,
-                    "certificate_number": cal.certificate_number or "",
-                    "next_due_date": next_due_date,
-                    "comments": cal.comments or "",
-                    "calibration_document_path": cal.calibration_document_path or "",
-                    # Add notification fields with defaults
-                    "notification_sent": getattr(cal, 'notification_sent', False),
-                    "notification_sent_date": notification_sent_date,
-                    "notification_read": getattr(cal, 'notification_read', False),
-                    "notification_read_date": notification_read_date
-                }
-                calibration_list.append(cal_dict)
-            except Exception as e:
-                logger.error(f"Error processing calibration record {getattr(cal, 'calibration_id', 'unknown')}: {str(e)}")
-                continue
-        
-        return calibration_list
-    except Exception as e:
-        logger.error(f"Error fetching calibrations: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_calibrations(
+    gage_id: Optional[int] = None,
+    calibrated_by: Optional[int] = None,
+    calibration_result: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: str = "calibration_date desc",
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="calibration_id of the last record of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List calibration records, filtered and ordered in SQL.
+    Pass the calibration_id of the last record received as ``cursor`` to fetch the next page.
+    """
+    column, direction = _parse_order_by(order_by)
+
+    query = select(CalibrationRecord)
+    if gage_id is not None:
+        query = query.where(CalibrationRecord.gage_id == gage_id)
+    if calibrated_by is not None:
+        query = query.where(CalibrationRecord.calibrated_by == calibrated_by)
+    if calibration_result is not None:
+        query = query.where(CalibrationRecord.calibration_result == calibration_result)
+    if date_from is not None:
+        query = query.where(CalibrationRecord.calibration_date >= date_from)
+    if date_to is not None:
+        query = query.where(CalibrationRecord.calibration_date <= date_to)
+
+    if cursor is not None:
+        result = await db.execute(select(column).where(CalibrationRecord.calibration_id == cursor))
+        cursor_row = result.first()
+        if cursor_row is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(_keyset_condition(column, direction, cursor_row[0], cursor))
+
+    if direction == "desc":
+        query = query.order_by(column.desc().nulls_last(), CalibrationRecord.calibration_id.desc())
+    else:
+        query = query.order_by(column.asc().nulls_last(), CalibrationRecord.calibration_id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    return StreamingResponse(_stream_calibrations(query), media_type="application/json")
 
 @router.post("/calibrations", response_model=CalibrationRecordResponse)
 async def create_calibration(record: CalibrationRecordCreate, db: AsyncSession = Depends(get_async_db)):
     db_record = CalibrationRecord(**record.dict())
     db.add(db_record)
+    await sync_gage_calibration_dates(db, [db_record.gage_id])
     await db.commit()
     await db.refresh(db_record)
     return db_record
@@ -82,8 +170,13 @@ async def update_calibration(calibration_id: int, update: CalibrationRecordUpdat
     db_record = result.scalar_one_or_none()
     if not db_record:
         raise HTTPException(status_code=404, detail="Calibration record not found")
-    for key, value in update.dict(exclude_unset=True).items():
+    changes = update.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(db_record, key, value)
+    if changes.keys() & {"calibration_date", "next_due_date"}:
+        await sync_gage_calibration_dates(db, [db_record.gage_id])
+    if "calibration_date" in changes:
+        await invalidate_calibration_drift(db, calibration_id)
     await db.commit()
     await db.refresh(db_record)
     return db_record
@@ -94,54 +187,134 @@ async def delete_calibration(calibration_id: int, db: AsyncSession = Depends(get
     db_record = result.scalar_one_or_none()
     if not db_record:
         raise HTTPException(status_code=404, detail="Calibration record not found")
+    await invalidate_calibration_drift(db, calibration_id)
     await db.delete(db_record)
+    await sync_gage_calibration_dates(db, [db_record.gage_id])
     await db.commit()
     return {"status": "success", "message": f"Calibration record {calibration_id} deleted"}
 
-@router.post("/calibrations/{calibration_id}/send-notification")
-async def send_notification(calibration_id: int):
-    """Send email notification for a calibration record"""
+@router.post("/calibrations/{calibration_id}/send-notification", status_code=202)
+async def send_notification(calibration_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Queue an email notification for a calibration record"""
     try:
-        db = next(get_db())
-        success = send_calibration_notification(db, calibration_id)
-        if not success:
+        item = await enqueue_calibration_notification(db, calibration_id)
+        if item is None:
             raise HTTPException(
                 status_code=500,
-                detail="Failed to send email notification. Please check the server logs for details."
+                detail="Failed to queue email notification. Please check the server logs for details."
             )
-        return {"status": "success", "message": "Email notification sent successfully"}
+        return {"status": "queued", "message": "Email notification queued", "notification_id": item.id}
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error sending email notification: {str(e)}"
         )
 
-@router.get("/calibrations/notifications/{user_id}")
-async def get_user_notifications(user_id: int, db: AsyncSession = Depends(get_async_db)):
-    """Get all notifications for a specific user"""
-    query = select(CalibrationRecord).where(
+def _inbox(user_id: int):
+    """A user's notified calibrations; the predicate matches ix_calibration_records_inbox"""
+    return select(*NOTIFICATION_COLUMNS).where(
         CalibrationRecord.calibrated_by == user_id,
         CalibrationRecord.notification_sent == True
-    ).order_by(desc(CalibrationRecord.notification_sent_date))
-    
-    result = await db.execute(query)
-    notifications = result.scalars().all()
-    
+    )
+
+def _unread(user_id: int):
+    """The predicate matches the ix_calibration_records_unread partial index"""
+    return and_(
+        CalibrationRecord.calibrated_by == user_id,
+        CalibrationRecord.notification_sent == True,
+        CalibrationRecord.notification_read == False
+    )
+
+@router.get("/calibrations/notifications/{user_id}", response_model=List[NotificationResponse])
+async def get_user_notifications(
+    user_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="calibration_id of the last notification of the previous page"),
+    unread_only: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    A user's notifications, most recently sent first. When the page is full
+    the X-Next-Cursor header holds the cursor for the next page.
+    """
+    query = _inbox(user_id)
+    if unread_only:
+        query = query.where(CalibrationRecord.notification_read == False)
+    if cursor is not None:
+        result = await db.execute(
+            select(CalibrationRecord.notification_sent_date).where(CalibrationRecord.calibration_id == cursor)
+        )
+        cursor_row = result.first()
+        if cursor_row is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Notifications are always stamped with their send date
+        query = query.where(or_(
+            CalibrationRecord.notification_sent_date < cursor_row[0],
+            and_(CalibrationRecord.notification_sent_date == cursor_row[0], CalibrationRecord.calibration_id < cursor)
+        ))
+
+    result = await db.execute(
+        query.order_by(
+            CalibrationRecord.notification_sent_date.desc(),
+            CalibrationRecord.calibration_id.desc()
+        ).limit(limit)
+    )
+    notifications = result.all()
+    if len(notifications) == limit:
+        response.headers["X-Next-Cursor"] = str(notifications[-1].calibration_id)
     return notifications
 
+@router.get("/calibrations/notifications/{user_id}/unread-count")
+async def get_unread_notification_count(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Number of unread notifications, for the notification badge"""
+    result = await db.execute(select(func.count()).select_from(CalibrationRecord).where(_unread(user_id)))
+    return {"user_id": user_id, "unread": result.scalar_one()}
+
+@router.post("/calibrations/notifications/{user_id}/mark-read")
+async def mark_notifications_read(
+    user_id: int,
+    request: NotificationMarkRead,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Mark the given notifications of a user as read, or all of them when
+    calibration_ids is left out. Ids that are not the user's unread
+    notifications are ignored.
+    """
+    query = update(CalibrationRecord).where(_unread(user_id))
+    if request.calibration_ids is not None:
+        if not request.calibration_ids:
+            return {"status": "success", "updated": 0, "calibration_ids": []}
+        query = query.where(CalibrationRecord.calibration_id.in_(request.calibration_ids))
+    result = await db.execute(
+        query.values(notification_read=True, notification_read_date=datetime.utcnow())
+        .returning(CalibrationRecord.calibration_id)
+        .execution_options(synchronize_session=False)
+    )
+    calibration_ids = sorted(result.scalars().all())
+    if calibration_ids:
+        await publish(db, "notification_read", user_id=user_id, calibration_ids=calibration_ids)
+    await db.commit()
+    return {"status": "success", "updated": len(calibration_ids), "calibration_ids": calibration_ids}
+
 @router.post("/calibrations/{calibration_id}/mark-read")
 async def mark_notification_read(calibration_id: int, db: AsyncSession = Depends(get_async_db)):
     """Mark a notification as read"""
     result = await db.execute(
-        select(CalibrationRecord).where(CalibrationRecord.calibration_id == calibration_id)
+        update(CalibrationRecord)
+        .where(CalibrationRecord.calibration_id == calibration_id)
+        .values(notification_read=True, notification_read_date=datetime.utcnow())
+        .returning(CalibrationRecord.calibrated_by)
+        .execution_options(synchronize_session=False)
     )
-    record = result.scalar_one_or_none()
+    row = result.first()
     
-    if not record:
+    if not row:
         raise HTTPException(status_code=404, detail="Calibration record not found")
     
-    record.notification_read = True
-    record.notification_read_date = datetime.utcnow()
+    # Other open sessions of the user drop the unread badge
+    await publish(db, "notification_read", user_id=row.calibrated_by, calibration_ids=[calibration_id])
     await db.commit()
     
-    return {"status": "success", "message": "Notification marked as read"}
\ No newline at end of file
+    return {"status": "success", "message": "Notification marked as read"}
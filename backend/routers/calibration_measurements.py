@@ -1,18 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, distinct, join
+from sqlalchemy import and_, distinct, join, insert
+from pydantic import ValidationError
 from typing import List, Optional
 from models import CalibrationMeasurement, CalibrationRecord, User
+from tolerance import (
+    evaluate_rows,
+    calibration_summaries,
+    measurement_details,
+    load_measurement_rows,
+    recompute_calibration_results
+)
 from schemas import (
     CalibrationMeasurementCreate, 
     CalibrationMeasurementUpdate, 
-    CalibrationMeasurementResponse
+    CalibrationMeasurementResponse,
+    CalibrationMeasurementSheetItem,
+    CalibrationMeasurementSheetResponse
 )
 from database import get_async_db
+from drift import invalidate_gage_drift
+import csv
+import io
 
 router = APIRouter()
 
+# Rows per INSERT statement; keeps bind parameters well under the driver limit
+MEASUREMENT_INSERT_CHUNK = 1000
+
+async def _insert_measurement_sheet(
+    db: AsyncSession,
+    calibration_id: int,
+    items: List[CalibrationMeasurementSheetItem]
+) -> CalibrationMeasurementSheetResponse:
+    """Insert a validated sheet for one calibration in a single transaction"""
+    result = await db.execute(
+        select(CalibrationRecord.gage_id).where(CalibrationRecord.calibration_id == calibration_id)
+    )
+    calibration_gage_id = result.scalar_one_or_none()
+    if calibration_gage_id is None:
+        raise HTTPException(status_code=404, detail="Calibration record not found")
+
+    mismatched = [
+        index for index, item in enumerate(items)
+        if item.calibration_id is not None and item.calibration_id != calibration_id
+    ]
+    if mismatched:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rows {mismatched} reference a different calibration_id than {calibration_id}"
+        )
+    mismatched = [
+        index for index, item in enumerate(items)
+        if item.gage_id is not None and item.gage_id != calibration_gage_id
+    ]
+    if mismatched:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rows {mismatched} reference a different gage_id than calibration {calibration_id} (gage {calibration_gage_id})"
+        )
+
+    rows = []
+    for item in items:
+        row = item.dict()
+        row["calibration_id"] = calibration_id
+        if row["gage_id"] is None:
+            row["gage_id"] = calibration_gage_id
+        rows.append(row)
+
+    measurement_ids = []
+    for start in range(0, len(rows), MEASUREMENT_INSERT_CHUNK):
+        result = await db.execute(
+            insert(CalibrationMeasurement)
+            .values(rows[start:start + MEASUREMENT_INSERT_CHUNK])
+            .returning(CalibrationMeasurement.measurement_id)
+        )
+        measurement_ids.extend(result.scalars().all())
+    await db.commit()
+
+    return CalibrationMeasurementSheetResponse(
+        calibration_id=calibration_id,
+        created=len(measurement_ids),
+        measurement_ids=measurement_ids
+    )
+
 @router.get("/measurements", response_model=List[CalibrationMeasurementResponse])
 async def get_measurements(
     gage_id: Optional[int] = None,
@@ -64,6 +136,51 @@ async def create_measurement(
     
     return db_measurement
 
+@router.post("/calibrations/{calibration_id}/measurements", response_model=CalibrationMeasurementSheetResponse)
+async def create_measurement_sheet(
+    calibration_id: int,
+    measurements: List[CalibrationMeasurementSheetItem],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create every measurement of a calibration data sheet in one transaction.
+    gage_id defaults to the calibration record's gage.
+    """
+    if not measurements:
+        raise HTTPException(status_code=400, detail="Measurement sheet is empty")
+    return await _insert_measurement_sheet(db, calibration_id, measurements)
+
+@router.post("/calibrations/{calibration_id}/measurements/csv", response_model=CalibrationMeasurementSheetResponse)
+async def upload_measurement_sheet(
+    calibration_id: int,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create measurements from a CSV data sheet whose header row uses the
+    measurement field names. The whole file is validated before anything is
+    written; any invalid row rejects the upload.
+    """
+    try:
+        text = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+
+    items = []
+    errors = []
+    # Line 1 is the header
+    for line_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        cleaned = {key.strip(): (value.strip() or None) for key, value in row.items() if key and value is not None}
+        try:
+            items.append(CalibrationMeasurementSheetItem(**cleaned))
+        except ValidationError as e:
+            errors.append({"line": line_number, "errors": e.errors()})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    if not items:
+        raise HTTPException(status_code=400, detail="Measurement sheet is empty")
+    return await _insert_measurement_sheet(db, calibration_id, items)
+
 @router.put("/measurements/{measurement_id}", response_model=CalibrationMeasurementResponse)
 async def update_measurement(
     measurement_id: int,
@@ -83,11 +200,13 @@ async def update_measurement(
         raise HTTPException(status_code=404, detail="Measurement record not found")
     
     # Update fields
+    previous_gage_id = db_measurement.gage_id
     update_data = measurement_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_measurement, key, value)
     
     # Save changes
+    await invalidate_gage_drift(db, [previous_gage_id, db_measurement.gage_id])
     await db.commit()
     await db.refresh(db_measurement)
     
@@ -111,6 +230,7 @@ async def delete_measurement(
         raise HTTPException(status_code=404, detail="Measurement record not found")
     
     # Delete the record
+    await invalidate_gage_drift(db, [db_measurement.gage_id])
     await db.delete(db_measurement)
     await db.commit()
     
@@ -154,4 +274,35 @@ async def get_unique_gage_calibrations(db: AsyncSession = Depends(get_async_db))
             "performed_by_name": row.username
         }
         for row in rows
-    ] 
\ No newline at end of file
+    ]
+
+@router.get("/calibrations/{calibration_id}/evaluation")
+async def evaluate_calibration(calibration_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Deviation, % of tolerance used and as-found/as-left pass/fail for every
+    measurement of a calibration, plus the overall verdict.
+    """
+    rows = await load_measurement_rows(db, CalibrationMeasurement.calibration_id == calibration_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="No measurements found for this calibration")
+    evaluation = evaluate_rows(rows)
+    return {
+        "summary": calibration_summaries(evaluation)[0],
+        "measurements": measurement_details(rows, evaluation)
+    }
+
+@router.get("/gages/{gage_id}/evaluation")
+async def evaluate_gage_calibrations(gage_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Verdict summary for every calibration of a gage, evaluated in one pass"""
+    rows = await load_measurement_rows(db, CalibrationMeasurement.gage_id == gage_id)
+    return calibration_summaries(evaluate_rows(rows))
+
+@router.post("/calibrations/evaluation/recompute")
+async def recompute_results(db: AsyncSession = Depends(get_async_db)):
+    """
+    Re-evaluate all calibrations with measurements and store Pass or Fail in
+    calibration_result. Only empty, Pending and earlier Pass/Fail values (any
+    case) are overwritten; Approved, Rejected and any other reviewer-set
+    result are kept.
+    """
+    return await recompute_calibration_results(db)
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
+from models import CalibrationRecord
+from database import get_async_db
+from certificates import get_certificate, render_certificates
+import logging
+import re
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class CertificateBatchRequest(BaseModel):
+    calibration_ids: Optional[List[int]] = Field(default=None, max_items=10000)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    force: bool = False
+
+@router.get("/calibrations/{calibration_id}/certificate")
+async def download_certificate(calibration_id: int, db: AsyncSession = Depends(get_async_db)):
+    """PDF calibration certificate; served from cache unless the record or its measurements changed"""
+    try:
+        certificate = await get_certificate(db, calibration_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering certificate: {str(e)}")
+    if certificate is None:
+        raise HTTPException(status_code=404, detail="Calibration record not found")
+    name = re.sub(r"[^0-9A-Za-z_.-]", "_", certificate["certificate_number"] or str(calibration_id))
+    return Response(
+        content=certificate["content"],
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="certificate_{name}.pdf"',
+            "ETag": f'"{certificate["hash"]}"'
+        }
+    )
+
+@router.post("/calibrations/certificates/render")
+async def render_certificate_batch(request: CertificateBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Render certificates for a list of calibrations or a calibration date range"""
+    if request.calibration_ids is not None:
+        calibration_ids = request.calibration_ids
+    elif request.date_from or request.date_to:
+        query = select(CalibrationRecord.calibration_id).order_by(CalibrationRecord.calibration_id)
+        if request.date_from:
+            query = query.where(CalibrationRecord.calibration_date >= request.date_from)
+        if request.date_to:
+            query = query.where(CalibrationRecord.calibration_date <= request.date_to)
+        result = await db.execute(query)
+        calibration_ids = result.scalars().all()
+    else:
+        raise HTTPException(status_code=400, detail="Provide calibration_ids or a date range")
+    return await render_certificates(db, list(dict.fromkeys(calibration_ids)), force=request.force)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database import get_async_db
+from due_summary import get_due_summary, GROUP_COLUMNS
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"],
+)
+
+@router.get("/due-summary")
+async def due_summary(
+    group_by: str = Query(",".join(GROUP_COLUMNS), description="Comma-separated subset of location,gage_type,cal_category; empty for totals only"),
+    location: Optional[str] = None,
+    gage_type: Optional[str] = None,
+    cal_category: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Counts of overdue gages and gages due within 7, 30 and 90 days"""
+    columns = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = sorted(set(columns) - set(GROUP_COLUMNS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by columns: {unknown}")
+    return await get_due_summary(
+        db,
+        list(dict.fromkeys(columns)),
+        location=location,
+        gage_type=gage_type,
+        cal_category=cal_category
+    )
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+import asyncio
+import json
+
+from config import get_settings
+from live_events import Subscription, hub
+from models import TokenData
+from routers.auth import _decode_token, create_access_token, get_token_data
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+settings = get_settings()
+
+# Scope claim of the tokens accepted in the stream URL
+STREAM_TOKEN_SCOPE = "events"
+
+def _format(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def _event_stream(request: Request, subscription: Subscription) -> AsyncIterator[str]:
+    try:
+        # Tells EventSource how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Comment line; keeps idle connections open through proxies
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                break
+            yield _format(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+@router.post("/token")
+async def create_stream_token(current_user: TokenData = Depends(get_token_data)):
+    """
+    Mint a short-lived token that can only open the event stream. URLs end up
+    in access logs and browser history, so EventSource passes this instead of
+    the access token; it is checked once, when the stream connects.
+    """
+    expires_in = settings.EVENTS_TOKEN_TTL_SECONDS
+    token = create_access_token(
+        data={"sub": str(current_user.id), "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=expires_in)
+    )
+    return {"token": token, "expires_in": expires_in}
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Stream token from POST /events/token, for clients such as EventSource that cannot send headers")
+):
+    """
+    Server-sent event stream of new notifications, notification read-state
+    changes and gage issue/return events for the signed-in user. Events are
+    not replayed after a reconnect; reload the inbox when the stream reopens.
+    The query string only accepts stream tokens; access tokens must be sent
+    as a Bearer header.
+    """
+    authorization = request.headers.get("authorization", "")
+    if token is not None:
+        user_id, _ = _decode_token(token, scope=STREAM_TOKEN_SCOPE)
+    elif authorization.lower().startswith("bearer "):
+        user_id, _ = _decode_token(authorization[7:])
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    subscription = hub.subscribe(user_id)
+    return StreamingResponse(
+        _event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,29 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from datetime import date
 from models import Gage
 from schemas import GageCreate, GageResponse
 from database import get_async_db
+from gage_search import search_gages, index_gage, unindex_gage
+import hashlib
+import json
 
 router = APIRouter()
 
+# Columns a client may request through ``fields=``
+GAGE_FIELDS = [column.name for column in Gage.__table__.columns]
+
+async def _check_serial_number(db: AsyncSession, serial_number: str, gage_id: Optional[int] = None):
+    """Reject a serial number another gage already has, the same check the importer runs"""
+    query = select(Gage.gage_id).where(Gage.serial_number == serial_number)
+    if gage_id is not None:
+        query = query.where(Gage.gage_id != gage_id)
+    result = await db.execute(query.limit(1))
+    if result.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail="A gage with this serial number already exists.")
+
+async def _commit_gage(db: AsyncSession):
+    """
+    Commit a gage write. Callers check the serial number first; the unique
+    constraint still catches a concurrent insert of the same serial, which
+    PostgreSQL reports by constraint name.
+    """
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if "uq_gages_serial_number" in str(e.orig):
+            raise HTTPException(status_code=400, detail="A gage with this serial number already exists.")
+        raise
+
 @router.get("/gages", response_model=List[GageResponse])
-async def list_gages(db: AsyncSession = Depends(get_async_db)):
-    result = await db.execute(select(Gage))
-    return result.scalars().all()
+async def list_gages(
+    request: Request,
+    status: Optional[str] = None,
+    location: Optional[str] = None,
+    gage_type: Optional[str] = None,
+    cal_category: Optional[str] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. gage_id,name"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="gage_id of the last gage of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List gages ordered by gage_id. When ``limit`` is given and the page is
+    full, the X-Next-Cursor header holds the cursor for the next page.
+    Responses carry an ETag; send it back as If-None-Match to get a 304.
+    """
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(selected) - set(GAGE_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+        if "gage_id" not in selected:
+            selected.insert(0, "gage_id")
+    else:
+        selected = GAGE_FIELDS
+
+    query = select(*[getattr(Gage, name) for name in selected])
+    if status is not None:
+        query = query.where(Gage.status == status)
+    if location is not None:
+        query = query.where(Gage.location == location)
+    if gage_type is not None:
+        query = query.where(Gage.gage_type == gage_type)
+    if cal_category is not None:
+        query = query.where(Gage.cal_category == cal_category)
+    if due_from is not None:
+        query = query.where(Gage.next_calibration_due >= due_from)
+    if due_to is not None:
+        query = query.where(Gage.next_calibration_due <= due_to)
+    if cursor is not None:
+        query = query.where(Gage.gage_id > cursor)
+    query = query.order_by(Gage.gage_id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    gages = [dict(row._mapping) for row in result.all()]
+
+    body = json.dumps(jsonable_encoder(gages), separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    headers = {"ETag": etag}
+    if limit is not None and len(gages) == limit:
+        headers["X-Next-Cursor"] = str(gages[-1]["gage_id"])
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/gages/search")
+async def search_gage_inventory(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ranked search by partial serial number, model number, manufacturer,
+    name or description. Matches are ordered by score, best first.
+    """
+    return await search_gages(db, q.strip(), limit)
 
 @router.post("/gages", response_model=GageResponse)
 async def create_gage(gage: GageCreate, db: AsyncSession = Depends(get_async_db)):
-    # Check for existing gage with the same serial_number
-    result = await db.execute(select(Gage).where(Gage.serial_number == gage.serial_number))
-    existing_gage = result.scalar_one_or_none()
-    if existing_gage:
-        raise HTTPException(status_code=400, detail="A gage with this serial number already exists.")
+    await _check_serial_number(db, gage.serial_number)
     db_gage = Gage(**gage.dict())
     db.add(db_gage)
-    await db.commit()
+    await _commit_gage(db)
     await db.refresh(db_gage)
+    index_gage(db, db_gage)
     return db_gage
 
 @router.get("/gages/{gage_id}", response_model=GageResponse)
@@ -40,10 +136,12 @@ async def update_gage(gage_id: int, gage: GageCreate, db: AsyncSession = Depends
     db_gage = result.scalar_one_or_none()
     if not db_gage:
         raise HTTPException(status_code=404, detail="Gage not found")
+    await _check_serial_number(db, gage.serial_number, gage_id)
     for key, value in gage.dict().items():
         setattr(db_gage, key, value)
-    await db.commit()
+    await _commit_gage(db)
     await db.refresh(db_gage)
+    index_gage(db, db_gage)
     return db_gage
 
 @router.delete("/gages/{gage_id}")
@@ -54,4 +152,5 @@ async def delete_gage(gage_id: int, db: AsyncSession = Depends(get_async_db)):
         raise HTTPException(status_code=404, detail="Gage not found")
     await db.delete(db_gage)
     await db.commit()
+    unindex_gage(db, gage_id)
     return {"status": "success", "message": f"Gage {gage_id} deleted"} 
\ No newline at end of file
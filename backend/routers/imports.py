@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Path, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, BinaryIO
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+
+from models import AsyncSessionLocal, TokenData
+from routers.auth import get_token_data
+from importer import ImportFileError, detect_format, import_rows, iter_rows
+
+router = APIRouter(
+    prefix="/imports",
+    tags=["imports"],
+)
+logger = logging.getLogger(__name__)
+
+async def _stream_import(kind: str, spool: BinaryIO, format: str, dry_run: bool) -> AsyncIterator[str]:
+    try:
+        async with AsyncSessionLocal() as db:
+            async for event in import_rows(db, kind, iter_rows(spool, format), dry_run):
+                yield json.dumps(event, default=str) + "\n"
+    except ImportFileError as e:
+        yield json.dumps({"done": True, "error": str(e)}) + "\n"
+    except Exception as e:
+        # Headers are already sent; report the failure as the last event
+        logger.error(f"Error importing {kind}: {str(e)}")
+        yield json.dumps({"done": True, "error": f"Import stopped: {str(e)}"}) + "\n"
+    finally:
+        spool.close()
+
+@router.post("/{kind}")
+async def import_spreadsheet(
+    kind: str = Path(..., regex="^(gages|calibrations|measurements)$"),
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    current_user: TokenData = Depends(get_token_data)
+):
+    """
+    Bulk import gages, calibration records or measurements from a CSV or XLSX
+    file whose header row uses the API field names (calibration and
+    measurement rows may give serial_number instead of gage_id).
+
+    The response is newline-delimited JSON: one progress event per chunk of
+    rows with running totals and that chunk's row errors, then a final
+    summary with ``done`` set. Chunks commit as they go; rejected rows are
+    skipped. With dry_run nothing is written.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can import data"
+        )
+    try:
+        format = detect_format(file.filename)
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Own copy on disk, so the rows can be read after the request's upload is closed
+    spool = tempfile.TemporaryFile()
+    await asyncio.to_thread(shutil.copyfileobj, file.file, spool)
+    spool.seek(0)
+    return StreamingResponse(_stream_import(kind, spool, format, dry_run), media_type="application/x-ndjson")
@@ -1,33 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 from models import IssueLog, Gage
 from schemas import IssueLogCreate, IssueLogResponse, IssueLogUpdate
-from database import get_async_db, get_db
-from datetime import datetime
-from sqlalchemy.orm import Session
+from database import get_async_db
+from config import get_settings
+from utilization import refresh_gage_usage
+from live_events import publish
+from datetime import datetime, timedelta
 
 router = APIRouter(
     prefix="/api/issue-log",
     tags=["issue-log"]
 )
+settings = get_settings()
+
+def _open_checkouts():
+    """Currently issued gages; the predicate matches the ix_issue_log_open_* partial indexes"""
+    return select(IssueLog).where(IssueLog.return_date.is_(None))
 
 @router.post("/", response_model=IssueLogResponse)
 async def create_issue_log(issue_log: IssueLogCreate, db: AsyncSession = Depends(get_async_db)):
-    # Check if gage exists
-    result = await db.execute(select(Gage).where(Gage.gage_id == issue_log.gage_id))
+    # Check if gage exists; the row lock serializes concurrent checkouts of it
+    result = await db.execute(select(Gage).where(Gage.gage_id == issue_log.gage_id).with_for_update())
     gage = result.scalar_one_or_none()
     if not gage:
         raise HTTPException(status_code=404, detail="Gage not found")
+
+    # A gage can only have one open checkout; entries posted already returned are history
+    checkout = issue_log.return_date is None
+    if checkout:
+        result = await db.execute(_open_checkouts().where(IssueLog.gage_id == gage.gage_id).limit(1))
+        if result.scalar_one_or_none() is not None:
+            raise HTTPException(status_code=409, detail="Gage is already issued")
     
     # Create new issue log
     db_issue_log = IssueLog(**issue_log.dict())
+    if checkout and db_issue_log.expected_return_date is None:
+        db_issue_log.expected_return_date = issue_log.issue_date + timedelta(days=settings.CHECKOUT_LOAN_DAYS)
     db.add(db_issue_log)
     
-    # Update gage status to "Issued"
-    gage.status = "Issued"
-    
+    await refresh_gage_usage(db, [issue_log.gage_id])
+    if checkout:
+        # Update gage status to "Issued"
+        gage.status = "Issued"
+        await publish(db, "gage_issued", gage_id=gage.gage_id, issue_id=db_issue_log.issue_id)
     await db.commit()
     await db.refresh(db_issue_log)
     return db_issue_log
@@ -37,6 +55,70 @@ async def get_issue_logs(db: AsyncSession = Depends(get_async_db)):
     result = await db.execute(select(IssueLog))
     return result.scalars().all()
 
+@router.get("/history", response_model=List[IssueLogResponse])
+async def get_issue_log_history(
+    response: Response,
+    gage_id: Optional[int] = None,
+    handled_by: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="issue_id of the last entry of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Issue log entries, newest first. When the page is full the X-Next-Cursor
+    header holds the cursor for the next page.
+    """
+    query = select(IssueLog)
+    if gage_id is not None:
+        query = query.where(IssueLog.gage_id == gage_id)
+    if handled_by is not None:
+        query = query.where(IssueLog.handled_by == handled_by)
+    if cursor is not None:
+        query = query.where(IssueLog.issue_id < cursor)
+    result = await db.execute(query.order_by(IssueLog.issue_id.desc()).limit(limit))
+    logs = result.scalars().all()
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = str(logs[-1].issue_id)
+    return logs
+
+@router.get("/open", response_model=List[IssueLogResponse])
+async def get_open_checkouts(db: AsyncSession = Depends(get_async_db)):
+    """Every gage currently issued, with its holder"""
+    result = await db.execute(_open_checkouts().order_by(IssueLog.gage_id, IssueLog.issue_id))
+    return result.scalars().all()
+
+@router.get("/overdue", response_model=List[IssueLogResponse])
+async def get_overdue_checkouts(
+    as_of: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Open checkouts past their expected return date, longest overdue first"""
+    result = await db.execute(
+        _open_checkouts()
+        .where(IssueLog.expected_return_date < (as_of or datetime.utcnow()))
+        .order_by(IssueLog.expected_return_date, IssueLog.issue_id)
+    )
+    return result.scalars().all()
+
+@router.get("/gage/{gage_id}/current", response_model=Optional[IssueLogResponse])
+async def get_current_holder(gage_id: int, db: AsyncSession = Depends(get_async_db)):
+    """The gage's open checkout, or null when it is not issued"""
+    result = await db.execute(
+        _open_checkouts()
+        .where(IssueLog.gage_id == gage_id)
+        .order_by(IssueLog.issue_id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+@router.get("/user/{user_id}/open", response_model=List[IssueLogResponse])
+async def get_user_open_checkouts(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Gages currently issued through a user"""
+    result = await db.execute(
+        _open_checkouts().where(IssueLog.handled_by == user_id).order_by(IssueLog.issue_date, IssueLog.issue_id)
+    )
+    return result.scalars().all()
+
 @router.get("/{issue_id}", response_model=IssueLogResponse)
 async def get_issue_log(issue_id: int, db: AsyncSession = Depends(get_async_db)):
     result = await db.execute(select(IssueLog).where(IssueLog.issue_id == issue_id))
@@ -53,6 +135,7 @@ async def update_issue_log(issue_id: int, issue_log: IssueLogUpdate, db: AsyncSe
         raise HTTPException(status_code=404, detail="Issue log not found")
     
     # Update fields
+    previous_gage_id = db_issue_log.gage_id
     for key, value in issue_log.dict(exclude_unset=True).items():
         setattr(db_issue_log, key, value)
     
@@ -63,6 +146,9 @@ async def update_issue_log(issue_id: int, issue_log: IssueLogUpdate, db: AsyncSe
         if gage:
             gage.status = "Active"
     
+    await refresh_gage_usage(db, [previous_gage_id, db_issue_log.gage_id])
+    if issue_log.return_date:
+        await publish(db, "gage_returned", gage_id=db_issue_log.gage_id, issue_id=issue_id)
     await db.commit()
     await db.refresh(db_issue_log)
     return db_issue_log
@@ -75,25 +161,25 @@ async def delete_issue_log(issue_id: int, db: AsyncSession = Depends(get_async_d
         raise HTTPException(status_code=404, detail="Issue log not found")
     
     await db.delete(db_issue_log)
+    await refresh_gage_usage(db, [db_issue_log.gage_id])
     await db.commit()
     return {"status": "success", "message": f"Issue log {issue_id} deleted"}
 
 @router.get("/user/{user_id}", response_model=dict)
-def get_user_gages(user_id: int, db: Session = Depends(get_db)):
+async def get_user_gages(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get all gages handled and returned by a specific user
     """
     try:
         # Get gages currently handled by the user
-        handled_gages = db.query(IssueLog).filter(
-            IssueLog.handled_by == user_id,
-            IssueLog.return_date == None
-        ).all()
+        result = await db.execute(_open_checkouts().where(IssueLog.handled_by == user_id))
+        handled_gages = result.scalars().all()
 
         # Get gages returned by the user
-        returned_gages = db.query(IssueLog).filter(
+        result = await db.execute(select(IssueLog).where(
             IssueLog.returned_by == user_id
-        ).all()
+        ))
+        returned_gages = result.scalars().all()
 
         return {
             "handled_gages": [
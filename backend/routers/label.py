@@ -1,17 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
-from datetime import datetime
+from sqlalchemy import insert, and_, or_, func
+from typing import List, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-from models import Label, LabelTemplate, User
-from schemas import LabelCreate, LabelResponse, LabelTemplateCreate, LabelTemplateUpdate, LabelTemplateResponse
-from pydantic import Field
+from models import Label, LabelTemplate, Gage, TokenData
+from schemas import LabelCreate, LabelResponse, LabelBulkResponse, LabelTemplateCreate, LabelTemplateUpdate, LabelTemplateResponse
+from pydantic import BaseModel, Field
 from database import get_async_db
-from routers.auth import get_current_user
+from routers.auth import get_token_data
+from labels import (
+    LABEL_FORMATS, LABEL_BATCH_MAX, template_cache, invalidate_template,
+    get_plan, load_label_data, render_label, render_labels
+)
+import hashlib
+import json
 
 router = APIRouter()
 
+# Rows per INSERT statement; keeps bind parameters well under the driver limit
+LABEL_INSERT_CHUNK = 1000
+LABEL_BULK_MAX = 10000
+
 # Create Label
 @router.post("/labels/", response_model=LabelResponse)
 async def create_label(
@@ -24,29 +37,98 @@ async def create_label(
     await db.refresh(db_label)
     return db_label
 
+# Create Labels in bulk (e.g. after a calibration campaign)
+@router.post("/labels/bulk", response_model=LabelBulkResponse)
+async def create_labels_bulk(
+    labels: List[LabelCreate],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Insert many labels in one transaction with multi-row INSERT ... RETURNING"""
+    if not labels:
+        raise HTTPException(status_code=400, detail="No labels supplied")
+    if len(labels) > LABEL_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {LABEL_BULK_MAX} labels per request")
+
+    gage_ids = {label.gage_id for label in labels}
+    result = await db.execute(select(Gage.gage_id).where(Gage.gage_id.in_(gage_ids)))
+    missing = sorted(gage_ids - set(result.scalars().all()))
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown gage ids: {missing}")
+
+    # One timestamp for the whole batch, so it pages as one block
+    generated_at = datetime.utcnow()
+    rows = [{**label.dict(), "generated_at": generated_at} for label in labels]
+    created = []
+    for start in range(0, len(rows), LABEL_INSERT_CHUNK):
+        result = await db.execute(
+            insert(Label).values(rows[start:start + LABEL_INSERT_CHUNK]).returning(*Label.__table__.columns)
+        )
+        created.extend(dict(row._mapping) for row in result.all())
+    await db.commit()
+    return LabelBulkResponse(created=len(created), labels=created)
+
 # Get Labels (List)
 @router.get("/labels/", response_model=List[LabelResponse])
 async def read_labels(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="id of the last label of the previous page"),
     gage_id: int | None = None,
     calibration_record_id: int | None = None,
     db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Labels newest first (generated_at, then id). When the page is full the
+    X-Next-Cursor header holds the cursor for the next page.
+    """
     query = select(Label)
     if gage_id is not None:
         query = query.where(Label.gage_id == gage_id)
     if calibration_record_id is not None:
         query = query.where(Label.calibration_record_id == calibration_record_id)
+    if cursor is not None:
+        result = await db.execute(select(Label.generated_at).where(Label.id == cursor))
+        cursor_row = result.first()
+        if cursor_row is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            Label.generated_at < cursor_row[0],
+            and_(Label.generated_at == cursor_row[0], Label.id < cursor)
+        ))
 
-    result = await db.execute(query.offset(skip).limit(limit))
+    result = await db.execute(query.order_by(Label.generated_at.desc(), Label.id.desc()).limit(limit))
     labels = result.scalars().all()
+    if len(labels) == limit:
+        response.headers["X-Next-Cursor"] = str(labels[-1].id)
 
     # TODO: Implement logic to filter labels based on user role if necessary in a real-world scenario
     # This might involve checking the authenticated user's role and filtering the results accordingly.
 
     return labels
 
+# Latest label per gage
+@router.get("/labels/latest", response_model=List[LabelResponse])
+async def read_latest_labels(
+    gage_ids: Optional[str] = Query(None, description="Comma-separated gage ids; all gages when omitted"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Most recent label of each gage, read from the (gage_id, generated_at, id) index"""
+    rank = func.row_number().over(
+        partition_by=Label.gage_id,
+        order_by=(Label.generated_at.desc(), Label.id.desc())
+    )
+    ranked = select(Label.id, rank.label("rank"))
+    if gage_ids:
+        try:
+            ids = [int(value) for value in gage_ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="gage_ids must be comma-separated integers")
+        ranked = ranked.where(Label.gage_id.in_(ids))
+    ranked = ranked.subquery()
+    query = select(Label).join(ranked, ranked.c.id == Label.id).where(ranked.c.rank == 1).order_by(Label.gage_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
 # Get Label by ID
 @router.get("/labels/{label_id}", response_model=LabelResponse)
 async def read_label(
@@ -83,7 +165,7 @@ class LabelTemplateCreateWithQR(LabelTemplateCreate):
 @router.post("/label-templates/", response_model=LabelTemplateResponse)
 async def create_label_template(
     template: LabelTemplateCreateWithQR,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_token_data),
     db: AsyncSession = Depends(get_async_db)
 ):
     # Only admin can create templates
@@ -106,46 +188,90 @@ async def create_label_template(
     db.add(db_template)
     await db.commit()
     await db.refresh(db_template)
+    invalidate_template(db_template.id, db_template.gage_id)
     return db_template
 
+def _template_entry(payload, modified: Optional[datetime] = None) -> dict:
+    """Serialized response body with its validators, as kept in template_cache"""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+    entry = {"body": body, "etag": '"' + hashlib.sha1(body).hexdigest() + '"', "modified": None}
+    if modified is not None:
+        # HTTP dates have whole-second precision; updated_at is naive UTC
+        entry["modified"] = modified.replace(microsecond=0, tzinfo=timezone.utc)
+    return entry
+
+def _not_modified(request: Request, entry: dict) -> bool:
+    # If-None-Match wins when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match == entry["etag"]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or entry["modified"] is None:
+        return False
+    try:
+        return entry["modified"] <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+def _template_response(request: Request, entry: dict) -> Response:
+    headers = {"ETag": entry["etag"]}
+    if entry["modified"] is not None:
+        headers["Last-Modified"] = format_datetime(entry["modified"], usegmt=True)
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
 @router.get("/label-templates", response_model=List[LabelTemplateResponse])
 async def get_label_templates(
+    request: Request,
     gage_id: int = None,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_token_data),
     db: AsyncSession = Depends(get_async_db)
 ):
-    query = select(LabelTemplate)
-    
-    # Filter by gage_id if provided
-    if gage_id is not None:
-        query = query.where(LabelTemplate.gage_id == gage_id)
-    
-    result = await db.execute(query)
-    templates = result.scalars().all()
-    return templates
+    """
+    Served from an in-process cache. Responses carry an ETag; send it back as
+    If-None-Match to get a 304. No Last-Modified here, since deleting a
+    template does not move any remaining template's updated_at.
+    """
+    key = ("gage", gage_id)
+    entry = template_cache.get(key)
+    if entry is None:
+        query = select(LabelTemplate)
+
+        # Filter by gage_id if provided
+        if gage_id is not None:
+            query = query.where(LabelTemplate.gage_id == gage_id)
+
+        result = await db.execute(query.order_by(LabelTemplate.id))
+        templates = result.scalars().all()
+        entry = _template_entry([LabelTemplateResponse.from_orm(template) for template in templates])
+        template_cache.set(key, entry)
+    return _template_response(request, entry)
 
 @router.get("/label-templates/{template_id}", response_model=LabelTemplateResponse)
 async def get_label_template(
     template_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: TokenData = Depends(get_token_data),
     db: AsyncSession = Depends(get_async_db)
 ):
-    result = await db.execute(select(LabelTemplate).where(LabelTemplate.id == template_id))
-    template = result.scalar_one_or_none()
-    
-    if not template:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Label template not found"
-        )
-    
-    return template
+    """
+    Served from an in-process cache, with ETag and Last-Modified (the
+    template's updated_at) for If-None-Match / If-Modified-Since revalidation.
+    """
+    key = ("id", template_id)
+    entry = template_cache.get(key)
+    if entry is None:
+        template = await _get_template_or_404(db, template_id)
+        entry = _template_entry(LabelTemplateResponse.from_orm(template), template.updated_at)
+        template_cache.set(key, entry)
+    return _template_response(request, entry)
 
 @router.put("/label-templates/{template_id}", response_model=LabelTemplateResponse)
 async def update_label_template(
     template_id: int,
     template_update: LabelTemplateUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_token_data),
     db: AsyncSession = Depends(get_async_db)
 ):
     # Only admin can update templates
@@ -171,12 +297,13 @@ async def update_label_template(
     
     await db.commit()
     await db.refresh(template)
+    invalidate_template(template.id, template.gage_id)
     return template
 
 @router.delete("/label-templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_label_template(
     template_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenData = Depends(get_token_data),
     db: AsyncSession = Depends(get_async_db)
 ):
     # Only admin can delete templates
@@ -195,6 +322,72 @@ async def delete_label_template(
             detail="Label template not found"
         )
     
+    gage_id = template.gage_id
     await db.delete(template)
     await db.commit()
-    return None 
\ No newline at end of file
+    invalidate_template(template_id, gage_id)
+    return None
+
+class LabelBatchRequest(BaseModel):
+    gage_ids: Optional[List[int]] = Field(default=None, max_items=LABEL_BATCH_MAX)
+    # Every gage at a location, e.g. one cabinet after a calibration campaign
+    location: Optional[str] = None
+    format: str = Field(default="pdf", regex="^(png|zpl|pdf)$")
+
+async def _get_template_or_404(db: AsyncSession, template_id: int) -> LabelTemplate:
+    result = await db.execute(select(LabelTemplate).where(LabelTemplate.id == template_id))
+    template = result.scalar_one_or_none()
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Label template not found"
+        )
+    return template
+
+@router.get("/label-templates/{template_id}/render")
+async def render_template_label(
+    template_id: int,
+    gage_id: int,
+    format: str = Query("png", regex="^(png|zpl|pdf)$"),
+    current_user: TokenData = Depends(get_token_data),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Render one gage's label with a template as PNG, ZPL or PDF"""
+    template = await _get_template_or_404(db, template_id)
+    gages = await load_label_data(db, gage_ids=[gage_id])
+    if not gages:
+        raise HTTPException(status_code=404, detail="Gage not found")
+    content = await render_label(get_plan(template), gages[0], format)
+    return Response(
+        content=content,
+        media_type=LABEL_FORMATS[format],
+        headers={"Content-Disposition": f'inline; filename="label_{gage_id}.{format}"'}
+    )
+
+@router.post("/label-templates/{template_id}/render")
+async def render_template_labels(
+    template_id: int,
+    request: LabelBatchRequest,
+    current_user: TokenData = Depends(get_token_data),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Render labels for many gages in one print job: a multi-page PDF, a ZPL
+    stream or a zip of PNGs.
+    """
+    if request.gage_ids is None and request.location is None:
+        raise HTTPException(status_code=400, detail="Provide gage_ids or a location")
+    template = await _get_template_or_404(db, template_id)
+    gages = await load_label_data(db, gage_ids=request.gage_ids, location=request.location)
+    if not gages:
+        raise HTTPException(status_code=404, detail="No matching gages")
+    if len(gages) > LABEL_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {LABEL_BATCH_MAX} labels per request")
+    content, extension = await render_labels(get_plan(template), gages, request.format)
+    media_type = "application/zip" if extension == "zip" else LABEL_FORMATS[request.format]
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="labels_template_{template_id}.{extension}"'}
+    )
+
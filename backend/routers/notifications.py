@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field, validator
+from typing import Optional
+from database import get_async_db
+from email_service import enqueue_due_digests, email_configured
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class DueNotificationRequest(BaseModel):
+    days_ahead: int = Field(default=30, ge=0, le=365)
+    include_overdue: bool = True
+    # Restrict the digest to one gage (as posted by the calibration planner)
+    gageId: Optional[int] = None
+
+    @validator("gageId", pre=True)
+    def blank_gage_id(cls, v):
+        return None if v == "" else v
+
+@router.post("/notifications/send", status_code=202)
+async def send_due_notifications(
+    request: DueNotificationRequest = DueNotificationRequest(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue one calibration-due digest per responsible user"""
+    if not email_configured():
+        raise HTTPException(status_code=500, detail="Missing email configuration settings")
+    try:
+        summary = await enqueue_due_digests(
+            db,
+            days_ahead=request.days_ahead,
+            include_overdue=request.include_overdue,
+            gage_ids=[request.gageId] if request.gageId is not None else None
+        )
+    except Exception as e:
+        logger.error(f"Error queueing due notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing due notifications: {str(e)}")
+    return {"status": "queued", **summary}
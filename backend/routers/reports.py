@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from typing import List, Optional
 from datetime import date, datetime
 
 from models import Gage, CalibrationRecord, IssueLog, CalibrationMeasurement
 from schemas import CalibrationMeasurementBase, CalibrationRecordBase, GageBase, IssueLogBase
-from database import get_db
+from database import get_async_db
+from exports import (
+    EXPORT_FORMATS, CALIBRATION_EXPORT_COLUMNS, ISSUE_LOG_EXPORT_COLUMNS,
+    calibration_export_query, issue_log_export_query, column_names, stream_csv, stream_xlsx
+)
 
 router = APIRouter(
     prefix="/reports",
@@ -37,20 +44,29 @@ class GageIssueLogReport(GageBase):
         orm_mode = True
 
 @router.get("/calibration/{gage_id}", response_model=GageCalibrationReport)
-def get_calibration_report(
+async def get_calibration_report(
     gage_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Retrieve calibration report for a specific Gage ID."""
-    gage = db.query(Gage).filter(Gage.gage_id == gage_id).first()
+    """Retrieve calibration report for a specific Gage ID.
+
+    Runs a fixed three queries (gage, records, measurements via selectinload)
+    regardless of how many calibrations the gage has.
+    """
+    result = await db.execute(select(Gage).where(Gage.gage_id == gage_id))
+    gage = result.scalar_one_or_none()
     if not gage:
         raise HTTPException(status_code=404, detail="Gage not found")
 
-    calibration_records = db.query(CalibrationRecord).filter(CalibrationRecord.gage_id == gage_id).all()
+    result = await db.execute(
+        select(CalibrationRecord)
+        .where(CalibrationRecord.gage_id == gage_id)
+        .options(selectinload(CalibrationRecord.measurements))
+    )
+    calibration_records = result.scalars().all()
 
     report_details = []
     for record in calibration_records:
-        measurements = db.query(CalibrationMeasurement).filter(CalibrationMeasurement.calibration_id == record.calibration_id).all()
         report_details.append(CalibrationReportDetail(
             calibration_id=record.calibration_id,
             gage_id=record.gage_id,
@@ -64,7 +80,7 @@ def get_calibration_report(
             next_due_date=record.next_due_date,
             comments=record.comments,
             calibration_document_path=record.calibration_document_path,
-            measurements=measurements
+            measurements=record.measurements
         ))
 
     return GageCalibrationReport(
@@ -86,17 +102,19 @@ def get_calibration_report(
     )
 
 @router.get("/issue-log/{gage_id}", response_model=GageIssueLogReport)
-def get_issue_log_report(
+async def get_issue_log_report(
     gage_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Retrieve issue log report for a specific Gage ID."""
     try:
-        gage = db.query(Gage).filter(Gage.gage_id == gage_id).first()
+        result = await db.execute(select(Gage).where(Gage.gage_id == gage_id))
+        gage = result.scalar_one_or_none()
         if not gage:
             raise HTTPException(status_code=404, detail="Gage not found")
 
-        issue_logs = db.query(IssueLog).filter(IssueLog.gage_id == gage_id).all()
+        result = await db.execute(select(IssueLog).where(IssueLog.gage_id == gage_id))
+        issue_logs = result.scalars().all()
 
         # Ensure all required fields are present and handle potential None values
         validated_issue_logs = []
@@ -136,4 +154,39 @@ def get_issue_log_report(
     except Exception as e:
         # Catch any other exceptions and return a 500 error with detail
         print(f"Error fetching issue log report for gage {gage_id}: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+
+def _export_response(query, columns, name: str, format: str, date_from: Optional[date], date_to: Optional[date]):
+    header = column_names(columns)
+    if format == "csv":
+        content = stream_csv(query, header)
+    else:
+        content = stream_xlsx(query, header, sheet_name=name)
+    period = f"_{date_from or 'start'}_{date_to or 'end'}" if date_from or date_to else ""
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}{period}.{format}"'}
+    )
+
+@router.get("/export/calibrations")
+async def export_calibrations(
+    format: str = Query("csv", regex="^(csv|xlsx)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    gage_id: Optional[int] = None
+):
+    """Every calibration in the date range with its measurements, one row per measurement."""
+    query = calibration_export_query(date_from, date_to, gage_id)
+    return _export_response(query, CALIBRATION_EXPORT_COLUMNS, "calibrations", format, date_from, date_to)
+
+@router.get("/export/issue-log")
+async def export_issue_log(
+    format: str = Query("csv", regex="^(csv|xlsx)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    gage_id: Optional[int] = None
+):
+    """Issue log entries issued in the date range."""
+    query = issue_log_export_query(date_from, date_to, gage_id)
+    return _export_response(query, ISSUE_LOG_EXPORT_COLUMNS, "issue_log", format, date_from, date_to)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Any, List
 from datetime import datetime, date
 
 class GageBase(BaseModel):
@@ -102,6 +102,22 @@ class CalibrationRecordResponse(CalibrationRecordBase):
     class Config:
         orm_mode = True
 
+class NotificationResponse(BaseModel):
+    calibration_id: int
+    gage_id: int
+    calibration_date: Optional[date] = None
+    next_due_date: Optional[date] = None
+    certificate_number: Optional[str] = None
+    notification_sent_date: Optional[datetime] = None
+    notification_read: bool = False
+    notification_read_date: Optional[datetime] = None
+    class Config:
+        orm_mode = True
+
+class NotificationMarkRead(BaseModel):
+    # Leave out to mark every unread notification of the user
+    calibration_ids: Optional[List[int]] = Field(None, max_items=1000)
+
 class IssueLogBase(BaseModel):
     gage_id: int
     issue_date: datetime
@@ -113,7 +129,12 @@ class IssueLogBase(BaseModel):
     condition_on_return: str
 
 class IssueLogCreate(IssueLogBase):
-    pass
+    # A checkout is open until it is returned
+    return_date: Optional[datetime] = None
+    returned_by: Optional[int] = None
+    condition_on_return: Optional[str] = None
+    # Defaults to issue_date + CHECKOUT_LOAN_DAYS
+    expected_return_date: Optional[datetime] = None
 
 class IssueLogResponse(IssueLogBase):
     issue_id: int
@@ -121,6 +142,7 @@ class IssueLogResponse(IssueLogBase):
     return_date: Optional[datetime] = None
     returned_by: Optional[int] = None
     condition_on_return: Optional[str] = None
+    expected_return_date: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -134,6 +156,7 @@ class IssueLogUpdate(BaseModel):
     return_date: Optional[datetime] = None
     returned_by: Optional[int] = None
     condition_on_return: Optional[str] = None
+    expected_return_date: Optional[datetime] = None
 
 # New Label Schemas
 class LabelBase(BaseModel):
@@ -154,6 +177,10 @@ class LabelResponse(LabelBase):
     class Config:
         orm_mode = True
 
+class LabelBulkResponse(BaseModel):
+    created: int
+    labels: List[LabelResponse]
+
 # Calibration Measurement Schemas
 class CalibrationMeasurementBase(BaseModel):
     calibration_id: int
@@ -171,6 +198,16 @@ class CalibrationMeasurementBase(BaseModel):
 class CalibrationMeasurementCreate(CalibrationMeasurementBase):
     pass
 
+class CalibrationMeasurementSheetItem(CalibrationMeasurementBase):
+    # Filled in from the calibration record the sheet is posted against
+    calibration_id: Optional[int] = None
+    gage_id: Optional[int] = None
+
+class CalibrationMeasurementSheetResponse(BaseModel):
+    calibration_id: int
+    created: int
+    measurement_ids: List[int]
+
 class CalibrationMeasurementUpdate(BaseModel):
     calibration_id: Optional[int] = None
     gage_id: Optional[int] = None
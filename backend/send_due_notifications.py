@@ -0,0 +1,31 @@
+"""Queue and deliver calibration-due digests for the whole fleet.
+
+Usage: python send_due_notifications.py [--days-ahead 30] [--no-overdue]
+"""
+import argparse
+import asyncio
+import logging
+
+from models import AsyncSessionLocal
+from email_service import enqueue_due_digests, email_configured, dispatcher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def send_due_notifications(days_ahead: int, include_overdue: bool):
+    if not email_configured():
+        raise SystemExit("Missing email configuration settings")
+    async with AsyncSessionLocal() as db:
+        summary = await enqueue_due_digests(db, days_ahead=days_ahead, include_overdue=include_overdue)
+    logger.info(f"Queued digests: {summary}")
+
+    # Drain everything that is due now, one pooled SMTP connection per batch
+    while await dispatcher.dispatch_pending():
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days-ahead", type=int, default=30)
+    parser.add_argument("--no-overdue", action="store_true", help="Skip gages that are already overdue")
+    args = parser.parse_args()
+    asyncio.run(send_due_notifications(args.days_ahead, not args.no_overdue))
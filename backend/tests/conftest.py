@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+from datetime import date
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+
+@pytest.fixture
+def engine(tmp_path):
+    """A throwaway SQLite database with the full schema"""
+    # NullPool: each test step runs on its own event loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield engine
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def session_factory(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+def make_gage(**fields) -> models.Gage:
+    values = {
+        "name": "Plug gage", "description": "", "serial_number": "SN-1", "model_number": "M-1",
+        "manufacturer": "Mitutoyo", "purchase_date": date(2020, 1, 1), "location": "Lab",
+        "status": "Active", "calibration_frequency": 12, "last_calibration_date": date(2024, 1, 1),
+        "next_calibration_due": date(2025, 1, 1), "gage_type": "Plug", "cal_category": "A",
+    }
+    values.update(fields)
+    return models.Gage(**values)
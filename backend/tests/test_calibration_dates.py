@@ -0,0 +1,48 @@
+import asyncio
+from datetime import date
+
+from sqlalchemy import select
+
+from calibration_dates import sync_gage_calibration_dates
+from conftest import make_gage
+from models import CalibrationRecord, Gage
+
+def test_deleting_the_last_calibration_clears_gage_dates(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.flush()
+            record = CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 3, 1), next_due_date=date(2025, 3, 1))
+            db.add(record)
+            await sync_gage_calibration_dates(db, [gage.gage_id])
+            await db.commit()
+            synced = (await db.execute(select(Gage.last_calibration_date, Gage.next_calibration_due))).one()
+
+            await db.delete(record)
+            await sync_gage_calibration_dates(db, [gage.gage_id])
+            await db.commit()
+            cleared = (await db.execute(select(Gage.last_calibration_date, Gage.next_calibration_due))).one()
+            return tuple(synced), tuple(cleared)
+
+    synced, cleared = asyncio.run(run())
+    assert synced == (date(2024, 3, 1), date(2025, 3, 1))
+    assert cleared == (None, None)
+
+def test_latest_calibration_wins_whatever_the_insert_order(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage(calibration_frequency=90)
+            db.add(gage)
+            await db.flush()
+            db.add_all([
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 6, 1), next_due_date=None),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2023, 1, 1), next_due_date=date(2024, 1, 1)),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 3, 1), next_due_date=date(2025, 3, 1)),
+            ])
+            await sync_gage_calibration_dates(db, [gage.gage_id])
+            await db.commit()
+            return tuple((await db.execute(select(Gage.last_calibration_date, Gage.next_calibration_due))).one())
+
+    # No next due date on the latest record: calibration_frequency days after it
+    assert asyncio.run(run()) == (date(2024, 6, 1), date(2024, 8, 30))
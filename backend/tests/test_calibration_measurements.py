@@ -0,0 +1,43 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from conftest import make_gage
+from models import CalibrationMeasurement, CalibrationRecord
+from routers.calibration_measurements import _insert_measurement_sheet
+from schemas import CalibrationMeasurementSheetItem
+
+def _item(**fields):
+    values = {
+        "function_point": "P1", "nominal_value": 10.0, "tolerance_plus": 0.02, "tolerance_minus": 0.02,
+        "before_measurement": 10.01, "after_measurement": 10.0, "temperature": 20.0, "humidity": 45.0,
+    }
+    values.update(fields)
+    return CalibrationMeasurementSheetItem(**values)
+
+def test_sheet_rows_for_another_gage_are_rejected(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage, other = make_gage(serial_number="SN-1"), make_gage(serial_number="SN-2")
+            db.add_all([gage, other])
+            await db.flush()
+            calibration = CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2026, 1, 1))
+            db.add(calibration)
+            await db.commit()
+            calibration_id, gage_id = calibration.calibration_id, gage.gage_id
+            with pytest.raises(HTTPException) as error:
+                await _insert_measurement_sheet(db, calibration_id, [
+                    _item(), _item(gage_id=gage_id), _item(gage_id=other.gage_id),
+                ])
+            await db.rollback()
+            stored = (await db.execute(select(func.count()).select_from(CalibrationMeasurement))).scalar()
+            created = await _insert_measurement_sheet(db, calibration_id, [_item(), _item(gage_id=gage_id)])
+            return error.value, stored, created.created
+
+    error, stored, created = asyncio.run(run())
+    assert error.status_code == 400 and "Rows [2]" in error.detail
+    assert stored == 0
+    assert created == 2
@@ -0,0 +1,24 @@
+from datetime import date
+
+from drift import fit_drift, recommend_interval
+
+def _row(day, before, after):
+    # (gage_id, function_point, calibration_date, nominal, tolerance_plus, tolerance_minus, before, after)
+    return (1, "P1", day, 10.0, 0.01, 0.01, before, after)
+
+def test_single_observation_gives_no_recommendation():
+    rows = [_row(date(2024, 1, 1), 10.0, 10.0), _row(date(2024, 7, 1), 10.002, 10.0)]
+    function_points = fit_drift(rows, 0.95)[1]["function_points"]
+    assert function_points[0]["intervals_observed"] == 1
+    assert function_points[0]["predicted_days_to_limit"] is None
+    assert recommend_interval(function_points, 365) == 365
+
+def test_two_observations_give_a_recommendation():
+    rows = [
+        _row(date(2023, 1, 1), 10.0, 10.0),
+        _row(date(2023, 7, 1), 10.002, 10.0),
+        _row(date(2024, 1, 1), 10.003, 10.0),
+    ]
+    function_points = fit_drift(rows, 0.95)[1]["function_points"]
+    assert function_points[0]["predicted_days_to_limit"] is not None
+    assert function_points[0]["sigma_per_sqrt_day"] > 0
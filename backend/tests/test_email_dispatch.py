@@ -0,0 +1,158 @@
+import asyncio
+import socketserver
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import email_service
+from conftest import make_gage
+from email_service import NotificationDispatcher, enqueue_due_digests
+from models import CalibrationRecord, NotificationOutbox, User
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; recipients containing 'reject' are refused"""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost ready")
+        message = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if message is not None:
+                if command == ".":
+                    self.server.received.append(message)
+                    message = None
+                    self.reply("250 Queued")
+                else:
+                    message.append(command)
+            elif verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "RCPT" and "reject" in command:
+                self.reply("550 No such user")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                message = []
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.received = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(email_service.settings, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(email_service.settings, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(email_service.settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(email_service.settings, "SMTP_USERNAME", "")
+    monkeypatch.setattr(email_service.settings, "EMAIL_FROM", "gages@example.com")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+async def _queue(session_factory, *recipients, **fields):
+    async with session_factory() as db:
+        for recipient in recipients:
+            db.add(NotificationOutbox(recipient=recipient, subject="Due", body="Gage due", **fields))
+        await db.commit()
+
+async def _outbox(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(NotificationOutbox).order_by(NotificationOutbox.id))
+        return result.scalars().all()
+
+def test_dispatch_delivers_and_schedules_retries(session_factory, smtp_server):
+    asyncio.run(_queue(session_factory, "a@example.com", "reject@example.com", "b@example.com"))
+
+    attempted = asyncio.run(NotificationDispatcher(session_factory).dispatch_pending())
+
+    assert attempted == 3
+    assert len(smtp_server.received) == 2
+    sent, refused, other = asyncio.run(_outbox(session_factory))
+    assert (sent.status, other.status) == ("sent", "sent")
+    assert sent.lease_expires_at is None and sent.sent_at is not None
+    assert refused.status == "pending" and refused.attempts == 1
+    assert "No such user" in refused.last_error
+    assert refused.next_attempt_at > datetime.utcnow()
+
+def test_dispatch_skips_live_leases_and_reclaims_expired_ones(session_factory, smtp_server):
+    now = datetime.utcnow()
+    asyncio.run(_queue(session_factory, "live@example.com", status="sending", attempts=1,
+                       lease_expires_at=now + timedelta(minutes=5)))
+    asyncio.run(_queue(session_factory, "expired@example.com", status="sending", attempts=1,
+                       lease_expires_at=now - timedelta(minutes=5)))
+
+    attempted = asyncio.run(NotificationDispatcher(session_factory).dispatch_pending())
+
+    assert attempted == 1
+    live, expired = asyncio.run(_outbox(session_factory))
+    assert live.status == "sending"
+    assert expired.status == "sent" and expired.attempts == 2
+
+def test_expired_lease_on_the_last_attempt_fails_instead_of_resending(session_factory, smtp_server):
+    expired_at = datetime.utcnow() - timedelta(minutes=5)
+    max_attempts = email_service.settings.NOTIFICATION_MAX_ATTEMPTS
+    asyncio.run(_queue(session_factory, "poison@example.com", status="sending", attempts=max_attempts,
+                       lease_expires_at=expired_at))
+    asyncio.run(_queue(session_factory, "retry@example.com", status="sending", attempts=max_attempts - 1,
+                       lease_expires_at=expired_at))
+
+    attempted = asyncio.run(NotificationDispatcher(session_factory).dispatch_pending())
+
+    assert attempted == 1
+    assert len(smtp_server.received) == 1
+    poison, retry = asyncio.run(_outbox(session_factory))
+    assert poison.status == "failed" and poison.attempts == max_attempts
+    assert poison.lease_expires_at is None and "Lease expired" in poison.last_error
+    assert retry.status == "sent" and retry.attempts == max_attempts
+
+def test_dispatch_holds_no_transaction_while_sending(session_factory, monkeypatch):
+    asyncio.run(_queue(session_factory, "a@example.com"))
+    seen = []
+
+    def send(messages):
+        # Runs while the SMTP exchange would; the claim must already be committed
+        async def status():
+            return [item.status for item in await _outbox(session_factory)]
+        seen.extend(asyncio.run(status()))
+        return [None] * len(messages)
+
+    monkeypatch.setattr(email_service, "_send_batch", send)
+    asyncio.run(NotificationDispatcher(session_factory).dispatch_pending())
+
+    assert seen == ["sending"]
+    assert [item.status for item in asyncio.run(_outbox(session_factory))] == ["sent"]
+
+def test_digest_goes_to_the_latest_calibrator(session_factory):
+    async def run():
+        async with session_factory() as db:
+            users = [User(username=name, email=f"{name}@example.com", password_hash="x") for name in ("latest", "older", "undated")]
+            gage = make_gage(next_calibration_due=date.today() + timedelta(days=5))
+            db.add_all(users + [gage])
+            await db.flush()
+            db.add_all([
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 6, 1), calibrated_by=users[0].id),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 1, 1), calibrated_by=users[1].id),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=None, calibrated_by=users[2].id),
+            ])
+            await db.commit()
+            summary = await enqueue_due_digests(db)
+        return summary, [item.recipient for item in await _outbox(session_factory)]
+
+    summary, recipients = asyncio.run(run())
+    assert summary["gages"] == 1 and summary["unassigned_gages"] == 0
+    assert recipients == ["latest@example.com"]
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from routers.auth import _decode_token, create_access_token
+from routers.events import STREAM_TOKEN_SCOPE
+
+def _token(**claims):
+    return create_access_token({"sub": "7", **claims}, timedelta(minutes=1))
+
+def test_stream_token_only_opens_the_stream():
+    token = _token(scope=STREAM_TOKEN_SCOPE)
+    assert _decode_token(token, scope=STREAM_TOKEN_SCOPE)[0] == 7
+    with pytest.raises(HTTPException) as error:
+        _decode_token(token)
+    assert error.value.status_code == 401
+
+def test_access_token_is_refused_as_stream_token():
+    token = _token(role="admin")
+    assert _decode_token(token)[0] == 7
+    with pytest.raises(HTTPException) as error:
+        _decode_token(token, scope=STREAM_TOKEN_SCOPE)
+    assert error.value.status_code == 401
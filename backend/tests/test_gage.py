@@ -0,0 +1,36 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from routers.gage import create_gage, update_gage
+from schemas import GageCreate
+
+def _gage(serial_number, **fields):
+    values = {
+        "name": "Plug gage", "description": "", "serial_number": serial_number, "model_number": "M-1",
+        "manufacturer": "Mitutoyo", "purchase_date": date(2020, 1, 1), "location": "Lab",
+        "status": "Active", "calibration_frequency": 365, "last_calibration_date": date(2024, 1, 1),
+        "next_calibration_due": date(2025, 1, 1), "gage_type": "Plug", "cal_category": "A",
+    }
+    values.update(fields)
+    return GageCreate(**values)
+
+def test_duplicate_serial_numbers_are_a_client_error(session_factory):
+    async def run():
+        async with session_factory() as db:
+            first = await create_gage(_gage("SN-1"), db=db)
+            second = await create_gage(_gage("SN-2"), db=db)
+            codes = []
+            for attempt in (create_gage(_gage("SN-1"), db=db), update_gage(second.gage_id, _gage("SN-1"), db=db)):
+                with pytest.raises(HTTPException) as error:
+                    await attempt
+                codes.append(error.value.status_code)
+            # Keeping its own serial number is not a duplicate
+            renamed = await update_gage(first.gage_id, _gage("SN-1", name="Ring gage"), db=db)
+            return codes, renamed.name
+
+    codes, name = asyncio.run(run())
+    assert codes == [400, 400]
+    assert name == "Ring gage"
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import make_gage
+from routers.issue_log import create_issue_log, settings
+from schemas import IssueLogCreate
+
+def _checkout(gage_id, **fields):
+    values = {"gage_id": gage_id, "issue_date": datetime(2026, 10, 1), "issued_from": "Crib", "issued_to": "Line 3", "handled_by": 1}
+    values.update(fields)
+    return IssueLogCreate(**values)
+
+def test_issuing_an_issued_gage_is_a_conflict(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.commit()
+            await create_issue_log(_checkout(gage.gage_id), db=db)
+            with pytest.raises(HTTPException) as error:
+                await create_issue_log(_checkout(gage.gage_id, issued_to="Line 4"), db=db)
+            return error.value.status_code
+
+    assert asyncio.run(run()) == 409
+
+def test_open_checkout_blocks_a_second_one_whatever_the_status(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.commit()
+            await create_issue_log(_checkout(gage.gage_id), db=db)
+            # Status edited by hand while the checkout is still open
+            gage.status = "Active"
+            await db.commit()
+            with pytest.raises(HTTPException) as error:
+                await create_issue_log(_checkout(gage.gage_id), db=db)
+            return error.value.status_code
+
+    assert asyncio.run(run()) == 409
+
+def test_history_entries_leave_the_gage_available(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.commit()
+            # Backfilled checkout that was already returned
+            await create_issue_log(_checkout(gage.gage_id, issue_date=datetime(2026, 9, 1),
+                                             return_date=datetime(2026, 9, 5), returned_by=1), db=db)
+            status_after_history = gage.status
+            checkout = await create_issue_log(_checkout(gage.gage_id), db=db)
+            return status_after_history, checkout.expected_return_date, gage.status
+
+    status_after_history, expected_return_date, status = asyncio.run(run())
+    assert status_after_history == "Active"
+    assert expected_return_date == datetime(2026, 10, 1) + timedelta(days=settings.CHECKOUT_LOAN_DAYS)
+    assert status == "Issued"
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import date, datetime
+
+from conftest import make_gage
+from labels import load_label_data
+from models import CalibrationRecord, Label
+from routers.label import read_latest_labels
+
+def test_label_shows_the_latest_calibration_result(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.flush()
+            db.add_all([
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 6, 1), calibration_result="Pass"),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2024, 1, 1), calibration_result="Fail"),
+                CalibrationRecord(gage_id=gage.gage_id, calibration_date=None, calibration_result="Fail"),
+            ])
+            await db.commit()
+            return await load_label_data(db, [gage.gage_id])
+
+    rows = asyncio.run(run())
+    assert [row["calibration_result"] for row in rows] == ["Pass"]
+
+def test_latest_label_per_gage(session_factory):
+    async def run():
+        async with session_factory() as db:
+            gages = [make_gage(serial_number="SN-1"), make_gage(serial_number="SN-2")]
+            db.add_all(gages)
+            await db.flush()
+            first, second = (gage.gage_id for gage in gages)
+            db.add_all([
+                Label(gage_id=first, template_used="new", label_size="2x1", generated_at=datetime(2026, 5, 1)),
+                Label(gage_id=first, template_used="old", label_size="2x1", generated_at=datetime(2026, 1, 1)),
+                Label(gage_id=second, template_used="old", label_size="2x1", generated_at=datetime(2026, 1, 1)),
+                Label(gage_id=second, template_used="new", label_size="2x1", generated_at=datetime(2026, 5, 1)),
+            ])
+            await db.commit()
+            every_gage = await read_latest_labels(gage_ids=None, db=db)
+            one_gage = await read_latest_labels(gage_ids=str(second), db=db)
+            return first, second, every_gage, one_gage
+
+    first, second, every_gage, one_gage = asyncio.run(run())
+    assert [(label.gage_id, label.template_used) for label in every_gage] == [(first, "new"), (second, "new")]
+    assert [(label.gage_id, label.template_used) for label in one_gage] == [(second, "new")]
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from conftest import make_gage
+from models import CalibrationMeasurement, CalibrationRecord
+from routers.reports import get_calibration_report
+
+async def _seed(session_factory, calibrations: int) -> int:
+    async with session_factory() as db:
+        gage = make_gage()
+        db.add(gage)
+        await db.flush()
+        for index in range(calibrations):
+            record = CalibrationRecord(
+                gage_id=gage.gage_id, calibration_date=date(2024, 1, 1), calibrated_by=1,
+                calibration_method="", calibration_result="Pass", deviation_recorded="",
+                adjustments_made=0, certificate_number=f"C-{index}", next_due_date=date(2025, 1, 1),
+                comments="", calibration_document_path=""
+            )
+            db.add(record)
+            await db.flush()
+            for point in range(3):
+                db.add(CalibrationMeasurement(
+                    calibration_id=record.calibration_id, gage_id=gage.gage_id, function_point=f"P{point}",
+                    nominal_value=10, tolerance_plus=0.01, tolerance_minus=0.01,
+                    before_measurement=10, after_measurement=10, temperature=20, humidity=50
+                ))
+        await db.commit()
+        return gage.gage_id
+
+def _report_statements(engine, session_factory, calibrations: int):
+    gage_id = asyncio.run(_seed(session_factory, calibrations))
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async def run():
+            async with session_factory() as db:
+                return await get_calibration_report(gage_id, db)
+        report = asyncio.run(run())
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    return report, statements
+
+@pytest.mark.parametrize("calibrations", [1, 25])
+def test_calibration_report_query_count_is_constant(engine, session_factory, calibrations):
+    report, statements = _report_statements(engine, session_factory, calibrations)
+    assert len(report.calibration_records) == calibrations
+    assert all(len(record.measurements) == 3 for record in report.calibration_records)
+    # Gage, calibration records, measurements
+    assert len(statements) == 3
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy import select
+
+from conftest import make_gage
+from models import CalibrationMeasurement, CalibrationRecord
+from tolerance import FAIL, PASS, calibration_summaries, evaluate_rows, measurement_details, recompute_calibration_results
+
+def _row(measurement_id, nominal, plus, minus, before, after=None, calibration_id=1):
+    return (measurement_id, calibration_id, 1, f"P{measurement_id}", nominal, plus, minus, before, after)
+
+def test_one_sided_tolerance_is_json_safe():
+    rows = [
+        _row(1, 10.0, 0.02, 0.0, 9.99),   # below a zero-width minus side
+        _row(2, 10.0, 0.0, 0.02, 10.01),  # above a zero-width plus side
+        _row(3, 10.0, 0.0, 0.02, 10.0),   # on the nominal of a one-sided tolerance
+        _row(4, 10.0, 0.02, 0.02, 10.01),
+    ]
+    evaluation = evaluate_rows(rows)
+    details = measurement_details(rows, evaluation)
+    summaries = calibration_summaries(evaluation)
+
+    # Starlette serializes with allow_nan=False
+    json.dumps(details, allow_nan=False)
+    json.dumps(summaries, allow_nan=False)
+
+    assert [detail["as_found_pass"] for detail in details] == [False, False, True, True]
+    assert details[0]["percent_tolerance_used_before"] is None
+    assert details[1]["percent_tolerance_used_before"] is None
+    assert details[2]["percent_tolerance_used_before"] == 0.0
+    assert details[3]["percent_tolerance_used_before"] == 50.0
+    assert summaries[0]["as_found_result"] == FAIL
+
+def test_reading_on_the_limit_passes():
+    rows = [_row(1, 10.0, 0.01, -0.01, 10.01), _row(2, 10.0, 0.01, 0.01, 9.99)]
+    summary, = calibration_summaries(evaluate_rows(rows))
+    assert summary["calibration_result"] == PASS
+    assert summary["max_percent_tolerance_used"] == 100.0
+
+def test_recompute_keeps_reviewer_results(session_factory):
+    stored = [None, "Pending", "PASS", "Approved", "Rejected", "Needs review", "Fail"]
+
+    async def run():
+        async with session_factory() as db:
+            gage = make_gage()
+            db.add(gage)
+            await db.flush()
+            for result in stored:
+                calibration = CalibrationRecord(gage_id=gage.gage_id, calibration_date=date(2026, 1, 1), calibration_result=result)
+                db.add(calibration)
+                await db.flush()
+                # Out of tolerance, so every calibration evaluates to Fail
+                db.add(CalibrationMeasurement(
+                    calibration_id=calibration.calibration_id, gage_id=gage.gage_id, function_point="P1",
+                    nominal_value=10.0, tolerance_plus=0.01, tolerance_minus=0.01, before_measurement=10.05
+                ))
+            await db.commit()
+            summary = await recompute_calibration_results(db)
+            result = await db.execute(select(CalibrationRecord.calibration_result).order_by(CalibrationRecord.calibration_id))
+            return summary, result.scalars().all()
+
+    summary, results = asyncio.run(run())
+    assert results == [FAIL, FAIL, FAIL, "Approved", "Rejected", "Needs review", FAIL]
+    assert summary == {"evaluated": 7, "updated": 3}
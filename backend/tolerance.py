@@ -0,0 +1,214 @@
+"""Vectorized tolerance evaluation for calibration measurements.
+
+Tolerances are applied as magnitudes around the nominal value, so a row is in
+tolerance when ``nominal - |tolerance_minus| <= reading <= nominal + |tolerance_plus|``
+whichever sign the minus tolerance was entered with. Rows with no after
+reading were not adjusted, so their as-left reading is the as-found one.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, func
+from typing import List, Optional
+import numpy as np
+
+from models import CalibrationMeasurement, CalibrationRecord
+
+# Same spelling the calibration forms store
+PASS = "Pass"
+FAIL = "Fail"
+
+# Stored results the recompute job may replace, compared case-insensitively:
+# unset, awaiting review, or an earlier verdict of its own. Anything else
+# (Approved, Rejected or other reviewer text) is left alone.
+RECOMPUTABLE_RESULTS = ("", "pending", "pass", "fail")
+
+MEASUREMENT_COLUMNS = (
+    CalibrationMeasurement.measurement_id,
+    CalibrationMeasurement.calibration_id,
+    CalibrationMeasurement.gage_id,
+    CalibrationMeasurement.function_point,
+    CalibrationMeasurement.nominal_value,
+    CalibrationMeasurement.tolerance_plus,
+    CalibrationMeasurement.tolerance_minus,
+    CalibrationMeasurement.before_measurement,
+    CalibrationMeasurement.after_measurement,
+)
+
+def _column(rows: List[tuple], index: int) -> np.ndarray:
+    # None becomes NaN, Decimal becomes float
+    return np.array([row[index] for row in rows], dtype=float)
+
+def _percent_used(deviation: np.ndarray, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """
+    |deviation| as a percentage of the limit on its side. A one-sided
+    tolerance (zero-width side) uses 0% at zero deviation; any deviation past
+    it is infinitely out of tolerance, reported as None.
+    """
+    limit = np.where(deviation >= 0, upper, lower)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.abs(deviation) / limit * 100.0
+    return np.where((limit == 0) & (deviation == 0), 0.0, percent)
+
+def _clean(value):
+    """JSON-safe Python scalar: NaN and infinities become None"""
+    if value is None:
+        return None
+    value = value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+def evaluate_rows(rows: List[tuple]) -> dict:
+    """
+    Evaluate measurement rows shaped like MEASUREMENT_COLUMNS in one pass.
+
+    Returns per-measurement arrays plus per-calibration aggregates; the
+    calibration arrays are aligned with ``calibration_ids`` (sorted).
+    """
+    calibration_col = np.array([row[1] for row in rows], dtype=np.int64)
+    nominal = _column(rows, 4)
+    upper = np.abs(_column(rows, 5))
+    lower = np.abs(_column(rows, 6))
+    before = _column(rows, 7)
+    after = _column(rows, 8)
+    after = np.where(np.isnan(after), before, after)
+
+    # Readings carry six decimals; rounding drops float noise so a reading
+    # exactly on a limit is in tolerance
+    deviation_before = np.round(before - nominal, 9)
+    deviation_after = np.round(after - nominal, 9)
+    # NaN compares False, so rows with missing data never pass...
+    as_found_pass = (deviation_before <= upper) & (deviation_before >= -lower)
+    as_left_pass = (deviation_after <= upper) & (deviation_after >= -lower)
+    # ...and are only counted as failures when they could be evaluated
+    as_found_evaluated = ~np.isnan(deviation_before) & ~np.isnan(upper) & ~np.isnan(lower)
+    as_left_evaluated = ~np.isnan(deviation_after) & ~np.isnan(upper) & ~np.isnan(lower)
+
+    percent_before = _percent_used(deviation_before, upper, lower)
+    percent_after = _percent_used(deviation_after, upper, lower)
+
+    calibration_ids, inverse = np.unique(calibration_col, return_inverse=True)
+    groups = len(calibration_ids)
+    as_found_failures = np.bincount(inverse, weights=as_found_evaluated & ~as_found_pass, minlength=groups)
+    as_left_failures = np.bincount(inverse, weights=as_left_evaluated & ~as_left_pass, minlength=groups)
+    as_found_points = np.bincount(inverse, weights=as_found_evaluated, minlength=groups)
+    as_left_points = np.bincount(inverse, weights=as_left_evaluated, minlength=groups)
+    max_percent_after = np.full(groups, np.nan)
+    np.fmax.at(max_percent_after, inverse, np.where(as_left_evaluated, percent_after, np.nan))
+
+    return {
+        "deviation_before": deviation_before,
+        "deviation_after": deviation_after,
+        "percent_before": percent_before,
+        "percent_after": percent_after,
+        "as_found_pass": as_found_pass,
+        "as_left_pass": as_left_pass,
+        "as_found_evaluated": as_found_evaluated,
+        "as_left_evaluated": as_left_evaluated,
+        "calibration_ids": calibration_ids,
+        "measurement_count": np.bincount(inverse, minlength=groups),
+        "as_found_failures": as_found_failures.astype(np.int64),
+        "as_left_failures": as_left_failures.astype(np.int64),
+        "as_found_points": as_found_points.astype(np.int64),
+        "as_left_points": as_left_points.astype(np.int64),
+        "max_percent_tolerance_used": max_percent_after,
+    }
+
+def _verdict(failures: int, points: int) -> Optional[str]:
+    if points == 0:
+        return None
+    return FAIL if failures else PASS
+
+def calibration_summaries(evaluation: dict) -> List[dict]:
+    summaries = []
+    for index, calibration_id in enumerate(evaluation["calibration_ids"]):
+        as_found_failures = int(evaluation["as_found_failures"][index])
+        as_left_failures = int(evaluation["as_left_failures"][index])
+        as_left_result = _verdict(as_left_failures, int(evaluation["as_left_points"][index]))
+        summaries.append({
+            "calibration_id": int(calibration_id),
+            "measurement_count": int(evaluation["measurement_count"][index]),
+            "as_found_failures": as_found_failures,
+            "as_left_failures": as_left_failures,
+            "as_found_result": _verdict(as_found_failures, int(evaluation["as_found_points"][index])),
+            "as_left_result": as_left_result,
+            "max_percent_tolerance_used": _clean(evaluation["max_percent_tolerance_used"][index]),
+            # The instrument goes back into service as left
+            "calibration_result": as_left_result,
+        })
+    return summaries
+
+def measurement_details(rows: List[tuple], evaluation: dict) -> List[dict]:
+    details = []
+    for index, row in enumerate(rows):
+        details.append({
+            "measurement_id": row[0],
+            "calibration_id": row[1],
+            "gage_id": row[2],
+            "function_point": row[3],
+            "deviation_before": _clean(evaluation["deviation_before"][index]),
+            "deviation_after": _clean(evaluation["deviation_after"][index]),
+            "percent_tolerance_used_before": _clean(evaluation["percent_before"][index]),
+            "percent_tolerance_used_after": _clean(evaluation["percent_after"][index]),
+            "as_found_pass": bool(evaluation["as_found_pass"][index]) if evaluation["as_found_evaluated"][index] else None,
+            "as_left_pass": bool(evaluation["as_left_pass"][index]) if evaluation["as_left_evaluated"][index] else None,
+        })
+    return details
+
+async def load_measurement_rows(db: AsyncSession, *conditions) -> List[tuple]:
+    result = await db.execute(
+        select(*MEASUREMENT_COLUMNS)
+        .where(*conditions)
+        .order_by(CalibrationMeasurement.calibration_id, CalibrationMeasurement.measurement_id)
+    )
+    return result.all()
+
+async def recompute_calibration_results(db: AsyncSession, chunk_size: int = 5000) -> dict:
+    """
+    Re-evaluate every calibration that has measurements and store the verdict
+    in calibration_result where it is empty, Pending or a previous Pass/Fail
+    (see RECOMPUTABLE_RESULTS); reviewer decisions are left untouched. Works
+    through the table in calibration_id ranges so memory stays bounded.
+    """
+    evaluated = 0
+    updated = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(CalibrationMeasurement.calibration_id)
+            .where(CalibrationMeasurement.calibration_id > last_id)
+            .group_by(CalibrationMeasurement.calibration_id)
+            .order_by(CalibrationMeasurement.calibration_id)
+            .limit(chunk_size)
+        )
+        chunk_ids = result.scalars().all()
+        if not chunk_ids:
+            break
+        last_id = chunk_ids[-1]
+
+        rows = await load_measurement_rows(
+            db,
+            CalibrationMeasurement.calibration_id >= chunk_ids[0],
+            CalibrationMeasurement.calibration_id <= last_id
+        )
+        summaries = calibration_summaries(evaluate_rows(rows))
+        evaluated += len(summaries)
+
+        for verdict in (PASS, FAIL):
+            ids = [s["calibration_id"] for s in summaries if s["calibration_result"] == verdict]
+            if not ids:
+                continue
+            result = await db.execute(
+                update(CalibrationRecord)
+                .where(
+                    CalibrationRecord.calibration_id.in_(ids),
+                    func.lower(func.coalesce(CalibrationRecord.calibration_result, "")).in_(RECOMPUTABLE_RESULTS),
+                    CalibrationRecord.calibration_result.is_distinct_from(verdict)
+                )
+                .values(calibration_result=verdict)
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        await db.commit()
+
+    return {"evaluated": evaluated, "updated": updated}
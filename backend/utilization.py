@@ -0,0 +1,251 @@
+"""Gage utilization and turnaround analytics from the issue log.
+
+Activity is kept per gage and calendar month in ``gage_usage_periods``.
+Every issue-log write calls ``refresh_gage_usage`` for the gages it touches,
+which re-derives just those gages' months in the same transaction, so the
+report only ever reads the monthly rows. The history extract uses a LAG
+window over each gage's checkouts to find the idle gap before each one.
+
+Open checkouts are not stored: their busy time so far is added at report
+time from the open-checkout partial index, so the current month stays exact
+without a refresh.
+
+Metrics per gage, location or gage type over the last N months, quarters or
+years:
+
+- utilization_pct: checked-out time / (gages * elapsed time in the window)
+- mean_checkout_hours: mean duration of checkouts returned in the window
+- checkouts_per_period: checkouts issued, per period
+- idle_hours: elapsed gage time not checked out
+- mean_idle_gap_hours: mean time from a return to the gage's next checkout
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, delete, insert
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime
+import logging
+
+from models import Gage, GageUsagePeriod, IssueLog
+
+logger = logging.getLogger(__name__)
+
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+# Gages per history query when rebuilding the whole fleet
+REBUILD_CHUNK_SIZE = 2000
+
+def _month_start(moment) -> date:
+    return date(moment.year, moment.month, 1)
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def _period_start(month: date, period: str) -> date:
+    size = PERIOD_MONTHS[period]
+    return date(month.year, (month.month - 1) // size * size + 1, 1)
+
+def _split_by_month(start: datetime, end: datetime) -> Iterable[Tuple[date, float]]:
+    """(month, seconds) for each calendar month the interval [start, end) overlaps"""
+    month = _month_start(start)
+    while True:
+        following = _add_months(month, 1)
+        boundary = datetime(following.year, following.month, 1)
+        yield month, (min(end, boundary) - max(start, datetime(month.year, month.month, 1))).total_seconds()
+        if end <= boundary:
+            return
+        month = following
+
+def _history_query(gage_ids: List[int]):
+    previous_return = func.lag(IssueLog.return_date, type_=IssueLog.return_date.type).over(
+        partition_by=IssueLog.gage_id,
+        order_by=(IssueLog.issue_date, IssueLog.issue_id)
+    )
+    return (
+        select(IssueLog.gage_id, IssueLog.issue_date, IssueLog.return_date, previous_return.label("previous_return"))
+        .where(IssueLog.gage_id.in_(gage_ids), IssueLog.issue_date.isnot(None))
+    )
+
+def _usage_rows(history) -> List[dict]:
+    """Fold checkouts into per (gage, month) rows"""
+    usage: Dict[Tuple[int, date], dict] = {}
+
+    def bucket(gage_id: int, month: date) -> dict:
+        key = (gage_id, month)
+        if key not in usage:
+            usage[key] = {
+                "gage_id": gage_id, "month": month, "checkouts": 0, "busy_seconds": 0.0,
+                "returns": 0, "checkout_seconds": 0.0, "idle_gaps": 0, "idle_seconds": 0.0,
+            }
+        return usage[key]
+
+    for gage_id, issued, returned, previous_return in history:
+        issue_bucket = bucket(gage_id, _month_start(issued))
+        issue_bucket["checkouts"] += 1
+        if previous_return is not None and previous_return <= issued:
+            issue_bucket["idle_gaps"] += 1
+            issue_bucket["idle_seconds"] += (issued - previous_return).total_seconds()
+        if returned is None or returned < issued:
+            continue
+        return_bucket = bucket(gage_id, _month_start(returned))
+        return_bucket["returns"] += 1
+        return_bucket["checkout_seconds"] += (returned - issued).total_seconds()
+        for month, seconds in _split_by_month(issued, returned):
+            bucket(gage_id, month)["busy_seconds"] += seconds
+    return list(usage.values())
+
+async def refresh_gage_usage(db: AsyncSession, gage_ids: Iterable[Optional[int]]) -> int:
+    """
+    Re-derive the monthly usage rows of ``gage_ids`` from their issue log.
+    Flushes but does not commit; returns the number of rows written.
+    """
+    gage_ids = sorted({gage_id for gage_id in gage_ids if gage_id is not None})
+    if not gage_ids:
+        return 0
+    # Serializes concurrent refreshes of a gage; issue log rows may name gages that no longer exist
+    result = await db.execute(
+        select(Gage.gage_id).where(Gage.gage_id.in_(gage_ids)).order_by(Gage.gage_id).with_for_update()
+    )
+    known = set(result.scalars().all())
+    await db.flush()
+    result = await db.execute(_history_query(gage_ids))
+    rows = _usage_rows(result.all())
+    rows = [row for row in rows if row["gage_id"] in known]
+
+    await db.execute(delete(GageUsagePeriod).where(GageUsagePeriod.gage_id.in_(gage_ids)))
+    # Eight columns per row; 1000 rows keeps bind parameters well under the driver limit
+    for start in range(0, len(rows), 1000):
+        await db.execute(insert(GageUsagePeriod).values(rows[start:start + 1000]))
+    return len(rows)
+
+async def rebuild_gage_usage(db: AsyncSession) -> int:
+    """Recompute every gage's usage rows; returns the number of rows written"""
+    result = await db.execute(select(Gage.gage_id).order_by(Gage.gage_id))
+    gage_ids = result.scalars().all()
+    written = 0
+    for start in range(0, len(gage_ids), REBUILD_CHUNK_SIZE):
+        written += await refresh_gage_usage(db, gage_ids[start:start + REBUILD_CHUNK_SIZE])
+        await db.commit()
+    await db.execute(delete(GageUsagePeriod).where(GageUsagePeriod.gage_id.notin_(select(Gage.gage_id))))
+    await db.commit()
+    return written
+
+async def ensure_gage_usage(db: AsyncSession) -> None:
+    """Build gage_usage_periods once for databases that had issue logs before the table existed"""
+    result = await db.execute(select(GageUsagePeriod.gage_id).limit(1))
+    if result.first() is not None:
+        return
+    result = await db.execute(select(IssueLog.issue_id).limit(1))
+    if result.first() is None:
+        return
+    rows = await rebuild_gage_usage(db)
+    logger.info(f"Built gage usage history: {rows} gage-months")
+
+def _group_key(group_by: str):
+    if group_by == "gage":
+        return [Gage.gage_id, Gage.name]
+    return [getattr(Gage, group_by)]
+
+def _filters(query, location: Optional[str], gage_type: Optional[str]):
+    if location is not None:
+        query = query.where(Gage.location == location)
+    if gage_type is not None:
+        query = query.where(Gage.gage_type == gage_type)
+    return query
+
+async def get_utilization(
+    db: AsyncSession,
+    group_by: str = "gage",
+    period: str = "month",
+    periods: int = 12,
+    location: Optional[str] = None,
+    gage_type: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    Utilization report over the last ``periods`` periods, the current one
+    included up to ``now``. Groups are ordered from most to least utilized.
+    """
+    now = now or datetime.utcnow()
+    current = _period_start(_month_start(now), period)
+    window_start = _add_months(current, -PERIOD_MONTHS[period] * (periods - 1))
+    starts = [_add_months(window_start, PERIOD_MONTHS[period] * index) for index in range(periods)]
+    begin = datetime(window_start.year, window_start.month, 1)
+
+    def elapsed(start: date) -> float:
+        end = _add_months(start, PERIOD_MONTHS[period])
+        return (min(now, datetime(end.year, end.month, 1)) - datetime(start.year, start.month, 1)).total_seconds()
+
+    keys = _group_key(group_by)
+    result = await db.execute(_filters(select(*keys, func.count(Gage.gage_id)).group_by(*keys), location, gage_type))
+    gage_counts = {tuple(row[:-1]): row[-1] for row in result.all()}
+
+    sums = [
+        func.sum(GageUsagePeriod.checkouts), func.sum(GageUsagePeriod.busy_seconds),
+        func.sum(GageUsagePeriod.returns), func.sum(GageUsagePeriod.checkout_seconds),
+        func.sum(GageUsagePeriod.idle_gaps), func.sum(GageUsagePeriod.idle_seconds),
+    ]
+    result = await db.execute(_filters(
+        select(*keys, GageUsagePeriod.month, *sums)
+        .join(Gage, Gage.gage_id == GageUsagePeriod.gage_id)
+        .where(GageUsagePeriod.month >= window_start)
+        .group_by(*keys, GageUsagePeriod.month),
+        location, gage_type
+    ))
+    totals: Dict[tuple, Dict[date, List[float]]] = {}
+    for row in result.all():
+        key, month = tuple(row[:len(keys)]), row[len(keys)]
+        values = [value or 0 for value in row[len(keys) + 1:]]
+        series = totals.setdefault(key, {}).setdefault(_period_start(month, period), [0.0] * 6)
+        for index, value in enumerate(values):
+            series[index] += value
+
+    # Time checked out so far by gages that have not come back yet
+    result = await db.execute(_filters(
+        select(*keys, IssueLog.issue_date)
+        .join(Gage, Gage.gage_id == IssueLog.gage_id)
+        .where(IssueLog.return_date.is_(None), IssueLog.issue_date.isnot(None), IssueLog.issue_date < now),
+        location, gage_type
+    ))
+    for row in result.all():
+        key, issued = tuple(row[:len(keys)]), row[len(keys)]
+        for month, seconds in _split_by_month(max(issued, begin), now):
+            series = totals.setdefault(key, {}).setdefault(_period_start(month, period), [0.0] * 6)
+            series[1] += seconds
+
+    names = [column.key for column in keys]
+    empty = [0.0] * 6
+    groups = []
+    for key, gages in gage_counts.items():
+        series = totals.get(key, {})
+        available = gages * sum(elapsed(start) for start in starts)
+        checkouts, busy, returns, checkout_seconds, idle_gaps, idle_seconds = (
+            sum(series.get(start, empty)[index] for start in starts) for index in range(6)
+        )
+        groups.append({
+            **dict(zip(names, key)),
+            "gages": gages,
+            "checkouts": int(checkouts),
+            "checkouts_per_period": round(checkouts / periods, 2),
+            "utilization_pct": round(100 * busy / available, 2) if available else 0.0,
+            "mean_checkout_hours": round(checkout_seconds / returns / 3600, 2) if returns else None,
+            "idle_hours": round(max(available - busy, 0) / 3600, 2),
+            "mean_idle_gap_hours": round(idle_seconds / idle_gaps / 3600, 2) if idle_gaps else None,
+            "periods": [
+                {
+                    "period_start": start.isoformat(),
+                    "checkouts": int(series.get(start, empty)[0]),
+                    "utilization_pct": round(100 * series.get(start, empty)[1] / (gages * elapsed(start)), 2)
+                    if gages and elapsed(start) > 0 else 0.0,
+                }
+                for start in starts
+            ],
+        })
+    groups.sort(key=lambda group: (-group["utilization_pct"], -group["checkouts"]))
+    return {
+        "as_of": now.isoformat(),
+        "group_by": group_by,
+        "period": period,
+        "window_start": window_start.isoformat(),
+        "groups": groups,
+    }
@@ -0,0 +1,148 @@
+"""Streaming reader for the first worksheet of an XLSX workbook.
+
+The worksheet XML is parsed incrementally and each row is released once it
+has been yielded, so memory use does not grow with the number of rows. Only
+the shared-string table and the cell styles are loaded up front. Cells
+formatted as dates come back as ISO dates; every other value comes back as
+text, as it would from a CSV export of the same sheet.
+
+Kept free of database and application imports.
+"""
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse
+import posixpath
+import re
+import zipfile
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PACKAGE_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Built-in number formats that display dates
+_DATE_FORMAT_IDS = set(range(14, 23)) | {45, 46, 47}
+# Quoted literals, escapes and [colour]/[locale] blocks say nothing about dates
+_FORMAT_NOISE = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]')
+# Excel's day zero (serial 60, the phantom 1900-02-29, is not worth a special case)
+_EPOCH = datetime(1899, 12, 30)
+
+class XlsxError(ValueError):
+    pass
+
+def _column_index(reference: str) -> int:
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    try:
+        with archive.open("xl/workbook.xml") as handle:
+            sheet = next(element for _, element in iterparse(handle) if element.tag == f"{_MAIN}sheet")
+        with archive.open("xl/_rels/workbook.xml.rels") as handle:
+            for _, element in iterparse(handle):
+                if element.tag == f"{_PACKAGE_REL}Relationship" and element.get("Id") == sheet.get(f"{_REL}id"):
+                    target = element.get("Target")
+                    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    except (KeyError, StopIteration):
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+def _shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as handle:
+        for _, element in iterparse(handle):
+            if element.tag == f"{_MAIN}si":
+                # Plain <t>, or rich text split over <r><t> runs; <rPh> phonetic hints are skipped
+                texts = element.findall(f"{_MAIN}t") + element.findall(f"{_MAIN}r/{_MAIN}t")
+                strings.append("".join(text.text or "" for text in texts))
+                element.clear()
+    return strings
+
+def _date_styles(archive: zipfile.ZipFile) -> Set[int]:
+    """Indexes into cellXfs whose number format shows a date"""
+    if "xl/styles.xml" not in archive.namelist():
+        return set()
+    custom_dates = set()
+    styles = set()
+    with archive.open("xl/styles.xml") as handle:
+        for _, element in iterparse(handle):
+            if element.tag == f"{_MAIN}numFmt":
+                code = _FORMAT_NOISE.sub("", element.get("formatCode") or "").lower()
+                if any(char in code for char in "dy") or ("m" in code and "h" not in code and "s" not in code):
+                    custom_dates.add(int(element.get("numFmtId")))
+            elif element.tag == f"{_MAIN}cellXfs":
+                for index, xf in enumerate(element.findall(f"{_MAIN}xf")):
+                    format_id = int(xf.get("numFmtId") or 0)
+                    if format_id in _DATE_FORMAT_IDS or format_id in custom_dates:
+                        styles.add(index)
+    return styles
+
+def _serial_date(value: str) -> str:
+    moment = _EPOCH + timedelta(days=float(value))
+    if moment.time() == datetime.min.time():
+        return moment.date().isoformat()
+    return moment.replace(microsecond=0).isoformat()
+
+def _cell_value(cell, shared: List[str], date_styles: Set[int]) -> Optional[str]:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(text.text or "" for text in cell.iter(f"{_MAIN}t"))
+    value = cell.find(f"{_MAIN}v")
+    if value is None or value.text is None:
+        return None
+    if kind == "s":
+        return shared[int(value.text)]
+    if kind == "b":
+        return "true" if value.text == "1" else "false"
+    if kind in ("str", "e"):
+        return value.text
+    if int(cell.get("s") or 0) in date_styles:
+        try:
+            return _serial_date(value.text)
+        except (ValueError, OverflowError):
+            return value.text
+    # Whole numbers stored as floats, e.g. "12.0", read as "12"
+    if value.text.endswith(".0"):
+        return value.text[:-2]
+    return value.text
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, List[Optional[str]]]]:
+    """(row number, cell values) for each non-empty row of the first worksheet; ``file`` must be seekable"""
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise XlsxError("Not an XLSX workbook")
+    with archive:
+        shared = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+        try:
+            handle = archive.open(_first_sheet_path(archive))
+        except KeyError:
+            raise XlsxError("Workbook has no worksheet")
+        with handle:
+            number = 0
+            sheet_data = None
+            for event, element in iterparse(handle, events=("start", "end")):
+                if event == "start":
+                    if element.tag == f"{_MAIN}sheetData":
+                        sheet_data = element
+                    continue
+                if element.tag != f"{_MAIN}row":
+                    continue
+                number = int(element.get("r") or number + 1)
+                values: List[Optional[str]] = []
+                for position, cell in enumerate(element.findall(f"{_MAIN}c")):
+                    reference = cell.get("r")
+                    column = _column_index(reference) if reference else position
+                    if column >= len(values):
+                        values.extend([None] * (column + 1 - len(values)))
+                    values[column] = _cell_value(cell, shared, date_styles)
+                # Drop the parsed row from the tree as well as its contents
+                sheet_data.clear()
+                if any(value not in (None, "") for value in values):
+                    yield number, values
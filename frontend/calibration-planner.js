@@ -3,6 +3,7 @@ let calibrationData = []; // Store all calibration data
 let gageMap = {};
 let currentUserId = null; // This should be set when user logs in
 let notifications = [];
+let unreadNotificationCount = 0;
 
 document.addEventListener('DOMContentLoaded', async function() {
     // Get user role from localStorage
@@ -22,6 +23,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     // Load notifications if user is logged in
     if (currentUserId) {
         await loadNotifications();
+        subscribeToNotifications();
     }
 });
 
@@ -1278,16 +1280,55 @@ async function loadNotifications() {
     if (!currentUserId) return;
     
     try {
-        const response = await fetch(`http://127.0.0.1:5005/api/calibrations/notifications/${currentUserId}`);
-        if (!response.ok) throw new Error('Failed to fetch notifications');
+        const [response, countResponse] = await Promise.all([
+            fetch(`http://127.0.0.1:5005/api/calibrations/notifications/${currentUserId}`),
+            fetch(`http://127.0.0.1:5005/api/calibrations/notifications/${currentUserId}/unread-count`)
+        ]);
+        if (!response.ok || !countResponse.ok) throw new Error('Failed to fetch notifications');
         
+        // The most recent page only; the badge counts every unread notification
         notifications = await response.json();
+        unreadNotificationCount = (await countResponse.json()).unread;
         updateNotificationPanel();
     } catch (error) {
         console.error('Error loading notifications:', error);
     }
 }
 
+// Reload notifications when the server pushes a change instead of polling
+async function subscribeToNotifications() {
+    const token = localStorage.getItem('authToken');
+    if (!token || !window.EventSource) return;
+
+    let streamToken;
+    try {
+        // EventSource cannot send headers; exchange the access token for a
+        // short-lived stream token so the access token never goes in a URL
+        const response = await fetch('http://127.0.0.1:5005/api/events/token', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!response.ok) throw new Error('Failed to get event stream token');
+        streamToken = (await response.json()).token;
+    } catch (error) {
+        console.error('Error subscribing to notifications:', error);
+        setTimeout(subscribeToNotifications, 30000);
+        return;
+    }
+
+    const source = new EventSource(`http://127.0.0.1:5005/api/events/stream?token=${encodeURIComponent(streamToken)}`);
+    source.addEventListener('notification', loadNotifications);
+    source.addEventListener('notification_read', loadNotifications);
+    // Events sent while disconnected are not replayed; catch up after a reconnect
+    source.addEventListener('open', loadNotifications);
+    // The stream token expires quickly, so reconnect with a fresh one
+    // rather than letting EventSource retry with the old URL
+    source.addEventListener('error', () => {
+        source.close();
+        setTimeout(subscribeToNotifications, 5000);
+    });
+}
+
 // Add this function to update the notification panel
 function updateNotificationPanel() {
     let notificationPanel = document.getElementById('notificationPanel');
@@ -1375,7 +1416,7 @@ function updateNotificationPanel() {
         document.head.appendChild(style);
     }
     
-    const unreadCount = notifications.filter(n => !n.notification_read).length;
+    const unreadCount = unreadNotificationCount;
     
     notificationPanel.innerHTML = `
         <div class="notification-header">
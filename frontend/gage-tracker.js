@@ -304,6 +304,8 @@ async function addIssueLog(formData) {
         if (!response.ok) {
              const errorText = await response.text();
              console.error('Failed to create issue log:', response.status, response.statusText, errorText);
+            // 409: the gage is already issued
+            if (response.status === 409) throw new Error(JSON.parse(errorText).detail);
             throw new Error('Failed to create issue log');
         }
 